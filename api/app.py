@@ -1,24 +1,21 @@
 import os
+import sys
 import tempfile
 import json
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify
 import yt_dlp
-import re
+
+# url_classifier lives at the repo root; make it importable when run as `python api/app.py` too
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from url_classifier import classify_url, is_serverless_supported
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'vercel-video-downloader-2025')
 
-# Simple URL validation
 def is_valid_url(url):
     """Check if URL is from supported platforms"""
-    supported_patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-        r'(?:https?://)?(?:www\.)?youtu\.be/[\w-]+',
-        r'(?:https?://)?(?:www\.)?youtube\.com/playlist\?list=[\w-]+',
-        r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel)/[\w-]+',
-    ]
-    return any(re.match(pattern, url) for pattern in supported_patterns)
+    return is_serverless_supported(classify_url(url))
 
 @app.route('/')
 def index():
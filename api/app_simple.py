@@ -1,36 +1,20 @@
 import os
+import sys
 import json
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify
-import re
 import requests
 
+# url_classifier lives at the repo root; make it importable when run as `python api/app.py` too
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from url_classifier import classify_url, is_playlist_url, is_serverless_supported
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'vercel-video-downloader-2025')
 
-# Simple URL validation
 def is_valid_url(url):
     """Check if URL is from supported platforms"""
-    supported_patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-        r'(?:https?://)?(?:www\.)?youtu\.be/[\w-]+',
-        r'(?:https?://)?(?:www\.)?youtube\.com/playlist\?list=[\w-]+',
-        r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel)/[\w-]+',
-    ]
-    return any(re.match(pattern, url) for pattern in supported_patterns)
-
-def extract_video_id(url):
-    """Extract video ID from YouTube URL"""
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-        r'(?:embed\/)([0-9A-Za-z_-]{11})',
-        r'(?:v=)([0-9A-Za-z_-]{11})'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    return is_serverless_supported(classify_url(url))
 
 @app.route('/')
 def index():
@@ -58,12 +42,14 @@ def get_video_info():
         if not is_valid_url(url):
             return jsonify({'success': False, 'error': 'Unsupported URL format'})
         
+        classified = classify_url(url)
+        
         # For YouTube URLs, provide basic info without yt-dlp
-        if 'youtube.com' in url or 'youtu.be' in url:
-            video_id = extract_video_id(url)
+        if classified.platform == 'youtube':
+            video_id = classified.id
             if video_id:
                 # Return basic info structure
-                if 'playlist' in url or 'list=' in url:
+                if is_playlist_url(classified):
                     return jsonify({
                         'success': True,
                         'data': {
@@ -96,7 +82,7 @@ def get_video_info():
                     })
         
         # For Instagram
-        elif 'instagram.com' in url:
+        elif classified.platform == 'instagram':
             return jsonify({
                 'success': True,
                 'data': {
@@ -1,15 +1,41 @@
 import os
-import csv
+import copy
 import json
 import threading
 import time
 import tempfile
+import uuid
+from urllib.parse import quote
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
-from werkzeug.utils import secure_filename
+from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for, Response, stream_with_context
+from werkzeug.exceptions import HTTPException
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
 import yt_dlp
 import re
+import requests
 from dotenv import load_dotenv
+from info_cache import create_info_cache, is_info_fresh
+from url_classifier import classify_url, canonical_url, is_playlist_url
+from playlist_expander import PlaylistExpander, UnknownTokenError
+from progress_store import create_progress_store, is_finished
+from media_cache import MediaCache, media_key
+from retention import RetentionSweeper, PARTIAL_FILE_RE
+from passthrough import PassthroughStream, content_disposition, is_progressive_format
+from file_index import FileIndex
+from batch_ingest import UploadParser, chunked
+from zipstream import iter_zip, unique_arcnames
+from ydl_pool import YoutubeDLPool
+from format_ranking import rank_formats
+from rate_limiter import PlatformRateLimiter, limit_key
+from job_journal import JobJournal
+from parallel_download import fragment_workers, prefetch_legs
+from postprocess import PostProcessPool
+from retry_policy import classify_error, retry_delay, ERROR_THROTTLED, ERROR_UNKNOWN
+from jobs import DownloadQueue, QueueFullError, RetryLater, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW, STATE_RUNNING, STATE_DONE, STATE_FAILED
 
 # Load environment variables
 load_dotenv()
@@ -17,17 +43,93 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key_here')
 
-# Configuration for Vercel (use temp directories)
+# Configuration for Vercel (use temp directories unless persistent ones are configured)
 UPLOAD_FOLDER = tempfile.mkdtemp()
-DOWNLOADS_FOLDER = tempfile.mkdtemp()
+DOWNLOADS_FOLDER = os.path.abspath(os.getenv('DOWNLOADS_FOLDER') or tempfile.mkdtemp())
+CACHE_FOLDER = os.getenv('CACHE_FOLDER') or tempfile.mkdtemp()
 ALLOWED_EXTENSIONS = {'txt', 'csv'}
 
 # Create directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(DOWNLOADS_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
 
-# Store download progress (in-memory for serverless)
-download_progress = {}
+# Store download progress (in-memory for serverless, SQLite to share it between workers)
+progress_store = create_progress_store(
+    path=os.getenv('PROGRESS_STORE_PATH'),
+    finished_ttl=int(os.getenv('FINISHED_JOB_TTL', 3600))
+)
+
+# Download worker pool limits
+CONCURRENT_DOWNLOADS = int(os.getenv('CONCURRENT_DOWNLOADS', 3))
+MAX_QUEUED_DOWNLOADS = int(os.getenv('MAX_QUEUED_DOWNLOADS', 200))
+
+# Concurrent playlist expansion for batch requests
+PLAYLIST_EXPANSION_WORKERS = int(os.getenv('PLAYLIST_EXPANSION_WORKERS', 4))
+PLAYLIST_EXPANSION_TIMEOUT = float(os.getenv('PLAYLIST_EXPANSION_TIMEOUT', 20))
+
+# Flat playlist listing page sizes
+PLAYLIST_PAGE_SIZE = int(os.getenv('PLAYLIST_PAGE_SIZE', 50))
+MAX_PLAYLIST_PAGE_SIZE = 500
+
+# Parallel item downloads per playlist (1 keeps the sequential yt-dlp playlist mode)
+PLAYLIST_CONCURRENCY = int(os.getenv('PLAYLIST_CONCURRENCY', 3))
+MAX_PLAYLIST_CONCURRENCY = 8
+
+# Minimum seconds between progress store writes for one download
+PROGRESS_UPDATE_INTERVAL = float(os.getenv('PROGRESS_UPDATE_INTERVAL', 0.5))
+
+# Server-Sent Events progress streaming
+MAX_STREAM_IDS = 500
+SSE_MIN_INTERVAL = float(os.getenv('SSE_MIN_INTERVAL', 0.25))  # Minimum gap between pushes
+SSE_POLL_INTERVAL = 1.0  # Re-read the store this often even without local changes
+SSE_KEEPALIVE_INTERVAL = 15
+SSE_MAX_DURATION = int(os.getenv('SSE_MAX_DURATION', 25))  # Under gunicorn's default 30 s timeout; browsers reconnect automatically
+
+# Maximum age (seconds) of cached metadata that downloads may reuse
+INFO_REUSE_MAX_AGE = int(os.getenv('INFO_REUSE_MAX_AGE', 1800))
+
+# Uploads larger than this are queued while parsing instead of listed for selection
+BATCH_PREVIEW_MAX_BYTES = int(os.getenv('BATCH_PREVIEW_MAX_BYTES', 256 * 1024))
+BATCH_INGEST_CHUNK = int(os.getenv('BATCH_INGEST_CHUNK', 50))
+BATCH_INGEST_WAIT = 0.5  # Seconds between checks for queue capacity
+
+# /downloads listing page sizes
+DOWNLOADS_PAGE_SIZE = int(os.getenv('DOWNLOADS_PAGE_SIZE', 50))
+MAX_DOWNLOADS_PAGE_SIZE = 500
+
+# Parallel HLS/DASH fragment downloads per stream, capped per job (shared by merged legs and playlist items)
+FRAGMENT_CONCURRENCY = int(os.getenv('FRAGMENT_CONCURRENCY', 4))
+MAX_JOB_CONNECTIONS = int(os.getenv('MAX_JOB_CONNECTIONS', 8))
+PARALLEL_LEGS = os.getenv('PARALLEL_LEGS', 'true').lower() == 'true'  # Fetch video and audio of merged formats together
+
+# Concurrent ffmpeg jobs (merges, remuxes, transcodes); CPU-bound, so sized to the machine rather than the queue
+POSTPROCESS_WORKERS = int(os.getenv('POSTPROCESS_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+
+# Requests per minute, burst, concurrent metadata fetches and concurrent file transfers
+# per platform (other sites: per host)
+PLATFORM_LIMITS = {
+    'instagram': {'rate': float(os.getenv('INSTAGRAM_REQUESTS_PER_MINUTE', 20)) / 60, 'burst': 3,
+                  'concurrency': int(os.getenv('INSTAGRAM_CONCURRENCY', 2)),
+                  'transfers': int(os.getenv('INSTAGRAM_TRANSFERS', 2))},
+    'youtube': {'rate': float(os.getenv('YOUTUBE_REQUESTS_PER_MINUTE', 60)) / 60, 'burst': 5,
+                'concurrency': int(os.getenv('YOUTUBE_CONCURRENCY', 4)),
+                'transfers': int(os.getenv('YOUTUBE_TRANSFERS', 4))},
+    'default': {'rate': float(os.getenv('DEFAULT_REQUESTS_PER_MINUTE', 120)) / 60, 'burst': 5,
+                'concurrency': int(os.getenv('DEFAULT_HOST_CONCURRENCY', 4)),
+                'transfers': int(os.getenv('DEFAULT_HOST_TRANSFERS', 4))},
+}
+THROTTLE_BACKOFF_BASE = float(os.getenv('THROTTLE_BACKOFF_BASE', 5))
+THROTTLE_BACKOFF_MAX = float(os.getenv('THROTTLE_BACKOFF_MAX', 300))
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 30))  # Longest an info request waits for its turn
+
+# Keep a copy of pass-through streams in the media cache
+STREAM_TEE = os.getenv('STREAM_TEE', 'true').lower() == 'true'
+
+# Hand file transfers to a front proxy: 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx)
+SENDFILE_MODE = os.getenv('SENDFILE_MODE', '').lower()
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-downloads/')
+app.config['USE_X_SENDFILE'] = SENDFILE_MODE == 'x-sendfile'
 
 # Vercel handler
 def handler(request):
@@ -37,29 +139,191 @@ def handler(request):
 def app_handler(environ, start_response):
     return app(environ, start_response)
 
+ANSI_ESCAPE_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
 def clean_ansi_codes(text):
     """Remove ANSI escape sequences (color codes) from text"""
     if not text:
         return text
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text).strip()
+    return ANSI_ESCAPE_RE.sub('', text).strip()
+
+def format_speed(speed):
+    """Display string for a speed in bytes/s"""
+    return f'{yt_dlp.utils.format_bytes(speed)}/s' if speed else 'N/A'
+
+def downloaded_filepath(info):
+    """Final path of the file yt-dlp wrote for a processed info dict"""
+    if not info:
+        return None
+    downloads = info.get('requested_downloads') or []
+    if downloads and downloads[-1].get('filepath'):
+        return downloads[-1]['filepath']
+    return info.get('filepath')
+
+def progress_fields(d):
+    """Build progress fields from the numeric values of a yt-dlp 'downloading' hook call"""
+    downloaded = d.get('downloaded_bytes') or 0
+    total = d.get('total_bytes') or d.get('total_bytes_estimate')
+    speed = d.get('speed')
+    percent = min(100.0, downloaded * 100.0 / total) if total else None
+    return {
+        'status': 'downloading',
+        'percent': f'{percent:.1f}%' if percent is not None else '0%',
+        'speed': format_speed(speed),
+        'filename': d.get('filename', ''),
+        'percent_value': round(percent, 2) if percent is not None else None,
+        'downloaded_bytes': downloaded,
+        'total_bytes': total,
+        'speed_bytes': speed,
+        'eta': d.get('eta')
+    }
+
+class PlaylistProgress:
+    """Aggregate per-item yt-dlp progress of a concurrent playlist download into one entry"""
+    
+    def __init__(self, download_id, total_items):
+        self.download_id = download_id
+        self.total_items = total_items
+        self.items_done = 0
+        self.items_failed = 0
+        self.failed_items = []
+        self._lock = threading.Lock()
+        self._files = {}  # (item index, filename) -> [downloaded bytes, total bytes]
+        self._speeds = {}  # item index -> current speed in bytes/s
+        self._last_publish = 0
+        self._publish(force=True)
+    
+    def hook(self, index):
+        """Progress hook for the item at `index`"""
+        return lambda d: self.update(index, d)
+    
+    def update(self, index, d):
+        retention.protect(d.get('filename'), owner=self.download_id)
+        with self._lock:
+            key = (index, d.get('filename', ''))
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or downloaded
+            if d['status'] == 'finished':
+                total = d.get('total_bytes') or downloaded or total
+                self._files[key] = [total, total]
+                self._speeds[index] = 0
+                self._publish(force=True)
+            elif d['status'] == 'downloading':
+                self._files[key] = [downloaded, total]
+                self._speeds[index] = d.get('speed') or 0
+                self._publish()
+    
+    def finish_item(self, index, url=None, error=None):
+        with self._lock:
+            self._speeds.pop(index, None)
+            if error:
+                self.items_failed += 1
+                self.failed_items.append({'url': url, 'error': error})
+            else:
+                self.items_done += 1
+            self._publish(force=True)
+    
+    def _publish(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_publish < PROGRESS_UPDATE_INTERVAL:
+            return
+        self._last_publish = now
+        
+        downloaded_bytes = sum(f[0] for f in self._files.values())
+        total_bytes = sum(f[1] for f in self._files.values())
+        speed = sum(self._speeds.values())
+        
+        # Finished items count fully, running items by their byte fraction
+        finished = self.items_done + self.items_failed
+        running = {}
+        for (index, _), (downloaded, total) in self._files.items():
+            if index in self._speeds and total:
+                done, size = running.get(index, (0, 0))
+                running[index] = (done + downloaded, size + total)
+        partial = sum(done / size for done, size in running.values() if size)
+        percent = min(100.0, (finished + partial) / self.total_items * 100) if self.total_items else 0.0
+        
+        if not self.download_id:
+            return
+        progress_store.update(self.download_id, {
+            'status': 'downloading',
+            'percent': f'{percent:.1f}%',
+            'speed': format_speed(speed),
+            'percent_value': round(percent, 2),
+            'items_total': self.total_items,
+            'items_done': self.items_done,
+            'items_failed': self.items_failed,
+            'failed_items': list(self.failed_items),
+            'downloaded_bytes': downloaded_bytes,
+            'total_bytes': total_bytes,
+            'speed_bytes': speed
+        })
 
 class VideoDownloader:
-    def __init__(self):
+    def __init__(self, info_cache=None, media_cache=None, ydl_pool=None, rate_limiter=None):
         self.ydl_opts_info = {
             'quiet': True,
             'no_warnings': True,
         }
+        self.info_cache = info_cache
+        self.media_cache = media_cache
+        self.ydl_pool = ydl_pool or YoutubeDLPool()
+        self.rate_limiter = rate_limiter
+        self._last_progress_update = {}  # download_id -> time of last progress store write
+    
+    def fetch_slot(self, url, max_wait=None):
+        """Pace and cap concurrent fetches per platform (no-op without a rate limiter)"""
+        if not self.rate_limiter:
+            return nullcontext()
+        return self.rate_limiter.limit(limit_key(url), max_wait)
+    
+    def transfer_slot(self, url):
+        """Cap concurrent file transfers per platform, apart from the fetch slots"""
+        if not self.rate_limiter:
+            return nullcontext()
+        return self.rate_limiter.transfer(limit_key(url))
+    
+    def extract_info(self, url, ydl_opts, variant=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        """Extract info without downloading, served from the metadata cache when possible
+        
+        `max_wait` bounds the wait for the platform's rate limiter; background
+        jobs pass None to wait for their turn instead of failing.
+        """
+        if self.info_cache:
+            info = self.info_cache.get(url, variant)
+            if info is not None:
+                return info
+        
+        with self.fetch_slot(url, max_wait), self.ydl_pool.checkout(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        
+        if self.info_cache:
+            self.info_cache.set(url, info, variant)
+        return info
+    
+    def get_reusable_info(self, url):
+        """Return a private copy of the cached info dict if its media URLs are still valid"""
+        if not self.info_cache:
+            return None
+        info = self.info_cache.get(url)
+        if not is_info_fresh(info, max_age=INFO_REUSE_MAX_AGE):
+            return None
+        # yt-dlp mutates the info dict while downloading
+        return copy.deepcopy(info)
     
     def get_video_info(self, url):
         """Extract video information without downloading - automatically detect playlists"""
         try:
             # Platform-specific options
-            is_instagram = 'instagram.com' in url.lower()
+            is_instagram = classify_url(url).platform == 'instagram'
             
+            # Playlists are listed flat (first page only), single videos are unaffected
             ydl_opts = {
                 'quiet': True,
                 'no_warnings': True,
+                'extract_flat': 'in_playlist',
+                'lazy_playlist': True,
+                'playlist_items': f'1:{PLAYLIST_PAGE_SIZE}',
             }
             
             # Add Instagram-specific headers
@@ -68,204 +332,45 @@ class VideoDownloader:
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                 }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Check if this is a playlist
-                if 'entries' in info and info['entries']:
-                    # This is a playlist - return playlist info instead
-                    return self.get_playlist_info(url)
-                
-                # Extract available formats
-                formats = []
-                best_format_id = None
-                best_score = -1
-                
-                if 'formats' in info:
-                    if is_instagram:
-                        # Use enhanced format detection for Instagram
-                        enhanced_formats = self.get_instagram_enhanced_formats(info)
-                        
-                        for f in enhanced_formats:
-                            if f.get('is_virtual'):
-                                # Virtual combined format
-                                formats.append({
-                                    'format_id': f['format_id'],
-                                    'resolution': f['resolution'],
-                                    'ext': f['ext'],
-                                    'filesize': f.get('filesize'),
-                                    'fps': f.get('fps'),
-                                    'vcodec': f['vcodec'],
-                                    'acodec': f['acodec'],
-                                    'has_video': f['has_video'],
-                                    'has_audio': f['has_audio'],
-                                    'quality_score': f['quality_score'],
-                                    'is_best': False,
-                                    'is_virtual': True
-                                })
-                            else:
-                                # Regular format processing for Instagram - only include combined formats
-                                has_video = f.get('vcodec') and f.get('vcodec') != 'none'
-                                has_audio = f.get('acodec') and f.get('acodec') != 'none'
-                                height = f.get('height', 0) if f.get('height') else 0
-                                
-                                # Only process formats that have both video and audio
-                                if has_video and has_audio:
-                                    # Calculate quality score
-                                    score = 10000 + height  # High priority for combined formats
-                                    
-                                    if f.get('ext') == 'mp4':
-                                        score += 100
-                                    if f.get('fps') and f.get('fps') >= 30:
-                                        score += 50
-                                    
-                                    # Track best format
-                                    if score > best_score:
-                                        best_score = score
-                                        best_format_id = f['format_id']
-                                    
-                                    # Format resolution display
-                                    if f.get('resolution'):
-                                        resolution = f['resolution']
-                                    elif height:
-                                        width = f.get('width', 'Unknown')
-                                        resolution = f"{width}x{height}" if width != 'Unknown' else f"{height}p"
-                                    else:
-                                        resolution = 'Unknown'
-                                    
-                                    formats.append({
-                                        'format_id': f['format_id'],
-                                        'resolution': resolution,
-                                        'ext': f.get('ext', 'mp4'),
-                                        'filesize': f.get('filesize'),
-                                        'fps': f.get('fps'),
-                                        'vcodec': f.get('vcodec', 'none'),
-                                        'acodec': f.get('acodec', 'none'),
-                                        'has_video': has_video,
-                                        'has_audio': has_audio,
-                                        'quality_score': score,
-                                        'is_best': False
-                                    })
-                    else:
-                        # Enhanced logic for other platforms (YouTube, etc.)
-                        video_formats = []
-                        audio_formats = []
-                        combined_formats = []
-                        
-                        # Separate formats by type
-                        for f in info['formats']:
-                            if not f.get('url'):
-                                continue
-                                
-                            has_video = f.get('vcodec') and f.get('vcodec') != 'none'
-                            has_audio = f.get('acodec') and f.get('acodec') != 'none'
-                            
-                            if has_video and has_audio:
-                                combined_formats.append(f)
-                            elif has_video:
-                                video_formats.append(f)
-                            elif has_audio:
-                                audio_formats.append(f)
-                        
-                        # Add existing combined formats
-                        for f in combined_formats:
-                            height = f.get('height', 0) if f.get('height') else 0
-                            width = f.get('width', 0) if f.get('width') else 0
-                            
-                            # Format resolution display
-                            if f.get('resolution'):
-                                resolution = f['resolution']
-                            elif height:
-                                resolution = f"{width}x{height}" if width else f"{height}p"
-                            else:
-                                resolution = 'Unknown'
-                            
-                            formats.append({
-                                'format_id': f['format_id'],
-                                'resolution': resolution,
-                                'ext': f.get('ext', 'mp4'),
-                                'filesize': f.get('filesize'),
-                                'fps': f.get('fps'),
-                                'vcodec': f.get('vcodec'),
-                                'acodec': f.get('acodec'),
-                                'has_video': True,
-                                'has_audio': True,
-                                'quality_score': height + 2000,  # High priority for existing combined
-                                'is_best': False
-                            })
-                        
-                        # Create virtual combined formats from separate video and audio streams
-                        if video_formats and audio_formats:
-                            # Find the best audio format
-                            best_audio = max(audio_formats, key=lambda x: (x.get('abr', 0) or 0))
-                            
-                            for video_fmt in video_formats:
-                                height = video_fmt.get('height', 0) if video_fmt.get('height') else 0
-                                width = video_fmt.get('width', 0) if video_fmt.get('width') else 0
-                                
-                                # Skip very low quality videos
-                                if height and height < 240:
-                                    continue
-                                
-                                # Format resolution display
-                                if video_fmt.get('resolution'):
-                                    resolution = video_fmt['resolution']
-                                elif height:
-                                    resolution = f"{width}x{height}" if width else f"{height}p"
-                                else:
-                                    resolution = 'Unknown'
-                                
-                                # Create virtual combined format
-                                virtual_format = {
-                                    'format_id': f"{video_fmt['format_id']}+{best_audio['format_id']}",
-                                    'resolution': resolution,
-                                    'ext': 'mp4',
-                                    'filesize': (video_fmt.get('filesize', 0) or 0) + (best_audio.get('filesize', 0) or 0),
-                                    'fps': video_fmt.get('fps'),
-                                    'vcodec': video_fmt.get('vcodec'),
-                                    'acodec': best_audio.get('acodec'),
-                                    'has_video': True,
-                                    'has_audio': True,
-                                    'quality_score': height + 1000,  # Medium priority for virtual combined
-                                    'is_best': False,
-                                    'is_virtual': True,
-                                    'video_format_id': video_fmt['format_id'],
-                                    'audio_format_id': best_audio['format_id']
-                                }
-                                formats.append(virtual_format)
-                
-                # Mark the best format for Instagram
-                if is_instagram and best_format_id:
-                    for fmt in formats:
-                        if fmt['format_id'] == best_format_id:
-                            fmt['is_best'] = True
-                            break
-                
-                # Sort formats by quality score (best first)
-                formats.sort(key=lambda x: x.get('quality_score', 0), reverse=True)
-                
-                # Add best_format_id to video_info for frontend reference
-                video_info = {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration'),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'view_count': info.get('view_count'),
-                    'thumbnail': info.get('thumbnail'),
-                    'formats': formats,
-                    'url': url,
-                    'best_format_id': best_format_id if is_instagram else None
-                }
-                
-                return {'success': True, 'data': video_info}
-                
+            info = self.extract_info(url, ydl_opts)
+            
+            # Check if this is a playlist
+            if 'entries' in info and info['entries']:
+                # This is a playlist - return the first page of playlist info instead
+                if self.info_cache:
+                    self.info_cache.set(url, info, self.playlist_variant(1, PLAYLIST_PAGE_SIZE))
+                return {'success': True, 'data': self.build_playlist_info(info, url, 1, PLAYLIST_PAGE_SIZE)}
+            
+            # Classify, score and pair all formats in one pass
+            formats, best_format_id = rank_formats(info.get('formats'), 'instagram' if is_instagram else None)
+            
+            # Add best_format_id to video_info for frontend reference
+            video_info = {
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration'),
+                'uploader': info.get('uploader', 'Unknown'),
+                'view_count': info.get('view_count'),
+                'thumbnail': info.get('thumbnail'),
+                'formats': formats,
+                'url': url,
+                'best_format_id': best_format_id
+            }
+            
+            return {'success': True, 'data': video_info}
+            
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def download_video(self, url, format_id=None, download_id=None):
-        """Download video with specified format"""
+    def download_video(self, url, format_id=None, download_id=None, report_error=True):
+        """Download video with specified format
+        
+        Failures are returned with an `error_class` (see retry_policy); with
+        `report_error` off they are left for the caller to record.
+        """
         try:
             # Determine if this is an Instagram URL
-            is_instagram = 'instagram.com' in url.lower()
+            is_instagram = classify_url(url).platform == 'instagram'
+            convert_to_mp4 = False
             
             if format_id:
                 # Check if it's a virtual combined format (for any platform)
@@ -306,14 +411,12 @@ class VideoDownloader:
                         'outtmpl': os.path.join(DOWNLOADS_FOLDER, '%(title)s.%(ext)s'),
                         'progress_hooks': [lambda d: self.progress_hook(d, download_id)],
                         'merge_output_format': 'mp4',  # Force MP4 output
-                        'postprocessors': [{
-                            'key': 'FFmpegVideoConvertor',
-                            'preferedformat': 'mp4',
-                        }],
                         'http_headers': {
                             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                         }
                     }
+                    # Probed afterwards: remuxed when the codecs fit MP4, transcoded only when they don't
+                    convert_to_mp4 = True
                 else:
                     # For other platforms (YouTube, etc.) - allow higher resolutions
                     ydl_opts = {
@@ -323,101 +426,315 @@ class VideoDownloader:
                         'merge_output_format': 'mp4',
                     }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            # Merged formats fetch their video and audio legs side by side; split the job's connections
+            split_legs = PARALLEL_LEGS and '+' in ydl_opts['format']
+            ydl_opts['concurrent_fragment_downloads'] = fragment_workers(
+                2 if split_legs else 1, FRAGMENT_CONCURRENCY, MAX_JOB_CONNECTIONS)
+            
+            with self.ydl_pool.checkout(ydl_opts) as ydl:
+                info = self.get_reusable_info(url)
+                reused = info is not None
+                if not reused:
+                    # Extract first so the media cache can be checked before downloading
+                    with self.fetch_slot(url):
+                        info = ydl.extract_info(url, download=False)
+                    if self.info_cache:
+                        self.info_cache.set(url, info)
+                    info = copy.deepcopy(info)
+                
+                # Serve repeat requests for the same video and format from disk
+                cache_key = None
+                if self.media_cache and info.get('_type', 'video') == 'video' and info.get('id'):
+                    cache_key = media_key(info.get('extractor_key'), info['id'], ydl_opts['format'])
+                    cached_path = self.media_cache.get(cache_key)
+                    if cached_path:
+                        retention.touch(cached_path)
+                        if download_id:
+                            progress_store.update(download_id, {
+                                'status': 'finished',
+                                'filename': cached_path,
+                                'filepath': cached_path,
+                                'percent': '100%',
+                                'percent_value': 100.0,
+                                'cached': True
+                            })
+                        return {'success': True, 'filename': cached_path, 'cached': True}
+                
+                with self.transfer_slot(url):
+                    merge = None
+                    try:
+                        legs = []
+                        if split_legs:
+                            selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+                            legs = prefetch_legs(ydl, selected)
+                        if legs:
+                            # Merged on the post-processing pool once the transfer slot is free
+                            video_leg = next((fn for fn, f in legs if f.get('vcodec') != 'none'), legs[0][0])
+                            audio_leg = next(fn for fn, _ in legs if fn != video_leg)
+                            merge = (video_leg, audio_leg, ydl.prepare_filename(selected))
+                        else:
+                            # Skip the extractor and go straight to format selection and download
+                            result = ydl.process_ie_result(info, download=True)
+                    except yt_dlp.utils.DownloadError:
+                        if not reused:
+                            raise
+                        # Signed media URLs can be revoked before they expire; extract again
+                        with self.fetch_slot(url):
+                            info = ydl.extract_info(url, download=False)
+                        result = ydl.process_ie_result(info, download=True)
+            
+            postprocessed = None
+            if merge:
+                postprocessed = postprocess_pool.merge(*merge)
+                filepath = postprocessed['filepath']
+            else:
+                filepath = downloaded_filepath(result)
+            if convert_to_mp4 and filepath:
+                postprocessed = postprocess_pool.convert_to_mp4(filepath)
+                filepath = postprocessed['filepath']
+            if postprocessed:
+                postprocessed = {k: v for k, v in postprocessed.items() if k != 'filepath'}
+            
+            if filepath:
+                file_index.add(filepath, job_id=download_id)
+            if cache_key and filepath:
+                self.media_cache.put(cache_key, filepath)
                 
             if download_id:
-                download_progress[download_id]['status'] = 'finished'
+                progress_store.update(download_id, {'status': 'finished', 'filepath': filepath,
+                                                    'postprocess': postprocessed})
                 
-            return {'success': True}
+            return {'success': True, 'filename': filepath, 'postprocess': postprocessed}
             
         except Exception as e:
             if download_id:
-                download_progress[download_id]['status'] = 'error'
-                download_progress[download_id]['error'] = str(e)
-            return {'success': False, 'error': str(e)}
+                self._last_progress_update.pop(download_id, None)
+                if report_error:
+                    progress_store.update(download_id, {'status': 'error', 'error': str(e)})
+            return {'success': False, 'error': str(e), 'error_class': classify_error(e)}
     
-    def download_video_with_retry(self, url, format_id=None, download_id=None, max_retries=2):
-        """Download video with retry logic, especially for Instagram"""
-        for attempt in range(max_retries + 1):
-            try:
-                result = self.download_video(url, format_id, download_id)
-                if result['success']:
-                    return result
-            except Exception as e:
-                if attempt < max_retries:
-                    # For Instagram, try with different options on retry
-                    if 'instagram.com' in url.lower():
-                        time.sleep(2)  # Wait before retry
-                        continue
+    def resolve_stream(self, url, format_id=None):
+        """Pick the media URL to relay for a pass-through download
+        
+        Only single progressive formats can be relayed as they arrive; formats
+        that need merging or are fragmented (HLS/DASH) must use /download.
+        """
+        if format_id and '+' in format_id:
+            return {'success': False, 'error': 'Merged formats cannot be streamed, use a regular download'}
+        
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'format': format_id or 'best[height<=1080]/best',
+            'outtmpl': os.path.join(DOWNLOADS_FOLDER, '%(title)s.%(ext)s'),
+        }
+        if classify_url(url).platform == 'instagram':
+            ydl_opts['http_headers'] = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+        
+        try:
+            with self.fetch_slot(url, RATE_LIMIT_MAX_WAIT), self.ydl_pool.checkout(ydl_opts) as ydl:
+                info = self.get_reusable_info(url)
+                if info is None:
+                    info = ydl.extract_info(url, download=False)
+                    if self.info_cache:
+                        self.info_cache.set(url, info)
+                    info = copy.deepcopy(info)
+                if info.get('_type', 'video') != 'video':
+                    return {'success': False, 'error': 'Playlists cannot be streamed, use a regular download'}
+                
+                # Run format selection with this request's format
+                selected = ydl.process_ie_result(info, download=False)
+                if not is_progressive_format(selected):
+                    return {'success': False, 'error': 'This format cannot be streamed, use a regular download'}
+                filepath = ydl.prepare_filename(selected)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        
+        cache_key = None
+        cached_path = None
+        if self.media_cache and selected.get('id'):
+            cache_key = media_key(selected.get('extractor_key'), selected['id'], ydl_opts['format'])
+            cached_path = self.media_cache.get(cache_key)
+        
+        return {
+            'success': True,
+            'media_url': selected['url'],
+            'http_headers': selected.get('http_headers') or {},
+            'filepath': filepath,
+            'cache_key': cache_key,
+            'cached_path': cached_path
+        }
+
+    def download_video_with_retry(self, url, format_id=None, download_id=None, max_retries=None, retries=None):
+        """Download video, retrying only errors that a retry can fix
+        
+        Each failure is classified and retried according to RETRY_RULES, which
+        count the retries of each error class separately (`max_retries` caps
+        them in total). Rather than sleeping on a worker, the job raises
+        RetryLater and is queued again once the delay has passed; `retries`
+        carries the per-class counts into that run. Partial files are kept
+        between attempts so yt-dlp resumes them, and every attempt is
+        recorded in the job's progress entry.
+        """
+        retries = dict(retries or {})
+        result = self.download_video(url, format_id, download_id, report_error=False)
+        if result['success']:
+            return result
+        
+        error_class = result.get('error_class', ERROR_UNKNOWN)
+        retries[error_class] = retries.get(error_class, 0) + 1
+        attempts = sum(retries.values())
+        delay = retry_delay(error_class, retries[error_class])
+        if max_retries is not None and attempts > max_retries:
+            delay = None
+        if delay is not None and error_class == ERROR_THROTTLED and self.rate_limiter:
+            # Come back no sooner than the rule says, and not before the platform's backoff ends
+            delay = max(delay, self.rate_limiter.backoff_remaining(limit_key(url)))
+        
+        if download_id:
+            attempt = {
+                'attempt': attempts,
+                'error_class': error_class,
+                'error': result['error'][:500],
+                'retry_in': round(delay, 1) if delay is not None else None,
+                'at': time.time()
+            }
+            
+            def record(progress, final=delay is None):
+                progress['attempts'] = (progress.get('attempts') or []) + [attempt]
+                if final:
+                    progress['status'] = 'error'
+                    progress['error'] = result['error']
+                    progress['error_class'] = error_class
                 else:
-                    if download_id:
-                        download_progress[download_id]['status'] = 'error'
-                        download_progress[download_id]['error'] = str(e)
-                    return {'success': False, 'error': str(e)}
+                    progress['status'] = 'retrying'
+            
+            progress_store.modify(download_id, record)
         
-        return {'success': False, 'error': 'Max retries exceeded'}
+        if delay is None:
+            return result
+        raise RetryLater(delay, retries=retries)
 
     def progress_hook(self, d, download_id):
-        """Progress hook for download tracking"""
-        if download_id and download_id in download_progress:
-            if d['status'] == 'downloading':
-                # Clean ANSI color codes from progress strings
-                percent = clean_ansi_codes(d.get('_percent_str', '0%'))
-                speed = clean_ansi_codes(d.get('_speed_str', 'N/A'))
-                
-                download_progress[download_id].update({
-                    'status': 'downloading',
-                    'percent': percent,
-                    'speed': speed,
-                    'filename': d.get('filename', '')
-                })
-            elif d['status'] == 'finished':
-                download_progress[download_id].update({
-                    'status': 'finished',
-                    'filename': d.get('filename', '')
-                })
-
-    def get_playlist_info(self, url):
-        """Extract playlist information without downloading"""
+        """Progress hook for download tracking (yt-dlp calls this for every chunk)"""
+        if not download_id:
+            return
+        
+        retention.protect(d.get('filename'), owner=download_id)
+        if d['status'] == 'downloading':
+            # Only write to the store once per PROGRESS_UPDATE_INTERVAL
+            now = time.monotonic()
+            if now - self._last_progress_update.get(download_id, 0) < PROGRESS_UPDATE_INTERVAL:
+                return
+            self._last_progress_update[download_id] = now
+            progress_store.update(download_id, progress_fields(d))
+        elif d['status'] == 'finished':
+            self._last_progress_update.pop(download_id, None)
+            downloaded = d.get('downloaded_bytes') or d.get('total_bytes')
+            # Report the average speed of the finished file
+            speed = downloaded / d['elapsed'] if downloaded and d.get('elapsed') else None
+            progress_store.update(download_id, {
+                'status': 'finished',
+                'filename': d.get('filename', ''),
+                'percent': '100%',
+                'percent_value': 100.0,
+                'speed': format_speed(speed),
+                'speed_bytes': speed,
+                'downloaded_bytes': downloaded,
+                'total_bytes': d.get('total_bytes') or downloaded,
+                'eta': 0
+            })
+
+    @staticmethod
+    def playlist_variant(page, page_size, flat=True):
+        """Info cache variant for a (page of a) playlist listing"""
+        mode = 'flat' if flat else 'full'
+        return f'{mode}:{page}:{page_size}' if page else mode
+    
+    def get_playlist_info(self, url, page=None, page_size=None, flat=True, max_wait=RATE_LIMIT_MAX_WAIT):
+        """Extract playlist information without downloading
+        
+        In flat mode entries are listed without resolving each video, which
+        needs one request per playlist page instead of one per video. Pass
+        `page` (1-based) to fetch a single page of `page_size` entries;
+        per-video details can then be resolved on demand through get_video_info.
+        `max_wait` is passed to extract_info.
+        """
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts_info) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Check if it's a playlist
-                if 'entries' not in info:
-                    return {'success': False, 'error': 'URL is not a playlist'}
-                
-                playlist_info = {
-                    'title': info.get('title', 'Unknown Playlist'),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'description': info.get('description', ''),
-                    'video_count': len(info['entries']),
-                    'url': url,
-                    'videos': [],
-                    'is_playlist': True  # Add this flag to identify playlist responses
-                }
-                
-                # Extract video information from playlist
-                for entry in info['entries']:
-                    if entry:  # Some entries might be None
-                        video_info = {
-                            'id': entry.get('id', 'Unknown'),
-                            'title': entry.get('title', 'Unknown'),
-                            'duration': entry.get('duration'),
-                            'uploader': entry.get('uploader', 'Unknown'),
-                            'thumbnail': entry.get('thumbnail'),
-                            'url': entry.get('webpage_url', entry.get('url', ''))
-                        }
-                        playlist_info['videos'].append(video_info)
-                
-                return {'success': True, 'data': playlist_info}
-                
+            ydl_opts = dict(self.ydl_opts_info)
+            if flat:
+                ydl_opts['extract_flat'] = 'in_playlist'
+            if page:
+                page_size = page_size or PLAYLIST_PAGE_SIZE
+                start = (page - 1) * page_size + 1
+                ydl_opts['lazy_playlist'] = True
+                ydl_opts['playlist_items'] = f'{start}:{start + page_size - 1}'
+            
+            info = self.extract_info(url, ydl_opts, variant=self.playlist_variant(page, page_size, flat),
+                                     max_wait=max_wait)
+            
+            # Check if it's a playlist
+            if 'entries' not in info:
+                return {'success': False, 'error': 'URL is not a playlist'}
+            
+            return {'success': True, 'data': self.build_playlist_info(info, url, page, page_size)}
+            
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def download_playlist(self, url, download_id=None, max_downloads=None):
+    def build_playlist_info(self, info, url, page=None, page_size=None):
+        """Build the playlist response from a (possibly flat) playlist info dict"""
+        entries = [entry for entry in info['entries'] if entry]  # Some entries might be None
+        
+        # Lazily extracted playlists don't always know their total length
+        video_count = info.get('playlist_count')
+        if video_count is None and not page:
+            video_count = len(entries)
+        
+        playlist_info = {
+            'title': info.get('title', 'Unknown Playlist'),
+            'uploader': info.get('uploader', 'Unknown'),
+            'description': info.get('description', ''),
+            'video_count': video_count,
+            'url': url,
+            'videos': [],
+            'is_playlist': True  # Add this flag to identify playlist responses
+        }
+        
+        if page:
+            playlist_info.update({
+                'page': page,
+                'page_size': page_size,
+                'has_more': (page * page_size < video_count) if video_count is not None
+                            else len(entries) >= page_size
+            })
+        
+        # Extract video information from playlist
+        for entry in entries:
+            thumbnail = entry.get('thumbnail')
+            if not thumbnail and entry.get('thumbnails'):
+                thumbnail = entry['thumbnails'][-1].get('url')
+            
+            video_info = {
+                'id': entry.get('id', 'Unknown'),
+                'title': entry.get('title', 'Unknown'),
+                'duration': entry.get('duration'),
+                'uploader': entry.get('uploader', entry.get('channel', 'Unknown')),
+                'thumbnail': thumbnail,
+                'url': entry.get('webpage_url', entry.get('url', ''))
+            }
+            playlist_info['videos'].append(video_info)
+        
+        return playlist_info
+    
+    def download_playlist(self, url, download_id=None, max_downloads=None, concurrency=None):
         """Download entire playlist"""
+        concurrency = PLAYLIST_CONCURRENCY if concurrency is None else concurrency
+        if concurrency > 1:
+            return self.download_playlist_concurrent(url, download_id, max_downloads, concurrency)
+        
         try:
             ydl_opts = {
                 'format': 'best[height<=1080]',  # Allow up to 1080p for faster downloads
@@ -425,26 +742,131 @@ class VideoDownloader:
                 'progress_hooks': [lambda d: self.progress_hook(d, download_id)],
                 'merge_output_format': 'mp4',
                 'noplaylist': False,  # Enable playlist download
+                'lazy_playlist': True,  # Only enumerate the entries that will be downloaded
+                'concurrent_fragment_downloads': fragment_workers(1, FRAGMENT_CONCURRENCY, MAX_JOB_CONNECTIONS),
             }
             
             # Limit number of downloads if specified
             if max_downloads:
                 ydl_opts['playlistend'] = max_downloads
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            # Continue after the last item finished before a restart
+            items_done = 0
+            if job_journal and download_id:
+                items_done = (job_journal.get_checkpoint(download_id) or {}).get('items_done', 0)
+            if items_done:
+                ydl_opts['playliststart'] = items_done + 1
+            
+            def item_finished(filepath):
+                # Items complete in playlist order, so a count is enough to resume from
+                nonlocal items_done
+                items_done += 1
+                job_journal.checkpoint(download_id, {'items_done': items_done})
+            
+            if job_journal and download_id:
+                ydl_opts['post_hooks'] = [item_finished]
+            
+            # Entries are extracted one by one as the playlist downloads, so the whole run
+            # counts as a transfer rather than holding a metadata fetch slot
+            with self.transfer_slot(url), self.ydl_pool.checkout(ydl_opts) as ydl:
+                result = ydl.extract_info(url, download=True)
+            
+            # Remember the playlist folder yt-dlp created so it can be zipped later
+            folder = None
+            for entry in (result or {}).get('entries') or []:
+                filepath = downloaded_filepath(entry)
+                if filepath:
+                    folder = folder or os.path.dirname(filepath)
+                    file_index.add(filepath, job_id=download_id)
                 
             if download_id:
-                download_progress[download_id]['status'] = 'completed'
+                progress_store.update(download_id, {'status': 'completed', 'folder': folder})
                 
             return {'success': True}
             
         except Exception as e:
             if download_id:
-                download_progress[download_id]['status'] = 'error'
-                download_progress[download_id]['error'] = str(e)
+                progress_store.update(download_id, {'status': 'error', 'error': str(e)})
             return {'success': False, 'error': str(e)}
 
+    def download_playlist_concurrent(self, url, download_id=None, max_downloads=None, concurrency=3):
+        """Download playlist entries in parallel, isolating per-item failures"""
+        try:
+            # List the entries flat; only the first max_downloads are enumerated. Queued jobs
+            # wait out the platform's backoff rather than failing like interactive requests.
+            if max_downloads:
+                result = self.get_playlist_info(url, page=1, page_size=max_downloads, max_wait=None)
+            else:
+                result = self.get_playlist_info(url, max_wait=None)
+            if not result['success']:
+                raise Exception(result['error'])
+            
+            playlist_data = result['data']
+            videos = [video for video in playlist_data['videos'] if video.get('url')]
+            if max_downloads:
+                videos = videos[:max_downloads]
+            if not videos:
+                raise Exception('Playlist has no downloadable videos')
+            
+            folder = os.path.join(DOWNLOADS_FOLDER, yt_dlp.utils.sanitize_filename(playlist_data['title']))
+            index_width = len(str(len(videos)))
+            tracker = PlaylistProgress(download_id, len(videos))
+            
+            # Skip the items finished before a restart
+            checkpoint_lock = threading.Lock()
+            done_items = set()
+            if job_journal and download_id:
+                done_items = set((job_journal.get_checkpoint(download_id) or {}).get('done_items', []))
+            for index in done_items:
+                tracker.finish_item(index)
+            
+            def download_item(index, video):
+                ydl_opts = {
+                    'format': 'best[height<=1080]',  # Allow up to 1080p for faster downloads
+                    'outtmpl': os.path.join(folder, f'{index + 1:0{index_width}d} - %(title)s.%(ext)s'),
+                    'progress_hooks': [tracker.hook(index)],
+                    'merge_output_format': 'mp4',
+                    'noplaylist': True,
+                    'quiet': True,
+                    'no_warnings': True,
+                    'noprogress': True,
+                    'concurrent_fragment_downloads': fragment_workers(concurrency, FRAGMENT_CONCURRENCY, MAX_JOB_CONNECTIONS),
+                }
+                try:
+                    with self.ydl_pool.checkout(ydl_opts) as ydl:
+                        with self.fetch_slot(video['url']):
+                            info = ydl.extract_info(video['url'], download=False)
+                        with self.transfer_slot(video['url']):
+                            filepath = downloaded_filepath(ydl.process_ie_result(info, download=True))
+                    if filepath:
+                        file_index.add(filepath, job_id=download_id)
+                    tracker.finish_item(index)
+                    if job_journal and download_id:
+                        with checkpoint_lock:
+                            done_items.add(index)
+                            job_journal.checkpoint(download_id, {'done_items': sorted(done_items)})
+                except Exception as e:
+                    # One broken video must not abort the rest of the playlist
+                    tracker.finish_item(index, url=video['url'], error=str(e))
+            
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='playlist-item') as executor:
+                for index, video in enumerate(videos):
+                    if index not in done_items:
+                        executor.submit(download_item, index, video)
+            
+            if tracker.items_failed == len(videos):
+                raise Exception(f'All {len(videos)} playlist videos failed to download')
+            
+            if download_id:
+                progress_store.update(download_id, {'status': 'completed', 'folder': folder})
+            
+            return {'success': True, 'failed_items': tracker.failed_items}
+            
+        except Exception as e:
+            if download_id:
+                progress_store.update(download_id, {'status': 'error', 'error': str(e)})
+            return {'success': False, 'error': str(e)}
+    
     def get_instagram_best_format(self, url):
         """Get best available format for Instagram specifically"""
         try:
@@ -456,132 +878,242 @@ class VideoDownloader:
                 }
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if 'formats' in info and info['formats']:
-                    # Look for the best video format (Instagram usually has separate video/audio)
-                    best_video = None
-                    best_audio = None
-                    best_combined = None
-                    
-                    for f in info['formats']:
-                        if not f.get('url'):
-                            continue
-                        
-                        has_video = f.get('vcodec') and f.get('vcodec') != 'none'
-                        has_audio = f.get('acodec') and f.get('acodec') != 'none'
-                        height = f.get('height', 0) if f.get('height') else 0
-                        
-                        # Check for combined format (rare but preferred)
-                        if has_video and has_audio:
-                            if not best_combined or height > best_combined.get('height', 0):
-                                best_combined = f
-                        
-                        # Track best video-only format
-                        elif has_video:
-                            if not best_video or height > best_video.get('height', 0):
-                                best_video = f
-                        
-                        # Track best audio-only format
-                        elif has_audio:
-                            if not best_audio:
-                                best_audio = f
-                    
-                    # Return the best available format ID
-                    if best_combined:
-                        return best_combined.get('format_id', 'best')
-                    elif best_video:
-                        # For Instagram, if we have video-only, try to get best quality
-                        return best_video.get('format_id', 'best')
-                    elif best_audio:
-                        return best_audio.get('format_id', 'best')
-                        
+            info = self.extract_info(url, ydl_opts)
+            
+            _, best_format_id = rank_formats(info.get('formats'), 'instagram')
+            if best_format_id:
+                return best_format_id
+            
             # Fallback format string for Instagram
             return 'best[height<=1080]/best'
             
         except Exception:
             return 'best[height<=1080]/best'
+
+info_cache = create_info_cache(
+    path=os.getenv('INFO_CACHE_PATH'),
+    ttl=int(os.getenv('INFO_CACHE_TTL', 600)),
+    max_entries=int(os.getenv('INFO_CACHE_SIZE', 500))
+)
+media_cache = MediaCache(
+    index_path=os.path.join(CACHE_FOLDER, 'media_index.db'),
+    max_bytes=int(os.getenv('MEDIA_CACHE_MAX_BYTES', 5 * 1024 ** 3))
+) if os.getenv('MEDIA_CACHE_ENABLED', 'true').lower() == 'true' else None
+# Warm YoutubeDL instances shared by info extraction and downloads
+ydl_pool = YoutubeDLPool(max_idle_per_profile=int(os.getenv('YDL_POOL_SIZE', 4)))
+# Shared pacing of requests to each platform, across extraction and downloads
+rate_limiter = PlatformRateLimiter(PLATFORM_LIMITS, THROTTLE_BACKOFF_BASE, THROTTLE_BACKOFF_MAX)
+# ffmpeg work runs on its own pool, apart from the download workers
+postprocess_pool = PostProcessPool(workers=POSTPROCESS_WORKERS)
+downloader = VideoDownloader(info_cache=info_cache, media_cache=media_cache, ydl_pool=ydl_pool,
+                             rate_limiter=rate_limiter)
+
+# Listing index of DOWNLOADS_FOLDER; rebuilt from disk on startup, then kept current
+file_index = FileIndex(DOWNLOADS_FOLDER, os.path.join(CACHE_FOLDER, 'file_index.db'))
+threading.Thread(target=file_index.rescan, kwargs={'skip': PARTIAL_FILE_RE.search},
+                 name='file-index-rescan', daemon=True).start()
+
+def forget_file(path):
+    """Drop a file removed by the retention sweeper from the indexes"""
+    file_index.remove(path)
+    if media_cache:
+        media_cache.forget_path(path)
+
+# Keep DOWNLOADS_FOLDER from filling the disk on long-running instances
+retention = RetentionSweeper(
+    DOWNLOADS_FOLDER,
+    max_age=int(os.getenv('RETENTION_MAX_AGE', 24 * 3600)),
+    max_bytes=int(os.getenv('RETENTION_MAX_BYTES', 10 * 1024 ** 3)),
+    interval=int(os.getenv('RETENTION_INTERVAL', 300)),
+    partial_grace=int(os.getenv('PARTIAL_FILE_GRACE', 3600)),
+    on_remove=forget_file,
+    on_scan=file_index.sync
+)
+retention.start()
+
+# Queued and running jobs, kept on disk so a restart can pick them up again. Resuming
+# needs the journal (CACHE_FOLDER) and the partial files (DOWNLOADS_FOLDER) to outlive
+# the process, which the temp folders used when they aren't configured don't.
+JOB_JOURNAL_ENABLED = os.getenv('JOB_JOURNAL_ENABLED', 'true').lower() == 'true'
+if JOB_JOURNAL_ENABLED and not (os.getenv('DOWNLOADS_FOLDER') and os.getenv('CACHE_FOLDER')):
+    app.logger.warning('Job journal disabled: set DOWNLOADS_FOLDER and CACHE_FOLDER to persistent '
+                       'folders to resume jobs after a restart')
+    JOB_JOURNAL_ENABLED = False
+job_journal = JobJournal(
+    os.path.join(CACHE_FOLDER, 'jobs.db'),
+    stale_after=int(os.getenv('JOB_JOURNAL_STALE_AFTER', 45))
+) if JOB_JOURNAL_ENABLED else None
+
+def update_job_state(download_id, state, error=None):
+    """Record scheduler state changes in the progress entry"""
+    batch_ids = []
     
-    def get_instagram_enhanced_formats(self, info):
-        """Create enhanced format list for Instagram with virtual combined formats"""
-        original_formats = []
-        video_formats = []
-        audio_formats = []
-        
-        # Separate formats by type
-        for f in info.get('formats', []):
-            if not f.get('url'):
-                continue
-                
-            has_video = f.get('vcodec') and f.get('vcodec') != 'none'
-            has_audio = f.get('acodec') and f.get('acodec') != 'none'
-            
-            if has_video and has_audio:
-                original_formats.append(f)
-            elif has_video:
-                video_formats.append(f)
-            elif has_audio:
-                audio_formats.append(f)
-        
-        enhanced_formats = []
-        
-        # Add original combined formats first
-        for f in original_formats:
-            enhanced_formats.append(f)
-        
-        # Create virtual combined formats if we have separate video and audio
-        if video_formats and audio_formats:
-            best_audio = max(audio_formats, key=lambda x: x.get('abr', 0) or 0)
-            
-            for video_fmt in video_formats:
-                height = video_fmt.get('height', 0)
-                width = video_fmt.get('width', 0)
-                
-                # Create virtual combined format
-                virtual_format = {
-                    'format_id': f"{video_fmt['format_id']}+{best_audio['format_id']}",
-                    'ext': 'mp4',
-                    'resolution': f"{width}x{height}" if width and height else f"{height}p" if height else 'Unknown',
-                    'height': height,
-                    'width': width,
-                    'vcodec': video_fmt.get('vcodec', 'unknown'),
-                    'acodec': best_audio.get('acodec', 'unknown'),
-                    'fps': video_fmt.get('fps'),
-                    'filesize': (video_fmt.get('filesize', 0) or 0) + (best_audio.get('filesize', 0) or 0),
-                    'has_video': True,
-                    'has_audio': True,
-                    'quality_score': 10000 + height,  # High priority for virtual combined
-                    'is_best': False,
-                    'is_virtual': True,  # Mark as virtual format
-                    'video_format_id': video_fmt['format_id'],
-                    'audio_format_id': best_audio['format_id']
-                }
-                enhanced_formats.append(virtual_format)
-        
-        # Only return combined formats (original + virtual), exclude video-only and audio-only
-        
-        return enhanced_formats
+    def apply(progress):
+        batch_ids.extend(progress.get('batch_ids') or [])
+        progress['state'] = state
+        if state == STATE_RUNNING and progress.get('status') == 'queued':
+            progress['status'] = 'starting'
+        elif state == STATE_FAILED:
+            progress['status'] = 'error'
+            if error and not progress.get('error'):
+                progress['error'] = error
+    
+    progress_store.modify(download_id, apply)
+    if state in (STATE_DONE, STATE_FAILED):
+        retention.release(download_id)
+        if job_journal:
+            job_journal.finish(download_id)
+        for batch_id in batch_ids:
+            settle_batch(batch_id)
+
+download_queue = DownloadQueue(
+    max_workers=CONCURRENT_DOWNLOADS,
+    max_queued=MAX_QUEUED_DOWNLOADS,
+    on_state_change=update_job_state
+)
+
+playlist_expander = PlaylistExpander(
+    downloader.get_playlist_info,
+    max_workers=PLAYLIST_EXPANSION_WORKERS
+)
+
+def collect_playlist_expansion(token):
+    """Gather the playlists of a batch that finish expanding before the deadline"""
+    finished, pending, continuation = playlist_expander.collect(token, PLAYLIST_EXPANSION_TIMEOUT)
+    
+    playlists = []
+    failed_urls = []
+    for url, result in finished:
+        if isinstance(result, dict) and result.get('success'):
+            playlists.append((url, result['data']))
+        else:
+            # If playlist processing fails, treat as individual URL
+            failed_urls.append(url)
+    
+    return playlists, failed_urls, pending, continuation
+
+def new_download_id(prefix):
+    """Generate a collision-free download ID"""
+    return f'{prefix}_{uuid.uuid4().hex}'
+
+def batch_members(batch_id):
+    """Download IDs of a batch queued by /batch_download, or None if it is unknown"""
+    record = progress_store.get(batch_id) if batch_id else None
+    return record.get('download_ids') if record else None
+
+def settle_batch(batch_id):
+    """Mark a batch completed once all its downloads have finished, so it expires with them"""
+    download_ids = batch_members(batch_id)
+    if download_ids is None:
+        return
+    for download_id in download_ids:
+        progress = progress_store.get(download_id)
+        if progress is not None and not is_finished(progress):
+            return
+    progress_store.update(batch_id, {'status': 'completed'})
+
+def queue_download(download_id, progress, func, args, priority, dedupe_key):
+    """Register progress for a new job and queue it on the worker pool
+    
+    If an identical job (same dedupe key) is already queued or running, the
+    new entry is dropped and the existing job's ID is returned instead.
+    Returns (download_id, deduplicated); raises QueueFullError.
+    """
+    progress_store.create(download_id, progress)
+    # Journal before queueing so a fast worker can't finish the job before it is recorded
+    journaled = job_journal is not None and func.__name__ in RESUMABLE_JOBS
+    if journaled:
+        job_journal.record(download_id, func.__name__, args, priority, dedupe_key, progress)
+    try:
+        job_id = download_queue.submit(download_id, func, *args, priority=priority, dedupe_key=dedupe_key)
+    except QueueFullError:
+        progress_store.delete(download_id)
+        if journaled:
+            job_journal.finish(download_id)
+        raise
+    
+    if job_id != download_id:
+        progress_store.delete(download_id)
+        if journaled:
+            job_journal.finish(download_id)
+        return job_id, True
+    return download_id, False
+
+# Jobs the journal can queue again after a restart, by function name
+RESUMABLE_JOBS = {
+    'download_video_with_retry': downloader.download_video_with_retry,
+    'download_playlist': downloader.download_playlist,
+}
+
+def resume_job(job):
+    """Queue a job left unfinished by a process that stopped"""
+    func = RESUMABLE_JOBS.get(job['func'])
+    if func is None:
+        job_journal.finish(job['id'])
+        return
+    progress_store.create(job['id'], dict(job['progress'], status='queued', resumed=True))
+    while True:
+        try:
+            job_id = download_queue.submit(job['id'], func, *job['args'], priority=job['priority'],
+                                           dedupe_key=job['dedupe_key'])
+            break
+        except QueueFullError:
+            time.sleep(BATCH_INGEST_WAIT)
+    if job_id != job['id']:
+        progress_store.delete(job['id'])
+        job_journal.finish(job['id'])
+
+if job_journal:
+    job_journal.start(resume_job)
+
+def queue_full_response(message):
+    """Build the 429 response returned when the download queue is full"""
+    response = jsonify({'success': False, 'error': message, 'status': 'queue_full'})
+    response.status_code = 429
+    response.headers['Retry-After'] = '30'
+    return response
+
+def send_download(filepath, filename):
+    """Serve a downloaded file with conditional and Range support
+
+    Responses carry an ETag and Last-Modified and honour If-None-Match,
+    If-Modified-Since, Range and If-Range, so interrupted transfers can be
+    resumed. Full responses go through the server's wsgi.file_wrapper (so
+    gunicorn can use sendfile); partial ones through Werkzeug's range
+    iterator, which stops at the end of the range.
+    """
+    if SENDFILE_MODE == 'x-accel-redirect':
+        # nginx serves the file (including ranges) from an internal location
+        response = werkzeug_send_file(
+            filepath, request.environ, as_attachment=True,
+            use_x_sendfile=True, response_class=app.response_class
+        )
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX + quote(filename.replace(os.sep, '/'))
+        return response
+    
+    response = send_file(filepath, as_attachment=True, conditional=True, etag=True)
+    if response.status_code == 200:
+        # Werkzeug only advertises ranges when answering a Range request
+        response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
-downloader = VideoDownloader()
+def list_folder_files(folder):
+    """Completed files below a folder, skipping in-progress partial files"""
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if not PARTIAL_FILE_RE.search(name):
+                paths.append(os.path.join(root, name))
+    return paths
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def is_valid_url(url):
     """Check if URL is from supported platforms"""
-    patterns = [
-        r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/',
-        r'(https?://)?(www\.)?instagram\.com/',
-        r'(https?://)?(www\.)?tiktok\.com/',
-        r'(https?://)?(www\.)?twitter\.com/',
-        r'(https?://)?(www\.)?facebook\.com/'
-    ]
-    
-    for pattern in patterns:
-        if re.search(pattern, url, re.IGNORECASE):
-            return True
-    return False
+    return classify_url(url).platform is not None
 
 @app.route('/')
 def index():
@@ -593,7 +1125,17 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'video-downloader',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'queue': download_queue.stats(),
+        'info_cache': info_cache.stats(),
+        'progress_store': progress_store.stats(),
+        'media_cache': media_cache.stats() if media_cache else None,
+        'retention': retention.stats(),
+        'file_index': file_index.stats(),
+        'ydl_pool': ydl_pool.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'postprocess': postprocess_pool.stats(),
+        'job_journal': job_journal.stats() if job_journal else None
     }), 200
 
 @app.route('/video_info', methods=['POST'])
@@ -622,34 +1164,147 @@ def download_video():
         return jsonify({'success': False, 'error': 'URL is required'})
     
     # Generate unique download ID
-    download_id = f"download_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    
-    # Initialize progress tracking
-    download_progress[download_id] = {
-        'status': 'starting',
-        'percent': '0%',
-        'speed': 'N/A',
-        'url': url
-    }
+    download_id = new_download_id('download')
+    
+    # Hand the download to the worker pool (interactive downloads go first);
+    # repeated requests for the same video and format attach to the running job
+    try:
+        download_id, deduplicated = queue_download(
+            download_id,
+            {'status': 'queued', 'percent': '0%', 'speed': 'N/A', 'url': url},
+            downloader.download_video_with_retry, (url, format_id, download_id),
+            priority=PRIORITY_HIGH,
+            dedupe_key=('video', canonical_url(url), format_id)
+        )
+    except QueueFullError as e:
+        return queue_full_response(str(e))
+    
+    return jsonify({
+        'success': True,
+        'download_id': download_id,
+        'status': 'queued',
+        'deduplicated': deduplicated
+    })
+
+@app.route('/stream')
+def stream_video():
+    """Relay a single progressive format to the client while it downloads"""
+    url = request.args.get('url', '').strip()
+    format_id = request.args.get('format_id') or None
+    
+    if not url:
+        return jsonify({'success': False, 'error': 'URL is required'}), 400
+    
+    if not is_valid_url(url):
+        return jsonify({'success': False, 'error': 'Unsupported URL format'}), 400
     
-    # Start download in background thread
-    thread = threading.Thread(
-        target=downloader.download_video_with_retry,
-        args=(url, format_id, download_id)
+    result = downloader.resolve_stream(url, format_id)
+    if not result['success']:
+        return jsonify(result), 409
+    
+    # Already downloaded: serve the file with full Range support
+    cached_path = result['cached_path']
+    if cached_path and os.path.dirname(cached_path).startswith(DOWNLOADS_FOLDER):
+        retention.touch(cached_path)
+        return send_download(cached_path, os.path.relpath(cached_path, DOWNLOADS_FOLDER))
+    
+    tee_path = None
+    on_complete = None
+    if STREAM_TEE and result['cache_key'] and 'Range' not in request.headers:
+        # Keep a copy so the next request for this video is served from disk
+        tee_path = result['filepath']
+        def on_complete(path):
+            file_index.add(path)
+            media_cache.put(result['cache_key'], path)
+    
+    stream = PassthroughStream(
+        result['media_url'],
+        http_headers=result['http_headers'],
+        range_header=request.headers.get('Range'),
+        tee_path=tee_path,
+        on_complete=on_complete
     )
-    thread.daemon = True
-    thread.start()
+    try:
+        stream.open()
+    except requests.RequestException as e:
+        return jsonify({'success': False, 'error': f'Could not reach the media server: {e}'}), 502
     
-    return jsonify({'success': True, 'download_id': download_id})
+    headers = stream.headers()
+    headers['Content-Disposition'] = content_disposition(os.path.basename(result['filepath']))
+    headers['X-Accel-Buffering'] = 'no'
+    return Response(stream_with_context(stream), status=stream.status_code, headers=headers, direct_passthrough=True)
 
 @app.route('/progress/<download_id>')
 def get_progress(download_id):
     """Get download progress"""
-    if download_id in download_progress:
-        return jsonify(download_progress[download_id])
+    progress = progress_store.get(download_id)
+    if progress is not None:
+        return jsonify(progress)
     else:
         return jsonify({'status': 'not_found'})
 
+@app.route('/progress_stream')
+def progress_stream():
+    """Stream progress for several downloads over one Server-Sent Events connection
+    
+    Usage: /progress_stream?ids=<id1>,<id2>,... or ?batch=<batch_id> - an event
+    is sent whenever a download's progress changes, and a final 'done' event
+    once all have finished.
+    """
+    batch_id = request.args.get('batch')
+    if batch_id:
+        download_ids = batch_members(batch_id)
+        if download_ids is None:
+            return jsonify({'success': False, 'error': 'Unknown batch'}), 404
+        download_ids = download_ids[:MAX_STREAM_IDS]
+    else:
+        download_ids = [i for i in request.args.get('ids', '').split(',') if i][:MAX_STREAM_IDS]
+    if not download_ids:
+        return jsonify({'success': False, 'error': 'No download IDs provided'}), 400
+    
+    def generate():
+        last_sent = {}
+        active = list(download_ids)
+        version = None
+        started = last_event = time.time()
+        
+        # Tell the browser how long to wait before reconnecting
+        yield 'retry: 2000\n\n'
+        
+        while active and time.time() - started < SSE_MAX_DURATION:
+            for download_id in list(active):
+                progress = progress_store.get(download_id)
+                if progress is None:
+                    progress = {'status': 'not_found'}
+                
+                payload = json.dumps(dict(progress, download_id=download_id))
+                if payload != last_sent.get(download_id):
+                    last_sent[download_id] = payload
+                    last_event = time.time()
+                    yield f'event: progress\ndata: {payload}\n\n'
+                
+                if progress['status'] == 'not_found' or is_finished(progress):
+                    active.remove(download_id)
+            
+            if not active:
+                break
+            
+            if time.time() - last_event >= SSE_KEEPALIVE_INTERVAL:
+                last_event = time.time()
+                yield ': keepalive\n\n'
+            
+            # Coalesce bursts of hook updates, then sleep until something changes
+            time.sleep(SSE_MIN_INTERVAL)
+            version = progress_store.wait_for_change(version, timeout=SSE_POLL_INTERVAL)
+        
+        if not active:
+            yield 'event: done\ndata: {}\n\n'
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+
 @app.route('/batch_upload', methods=['POST'])
 def batch_upload():
     """Handle batch upload of URLs from file"""
@@ -664,26 +1319,21 @@ def batch_upload():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Unique name: large files are still being read after this request returns
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
         file.save(filepath)
         
+        # Large files are queued straight from disk instead of listed for selection
+        if os.path.getsize(filepath) > BATCH_PREVIEW_MAX_BYTES:
+            ingest_id = new_download_id('ingest')
+            progress_store.create(ingest_id, {'status': 'ingesting', 'filename': filename})
+            threading.Thread(target=ingest_batch_file, args=(ingest_id, filepath),
+                             name='batch-ingest', daemon=True).start()
+            return render_template('batch_download.html', urls=[], ingest_id=ingest_id, filename=filename)
+        
         # Read URLs from file and process them (including playlists)
-        raw_urls = []
         try:
-            if filename.endswith('.csv'):
-                with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-                    reader = csv.reader(csvfile)
-                    for row in reader:
-                        if row and len(row) > 0:
-                            url = row[0].strip()
-                            if url and is_valid_url(url):
-                                raw_urls.append(url)
-            else:  # txt file
-                with open(filepath, 'r', encoding='utf-8') as txtfile:
-                    for line in txtfile:
-                        url = line.strip()
-                        if url and is_valid_url(url):
-                            raw_urls.append(url)
+            raw_urls = list(UploadParser(filepath))
             
             # Clean up uploaded file
             os.remove(filepath)
@@ -691,37 +1341,41 @@ def batch_upload():
             # Process URLs and expand playlists
             all_urls = []
             playlist_info = []
+            playlist_urls = []
             
-            for url in raw_urls:
-                if 'list=' in url or 'playlist' in url.lower():
-                    try:
-                        playlist_result = downloader.get_playlist_info(url)
-                        if playlist_result['success']:
-                            playlist_data = playlist_result['data']
-                            playlist_info.append({
-                                'title': playlist_data.get('title', 'Unknown Playlist'),
-                                'video_count': len(playlist_data['videos']),
-                                'original_url': url
-                            })
-                            
-                            # Add all playlist videos to download list
-                            for video in playlist_data['videos']:
-                                if video.get('url'):
-                                    all_urls.append(video['url'])
-                        else:
-                            # If playlist processing fails, add as individual URL
-                            all_urls.append(url)
-                    except Exception:
-                        # If playlist processing fails, add as individual URL
-                        all_urls.append(url)
+            for url, classified in raw_urls:
+                if is_playlist_url(classified):
+                    playlist_urls.append(url)
                 else:
                     all_urls.append(url)
             
+            # Expand playlists concurrently; the page picks up slow ones via the continuation token
+            continuation = None
+            pending_playlists = 0
+            if playlist_urls:
+                playlists, failed_urls, pending_playlists, continuation = collect_playlist_expansion(
+                    playlist_expander.start(playlist_urls)
+                )
+                for url, playlist_data in playlists:
+                    playlist_info.append({
+                        'title': playlist_data.get('title', 'Unknown Playlist'),
+                        'video_count': len(playlist_data['videos']),
+                        'original_url': url
+                    })
+                    
+                    # Add all playlist videos to download list
+                    for video in playlist_data['videos']:
+                        if video.get('url'):
+                            all_urls.append(video['url'])
+                all_urls.extend(failed_urls)
+            
             return render_template('batch_download.html', 
                                  urls=all_urls, 
                                  playlist_info=playlist_info,
                                  original_count=len(raw_urls),
-                                 expanded_count=len(all_urls))
+                                 expanded_count=len(all_urls),
+                                 continuation=continuation,
+                                 pending_playlists=pending_playlists)
             
         except Exception as e:
             flash(f'Error reading file: {str(e)}')
@@ -730,6 +1384,71 @@ def batch_upload():
     flash('Invalid file format. Please upload a CSV or TXT file.')
     return redirect(url_for('index'))
 
+def ingest_batch_file(ingest_id, filepath):
+    """Queue every URL of an uploaded file while it is being parsed
+    
+    URLs are read incrementally and submitted in chunks. When the download
+    queue is full, parsing waits for room, so memory stays constant and the
+    first downloads start long before a large file has been read.
+    """
+    parser = UploadParser(filepath)
+    counts = {'queued': 0, 'playlists': 0, 'deduplicated': 0}
+    recent_ids = deque(maxlen=20)
+    
+    def report(status):
+        progress_store.update(ingest_id, {
+            'status': status,
+            'lines': parser.lines,
+            'invalid': parser.invalid,
+            'duplicates': parser.duplicates,
+            'recent_download_ids': list(recent_ids),
+            **counts
+        })
+    
+    def submit(url, classified):
+        if is_playlist_url(classified):
+            download_id = new_download_id('playlist')
+            progress = {'status': 'queued', 'percent': '0%', 'speed': 'N/A', 'url': url, 'type': 'playlist'}
+            func, args = downloader.download_playlist, (url, download_id, None, None)
+            dedupe_key = ('playlist', classified.normalized, None)
+            counts['playlists'] += 1
+        else:
+            download_id = new_download_id('batch')
+            progress = {'status': 'queued', 'percent': '0%', 'speed': 'N/A', 'url': url}
+            func, args = downloader.download_video_with_retry, (url, None, download_id)
+            dedupe_key = ('video', classified.normalized, None)
+        
+        while True:
+            try:
+                job_id, deduplicated = queue_download(download_id, progress, func, args, PRIORITY_LOW, dedupe_key)
+                break
+            except QueueFullError:
+                # Interactive requests took the room we waited for; try again shortly
+                time.sleep(BATCH_INGEST_WAIT)
+        counts['queued'] += 1
+        counts['deduplicated'] += deduplicated
+        recent_ids.append(job_id)
+    
+    # A chunk larger than the whole queue would never fit, so never wait for more
+    # room than the queue has
+    chunk_size = max(1, min(BATCH_INGEST_CHUNK, download_queue.max_queued))
+    
+    try:
+        for chunk in chunked(parser, chunk_size):
+            while not download_queue.has_capacity(len(chunk)):
+                time.sleep(BATCH_INGEST_WAIT)
+            for url, classified in chunk:
+                submit(url, classified)
+            report('ingesting')
+        report('completed')
+    except Exception as e:
+        progress_store.update(ingest_id, {'status': 'error', 'error': str(e)})
+    finally:
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+
 @app.route('/batch_download', methods=['POST'])
 def batch_download():
     """Download multiple videos from batch"""
@@ -740,63 +1459,162 @@ def batch_download():
         return jsonify({'success': False, 'error': 'No URLs provided'})
     
     download_ids = []
+    rejected_urls = []
     
     for url in urls:
         if is_valid_url(url):
+            # Once the queue is full, hand the remaining URLs back to the client
+            if rejected_urls:
+                rejected_urls.append(url)
+                continue
+            
             # Generate unique download ID
-            download_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(download_ids)}"
-            
-            # Initialize progress tracking
-            download_progress[download_id] = {
-                'status': 'starting',
-                'percent': '0%',
-                'speed': 'N/A',
-                'url': url
-            }
+            download_id = new_download_id('batch')
             
-            # Start download in background thread
-            thread = threading.Thread(
-                target=downloader.download_video_with_retry,
-                args=(url, None, download_id)
-            )
-            thread.daemon = True
-            thread.start()
+            # Queue the download on the shared worker pool
+            try:
+                download_id, deduplicated = queue_download(
+                    download_id,
+                    {'status': 'queued', 'percent': '0%', 'speed': 'N/A', 'url': url},
+                    downloader.download_video_with_retry, (url, None, download_id),
+                    priority=PRIORITY_NORMAL,
+                    dedupe_key=('video', canonical_url(url), None)
+                )
+            except QueueFullError:
+                rejected_urls.append(url)
+                continue
             
-            download_ids.append(download_id)
+            # Duplicate URLs within the batch share one download
+            if download_id not in download_ids:
+                download_ids.append(download_id)
+    
+    if rejected_urls and not download_ids:
+        return queue_full_response('Download queue is full, please retry later')
+    
+    # Pages follow and zip the batch by this ID; hundreds of download IDs don't fit in a URL
+    batch_id = None
+    if download_ids:
+        batch_id = new_download_id('set')
+        progress_store.create(batch_id, {'status': 'batch', 'download_ids': download_ids})
+        # update_job_state completes the batch when its last download settles
+        for download_id in download_ids:
+            progress_store.modify(download_id, lambda progress: progress.setdefault('batch_ids', []).append(batch_id))
+        settle_batch(batch_id)  # Some may have finished before they were tagged
+    
+    return jsonify({
+        'success': True,
+        'download_ids': download_ids,
+        'batch_id': batch_id,
+        'rejected_urls': rejected_urls
+    })
+
+def query_downloads():
+    """Run the file index query described by the request's listing parameters"""
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', DOWNLOADS_PAGE_SIZE, type=int)), MAX_DOWNLOADS_PAGE_SIZE)
+    sort = request.args.get('sort', 'modified')
+    descending = request.args.get('order', 'desc') != 'asc'
+    folder = request.args.get('folder')
+    job_id = request.args.get('job') or None
+    recursive = request.args.get('recursive', 'true').lower() != 'false'
     
-    return jsonify({'success': True, 'download_ids': download_ids})
+    files, total = file_index.query(page, per_page, sort, descending, folder, job_id, recursive)
+    for f in files:
+        f['modified'] = datetime.fromtimestamp(f['mtime']).strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'files': files,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        'folder': folder,
+        'job': job_id
+    }
 
 @app.route('/downloads')
 def list_downloads():
     """List all downloaded files"""
     try:
-        files = []
-        for filename in os.listdir(DOWNLOADS_FOLDER):
-            filepath = os.path.join(DOWNLOADS_FOLDER, filename)
-            if os.path.isfile(filepath):
-                files.append({
-                    'name': filename,
-                    'size': os.path.getsize(filepath),
-                    'modified': datetime.fromtimestamp(os.path.getmtime(filepath)).strftime('%Y-%m-%d %H:%M:%S')
-                })
-        
-        return render_template('downloads.html', files=files)
+        listing = query_downloads()
+        return render_template('downloads.html', folders=file_index.folders(), **listing)
     except Exception as e:
         flash(f'Error listing downloads: {str(e)}')
         return redirect(url_for('index'))
 
-@app.route('/download_file/<filename>')
+@app.route('/api/downloads')
+def list_downloads_api():
+    """Paginated JSON listing of downloaded files"""
+    return jsonify({'success': True, **query_downloads()})
+
+@app.route('/download_file/<path:filename>')
 def download_file(filename):
     """Download a file from the downloads folder"""
     try:
-        return send_file(
-            os.path.join(DOWNLOADS_FOLDER, filename),
-            as_attachment=True
-        )
+        filepath = safe_join(DOWNLOADS_FOLDER, filename)
+        if filepath is None or not os.path.isfile(filepath):
+            raise FileNotFoundError(filename)
+        # Only count the first request of a transfer as an access, not every resumed range
+        if 'Range' not in request.headers:
+            retention.touch(filepath)
+            if media_cache:
+                media_cache.touch_path(filepath)
+        return send_download(filepath, filename)
+    except HTTPException as e:
+        # e.g. 416 for a Range past the end of the file
+        return e
     except Exception as e:
         flash(f'Error downloading file: {str(e)}')
         return redirect(url_for('list_downloads'))
 
+@app.route('/download_zip')
+def download_zip():
+    """Stream the files of finished downloads (or a playlist folder) as one ZIP archive
+    
+    Pass ?ids=<id1>,<id2>,... or ?batch=<batch_id> for a whole /batch_download batch.
+    """
+    download_ids = [i for i in request.args.get('ids', '').split(',') if i][:MAX_STREAM_IDS]
+    download_ids += batch_members(request.args.get('batch')) or []
+    folder_name = request.args.get('folder', '').strip()
+    
+    paths = []
+    if folder_name:
+        folder = safe_join(DOWNLOADS_FOLDER, folder_name)
+        if folder and os.path.isdir(folder):
+            paths.extend(list_folder_files(folder))
+    for download_id in download_ids:
+        progress = progress_store.get(download_id) or {}
+        if progress.get('folder') and os.path.isdir(progress['folder']):
+            paths.extend(list_folder_files(progress['folder']))
+        elif progress.get('filepath') and os.path.isfile(progress['filepath']):
+            paths.append(progress['filepath'])
+    
+    paths = [p for p in dict.fromkeys(paths) if os.path.abspath(p).startswith(DOWNLOADS_FOLDER + os.sep)]
+    if not paths:
+        flash('No downloaded files found for this archive')
+        return redirect(url_for('list_downloads'))
+    
+    if folder_name:
+        archive_name = os.path.basename(os.path.normpath(folder_name))
+    else:
+        archive_name = f'videos-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
+    
+    zip_id = new_download_id('zip')
+    for path in paths:
+        retention.protect(path, owner=zip_id)
+    
+    def generate():
+        try:
+            yield from iter_zip(unique_arcnames(paths, DOWNLOADS_FOLDER))
+        finally:
+            retention.release(zip_id)
+    
+    return Response(stream_with_context(generate()), mimetype='application/zip', headers={
+        'Content-Disposition': content_disposition(f'{archive_name}.zip'),
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/playlist_info', methods=['POST'])
 def get_playlist_info():
     """Get playlist information from URL"""
@@ -809,7 +1627,15 @@ def get_playlist_info():
     if not is_valid_url(url):
         return jsonify({'success': False, 'error': 'Unsupported URL format'})
     
-    result = downloader.get_playlist_info(url)
+    page = data.get('page')
+    page_size = data.get('page_size')
+    try:
+        page = max(1, int(page)) if page else None
+        page_size = min(max(1, int(page_size)), MAX_PLAYLIST_PAGE_SIZE) if page_size else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid page or page_size'})
+    
+    result = downloader.get_playlist_info(url, page=page, page_size=page_size, flat=data.get('flat', True))
     return jsonify(result)
 
 @app.route('/download_playlist', methods=['POST'])
@@ -818,82 +1644,108 @@ def download_playlist():
     data = request.get_json()
     url = data.get('url', '').strip()
     max_downloads = data.get('max_downloads')
+    concurrency = data.get('concurrency')
     
     if not url:
         return jsonify({'success': False, 'error': 'URL is required'})
     
+    try:
+        concurrency = min(max(1, int(concurrency)), MAX_PLAYLIST_CONCURRENCY) if concurrency else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid concurrency'})
+    
     # Generate unique download ID
-    download_id = f"playlist_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    
-    # Initialize progress tracking
-    download_progress[download_id] = {
-        'status': 'starting',
-        'percent': '0%',
-        'speed': 'N/A',
-        'url': url,
-        'type': 'playlist'
-    }
+    download_id = new_download_id('playlist')
     
-    # Start download in background thread
-    thread = threading.Thread(
-        target=downloader.download_playlist,
-        args=(url, download_id, max_downloads)
-    )
-    thread.daemon = True
-    thread.start()
+    # Queue the playlist download on the shared worker pool
+    try:
+        download_id, deduplicated = queue_download(
+            download_id,
+            {'status': 'queued', 'percent': '0%', 'speed': 'N/A', 'url': url, 'type': 'playlist'},
+            downloader.download_playlist, (url, download_id, max_downloads, concurrency),
+            priority=PRIORITY_NORMAL,
+            dedupe_key=('playlist', canonical_url(url), max_downloads)
+        )
+    except QueueFullError as e:
+        return queue_full_response(str(e))
     
-    return jsonify({'success': True, 'download_id': download_id})
+    return jsonify({
+        'success': True,
+        'download_id': download_id,
+        'status': 'queued',
+        'deduplicated': deduplicated
+    })
 
 @app.route('/process_batch_urls', methods=['POST'])
 def process_batch_urls():
-    """Process batch URLs and expand any playlists"""
+    """Process batch URLs and expand any playlists
+    
+    Send either `urls` or the `continuation` token of an earlier call whose
+    playlists were still expanding, not both.
+    """
     data = request.get_json()
     urls = data.get('urls', [])
+    # Token returned by an earlier call whose playlists were still expanding
+    continuation = data.get('continuation')
     
-    if not urls:
+    if not urls and not continuation:
         return jsonify({'success': False, 'error': 'No URLs provided'})
+    if urls and continuation:
+        # Starting a new expansion would replace the token and drop the playlists it holds
+        return jsonify({'success': False, 'error': 'Send either new URLs or a continuation token, not both'}), 400
     
     individual_urls = []
     playlist_videos = []
     playlists_processed = 0
     all_urls = []
+    playlist_urls = []
     
     for url in urls:
         url = url.strip()
-        if not is_valid_url(url):
+        classified = classify_url(url)
+        if not classified.platform:
             continue
             
         # Check if it's a playlist URL
-        if 'list=' in url or 'playlist' in url.lower():
-            try:
-                playlist_result = downloader.get_playlist_info(url)
-                if playlist_result['success']:
-                    playlist_data = playlist_result['data']
-                    playlists_processed += 1
-                    
-                    # Extract individual video URLs from playlist
-                    for video in playlist_data['videos']:
-                        if video.get('url'):
-                            playlist_videos.append({
-                                'title': video.get('title', 'Unknown'),
-                                'url': video['url'],
-                                'duration': video.get('duration'),
-                                'playlist_title': playlist_data.get('title', 'Unknown Playlist')
-                            })
-                            all_urls.append(video['url'])
-                else:
-                    # If playlist processing fails, treat as individual URL
-                    individual_urls.append(url)
-                    all_urls.append(url)
-            except Exception:
-                # If playlist processing fails, treat as individual URL
-                individual_urls.append(url)
-                all_urls.append(url)
+        if is_playlist_url(classified):
+            playlist_urls.append(url)
         else:
             # Regular individual URL
             individual_urls.append(url)
             all_urls.append(url)
     
+    # Expand playlists concurrently and return what is ready before the deadline
+    if playlist_urls:
+        continuation = playlist_expander.start(playlist_urls)
+    
+    pending_playlists = 0
+    if continuation:
+        try:
+            playlists, failed_urls, pending_playlists, continuation = collect_playlist_expansion(continuation)
+        except UnknownTokenError:
+            # Expansions are held by the worker that started them; an empty answer would read as "done"
+            return jsonify({
+                'success': False,
+                'error': 'Playlist expansion expired or is running on another server worker; '
+                         'submit the playlist URLs again',
+                'continuation_expired': True
+            }), 410
+        for url, playlist_data in playlists:
+            playlists_processed += 1
+            
+            # Extract individual video URLs from playlist
+            for video in playlist_data['videos']:
+                if video.get('url'):
+                    playlist_videos.append({
+                        'title': video.get('title', 'Unknown'),
+                        'url': video['url'],
+                        'duration': video.get('duration'),
+                        'playlist_title': playlist_data.get('title', 'Unknown Playlist')
+                    })
+                    all_urls.append(video['url'])
+        individual_urls.extend(failed_urls)
+        all_urls.extend(failed_urls)
+    
     return jsonify({
         'success': True,
         'data': {
@@ -901,7 +1753,9 @@ def process_batch_urls():
             'playlist_videos': playlist_videos,
             'playlists_processed': playlists_processed,
             'all_urls': all_urls,
-            'total_videos': len(all_urls)
+            'total_videos': len(all_urls),
+            'pending_playlists': pending_playlists,
+            'continuation': continuation
         }
     })
 
@@ -0,0 +1,80 @@
+import csv
+import hashlib
+import itertools
+
+from url_classifier import classify_url
+
+# CSV header names recognised as the column holding the video links
+URL_COLUMN_NAMES = {'url', 'urls', 'link', 'links', 'video', 'video_url', 'href', 'permalink'}
+
+
+def url_fingerprint(normalized_url):
+    """64-bit hash of a normalized URL; keeps the duplicate set small for huge files"""
+    return int.from_bytes(hashlib.blake2b(normalized_url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def find_url_column(header):
+    """Index of the URL column in a CSV header row, or None if the row isn't a header"""
+    for index, name in enumerate(header):
+        name = name.strip().lower()
+        if name in URL_COLUMN_NAMES or name.endswith('_url') or name.endswith(' url'):
+            return index
+    return None
+
+
+class UploadParser:
+    """Read the URLs of an uploaded TXT/CSV file one line at a time
+
+    Iterating yields (url, classified) for every supported, not yet seen
+    URL. CSV files may start with a header naming the URL column; otherwise
+    the first column is used. Counters are updated as the file is read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lines = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self._seen = set()
+
+    def __iter__(self):
+        with open(self.path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            for url in self._cells(f):
+                self.lines += 1
+                if not url:
+                    continue
+                classified = classify_url(url)
+                if not classified.platform:
+                    self.invalid += 1
+                    continue
+                fingerprint = url_fingerprint(classified.normalized)
+                if fingerprint in self._seen:
+                    self.duplicates += 1
+                    continue
+                self._seen.add(fingerprint)
+                yield url, classified
+
+    def _cells(self, f):
+        if not self.path.lower().endswith('.csv'):
+            return (line.strip() for line in f)
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return iter(())
+        column = find_url_column(first)
+        if column is None:
+            column = 0
+            rows = itertools.chain([first], rows)
+        else:
+            self.lines += 1  # The header row
+        return (row[column].strip() if len(row) > column else '' for row in rows)
+
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items without materialising the iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,319 @@
+"""Format ranking cost per get_video_info: the old multi-pass code vs rank_formats
+
+Usage: python bench/format_ranking_bench.py [big]
+
+Builds a synthetic YouTube-style manifest (8 heights x 3 codecs x
+protocols x 2 frame rates of video-only DASH streams, plus audio-only and
+two combined formats) and times ranking it for YouTube and Instagram.
+`big` adds six more protocol variants per video stream (444 formats
+instead of 156). The old code is get_video_info's format section and
+get_instagram_enhanced_formats as they were before format_ranking.py.
+"""
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from format_ranking import rank_formats  # noqa: E402
+from passthrough import is_progressive_format  # noqa: E402
+
+RUNS = 2000
+
+
+# --- Old code (app.VideoDownloader) ---
+
+def old_instagram_enhanced_formats(info):
+    """Create enhanced format list for Instagram with virtual combined formats"""
+    original_formats = []
+    video_formats = []
+    audio_formats = []
+
+    # Separate formats by type
+    for f in info.get('formats', []):
+        if not f.get('url'):
+            continue
+
+        has_video = f.get('vcodec') and f.get('vcodec') != 'none'
+        has_audio = f.get('acodec') and f.get('acodec') != 'none'
+
+        if has_video and has_audio:
+            original_formats.append(f)
+        elif has_video:
+            video_formats.append(f)
+        elif has_audio:
+            audio_formats.append(f)
+
+    enhanced_formats = []
+
+    # Add original combined formats first
+    for f in original_formats:
+        enhanced_formats.append(f)
+
+    # Create virtual combined formats if we have separate video and audio
+    if video_formats and audio_formats:
+        best_audio = max(audio_formats, key=lambda x: x.get('abr', 0) or 0)
+
+        for video_fmt in video_formats:
+            height = video_fmt.get('height', 0)
+            width = video_fmt.get('width', 0)
+
+            # Create virtual combined format
+            virtual_format = {
+                'format_id': f"{video_fmt['format_id']}+{best_audio['format_id']}",
+                'ext': 'mp4',
+                'resolution': f"{width}x{height}" if width and height else f"{height}p" if height else 'Unknown',
+                'height': height,
+                'width': width,
+                'vcodec': video_fmt.get('vcodec', 'unknown'),
+                'acodec': best_audio.get('acodec', 'unknown'),
+                'fps': video_fmt.get('fps'),
+                'filesize': (video_fmt.get('filesize', 0) or 0) + (best_audio.get('filesize', 0) or 0),
+                'has_video': True,
+                'has_audio': True,
+                'quality_score': 10000 + height,  # High priority for virtual combined
+                'is_best': False,
+                'is_virtual': True,  # Mark as virtual format
+                'video_format_id': video_fmt['format_id'],
+                'audio_format_id': best_audio['format_id']
+            }
+            enhanced_formats.append(virtual_format)
+
+    # Only return combined formats (original + virtual), exclude video-only and audio-only
+
+    return enhanced_formats
+
+
+def old_rank_formats(info, is_instagram):
+    """Format list as get_video_info built it before format_ranking.py"""
+    # Extract available formats
+    formats = []
+    best_format_id = None
+    best_score = -1
+
+    if 'formats' in info:
+        if is_instagram:
+            # Use enhanced format detection for Instagram
+            enhanced_formats = old_instagram_enhanced_formats(info)
+
+            for f in enhanced_formats:
+                if f.get('is_virtual'):
+                    # Virtual combined format
+                    formats.append({
+                        'format_id': f['format_id'],
+                        'resolution': f['resolution'],
+                        'ext': f['ext'],
+                        'filesize': f.get('filesize'),
+                        'fps': f.get('fps'),
+                        'vcodec': f['vcodec'],
+                        'acodec': f['acodec'],
+                        'has_video': f['has_video'],
+                        'has_audio': f['has_audio'],
+                        'quality_score': f['quality_score'],
+                        'is_best': False,
+                        'is_virtual': True
+                    })
+                else:
+                    # Regular format processing for Instagram - only include combined formats
+                    has_video = f.get('vcodec') and f.get('vcodec') != 'none'
+                    has_audio = f.get('acodec') and f.get('acodec') != 'none'
+                    height = f.get('height', 0) if f.get('height') else 0
+
+                    # Only process formats that have both video and audio
+                    if has_video and has_audio:
+                        # Calculate quality score
+                        score = 10000 + height  # High priority for combined formats
+
+                        if f.get('ext') == 'mp4':
+                            score += 100
+                        if f.get('fps') and f.get('fps') >= 30:
+                            score += 50
+
+                        # Track best format
+                        if score > best_score:
+                            best_score = score
+                            best_format_id = f['format_id']
+
+                        # Format resolution display
+                        if f.get('resolution'):
+                            resolution = f['resolution']
+                        elif height:
+                            width = f.get('width', 'Unknown')
+                            resolution = f"{width}x{height}" if width != 'Unknown' else f"{height}p"
+                        else:
+                            resolution = 'Unknown'
+
+                        formats.append({
+                            'format_id': f['format_id'],
+                            'resolution': resolution,
+                            'ext': f.get('ext', 'mp4'),
+                            'filesize': f.get('filesize'),
+                            'fps': f.get('fps'),
+                            'vcodec': f.get('vcodec', 'none'),
+                            'acodec': f.get('acodec', 'none'),
+                            'has_video': has_video,
+                            'has_audio': has_audio,
+                            'quality_score': score,
+                            'is_best': False,
+                            'streamable': is_progressive_format(f)
+                        })
+        else:
+            # Enhanced logic for other platforms (YouTube, etc.)
+            video_formats = []
+            audio_formats = []
+            combined_formats = []
+
+            # Separate formats by type
+            for f in info['formats']:
+                if not f.get('url'):
+                    continue
+
+                has_video = f.get('vcodec') and f.get('vcodec') != 'none'
+                has_audio = f.get('acodec') and f.get('acodec') != 'none'
+
+                if has_video and has_audio:
+                    combined_formats.append(f)
+                elif has_video:
+                    video_formats.append(f)
+                elif has_audio:
+                    audio_formats.append(f)
+
+            # Add existing combined formats
+            for f in combined_formats:
+                height = f.get('height', 0) if f.get('height') else 0
+                width = f.get('width', 0) if f.get('width') else 0
+
+                # Format resolution display
+                if f.get('resolution'):
+                    resolution = f['resolution']
+                elif height:
+                    resolution = f"{width}x{height}" if width else f"{height}p"
+                else:
+                    resolution = 'Unknown'
+
+                formats.append({
+                    'format_id': f['format_id'],
+                    'resolution': resolution,
+                    'ext': f.get('ext', 'mp4'),
+                    'filesize': f.get('filesize'),
+                    'fps': f.get('fps'),
+                    'vcodec': f.get('vcodec'),
+                    'acodec': f.get('acodec'),
+                    'has_video': True,
+                    'has_audio': True,
+                    'quality_score': height + 2000,  # High priority for existing combined
+                    'is_best': False,
+                    'streamable': is_progressive_format(f)
+                })
+
+            # Create virtual combined formats from separate video and audio streams
+            if video_formats and audio_formats:
+                # Find the best audio format
+                best_audio = max(audio_formats, key=lambda x: (x.get('abr', 0) or 0))
+
+                for video_fmt in video_formats:
+                    height = video_fmt.get('height', 0) if video_fmt.get('height') else 0
+                    width = video_fmt.get('width', 0) if video_fmt.get('width') else 0
+
+                    # Skip very low quality videos
+                    if height and height < 240:
+                        continue
+
+                    # Format resolution display
+                    if video_fmt.get('resolution'):
+                        resolution = video_fmt['resolution']
+                    elif height:
+                        resolution = f"{width}x{height}" if width else f"{height}p"
+                    else:
+                        resolution = 'Unknown'
+
+                    # Create virtual combined format
+                    virtual_format = {
+                        'format_id': f"{video_fmt['format_id']}+{best_audio['format_id']}",
+                        'resolution': resolution,
+                        'ext': 'mp4',
+                        'filesize': (video_fmt.get('filesize', 0) or 0) + (best_audio.get('filesize', 0) or 0),
+                        'fps': video_fmt.get('fps'),
+                        'vcodec': video_fmt.get('vcodec'),
+                        'acodec': best_audio.get('acodec'),
+                        'has_video': True,
+                        'has_audio': True,
+                        'quality_score': height + 1000,  # Medium priority for virtual combined
+                        'is_best': False,
+                        'is_virtual': True,
+                        'video_format_id': video_fmt['format_id'],
+                        'audio_format_id': best_audio['format_id']
+                    }
+                    formats.append(virtual_format)
+
+    # Mark the best format for Instagram
+    if is_instagram and best_format_id:
+        for fmt in formats:
+            if fmt['format_id'] == best_format_id:
+                fmt['is_best'] = True
+                break
+
+    # Sort formats by quality score (best first)
+    formats.sort(key=lambda x: x.get('quality_score', 0), reverse=True)
+    return formats, best_format_id
+
+
+def build_formats(big=False, seed=1):
+    rnd = random.Random(seed)
+    protocols = ('https', 'm3u8_native', 'http_dash_segments') + (('a', 'b', 'c', 'd', 'e', 'f') if big else ())
+    formats = []
+
+    def add(**f):
+        f['format_id'] = str(len(formats) + 1)
+        f['url'] = f"http://stub/{f['format_id']}"
+        formats.append(f)
+
+    for height in (144, 240, 360, 480, 720, 1080, 1440, 2160):
+        for vcodec, ext in (('avc1.64001F', 'mp4'), ('vp09.00.40.08', 'webm'), ('av01.0.08M.08', 'mp4')):
+            for protocol in protocols:
+                for fps in (30, 60):
+                    add(height=height, width=height * 16 // 9, vcodec=vcodec, acodec='none', ext=ext,
+                        video_ext=ext, audio_ext='none', fps=fps, tbr=height * 3 + rnd.random(),
+                        protocol=protocol, filesize=height * 10000,
+                        resolution=f'{height * 16 // 9}x{height}')
+    for abr, acodec, ext in ((48, 'opus', 'webm'), (70, 'opus', 'webm'), (160, 'opus', 'webm'),
+                             (128, 'mp4a.40.2', 'm4a'), (48, 'mp4a.40.5', 'm4a')):
+        for protocol in ('https', 'm3u8_native'):
+            add(vcodec='none', acodec=acodec, ext=ext, audio_ext=ext, video_ext='none', abr=abr,
+                protocol=protocol, filesize=abr * 1000)
+    for height in (360, 720):
+        add(height=height, width=height * 16 // 9, vcodec='avc1.42001E', acodec='mp4a.40.2', ext='mp4',
+            fps=30, protocol='https')
+    return formats
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            result = fn()
+        elapsed = (time.perf_counter() - started) / RUNS
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    formats = build_formats(big='big' in sys.argv[1:])
+    info = {'formats': formats}
+    print(f'{len(formats)} formats, best of 5 x {RUNS} runs')
+    cases = (
+        ('old youtube', lambda: old_rank_formats(info, False)),
+        ('new youtube', lambda: rank_formats(formats)),
+        ('old instagram', lambda: old_rank_formats(info, True)),
+        ('new instagram', lambda: rank_formats(formats, 'instagram')),
+    )
+    for name, fn in cases:
+        elapsed, (ranked, best_format_id) = best_of(fn)
+        print(f'{name:14s} {elapsed * 1e6:8.1f} us/rank  {len(ranked):4d} entries  best {best_format_id}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""HLS download time with and without concurrent fragments and parallel merge legs
+
+Usage: python bench/hls_download_bench.py [delay]
+
+Downloads from the local stub in hls_stub.py (30 one-second segments per
+rendition, `delay` seconds of latency per segment, 0.1 by default). Each
+run times yt-dlp's download phase, including the prefetch_legs step that
+download_video does for merged formats. The stub's segments hold no media,
+so the ffmpeg merge that follows a video+audio download fails at once; the
+time is that of the download. The video+audio runs need ffmpeg on PATH.
+"""
+import copy
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import yt_dlp  # noqa: E402
+
+from hls_stub import start_server  # noqa: E402
+from parallel_download import fragment_workers, prefetch_legs  # noqa: E402
+
+VIDEO = '800'
+MERGED = '800+aud-English'
+
+
+class QuietLogger:
+    """Drop yt-dlp's messages, including the expected merge errors"""
+
+    def debug(self, msg):
+        pass
+
+    warning = error = debug
+
+
+def run(url, fmt, fragments, legs):
+    folder = tempfile.mkdtemp(prefix='hls-bench-')
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'format': fmt,
+        'outtmpl': os.path.join(folder, '%(id)s.%(ext)s'),
+        'concurrent_fragment_downloads': fragments,
+        'merge_output_format': 'mp4',
+        'fixup': 'never',
+        'logger': QuietLogger(),
+    }
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            started = time.perf_counter()
+            try:
+                if legs:
+                    prefetch_legs(ydl, ydl.process_ie_result(copy.deepcopy(info), download=False))
+                ydl.process_ie_result(info, download=True)
+                outcome = 'ok'
+            except yt_dlp.utils.DownloadError as e:
+                if 'Postprocessing' not in str(e) and 'ffmpeg' not in str(e).lower():
+                    raise
+                outcome = 'merge failed (expected with the stub)'
+            elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    label = f'{"video+audio" if "+" in fmt else "video only"}, {fragments} fragment worker(s)'
+    label += ', parallel legs' if legs else ''
+    print(f'{label:52s} {elapsed:6.2f} s  {outcome}')
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+    url = start_server(delay)
+    run(url, VIDEO, 1, False)
+    run(url, VIDEO, 4, False)
+    if not shutil.which('ffmpeg'):
+        print('ffmpeg not found, skipping the video+audio runs')
+        return
+    run(url, MERGED, 1, False)
+    run(url, MERGED, 1, True)
+    run(url, MERGED, 4, False)
+    # What download_video uses with the defaults (FRAGMENT_CONCURRENCY=4, MAX_JOB_CONNECTIONS=8)
+    run(url, MERGED, fragment_workers(2, 4, 8), True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Local HLS stub: a master playlist with a video rendition and a separate audio group
+
+Usage: python bench/hls_stub.py [delay] [port]
+
+Writes `segments` one-second segments per rendition to a temp folder and
+serves them over HTTP/1.1 keep-alive, sleeping `delay` seconds before each
+segment to stand in for CDN latency. Segments are MPEG-TS null packets:
+yt-dlp downloads them like any other fragment, but they hold no media, so
+anything after the download phase (merging, fixups) fails.
+"""
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+SEGMENT_PACKETS = 96  # 188-byte TS packets per segment (~18 KB)
+NULL_PACKET = b'\x47\x1f\xff\x10' + b'\xff' * 184
+
+MASTER = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="English",LANGUAGE="en",DEFAULT=YES,AUTOSELECT=YES,URI="audio.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.64001e,mp4a.40.2",AUDIO="aud"
+video.m3u8
+"""
+
+
+def write_stream(folder, segments):
+    """Write master.m3u8, the video/audio media playlists and their segments"""
+    with open(os.path.join(folder, 'master.m3u8'), 'w') as f:
+        f.write(MASTER)
+    for name, prefix in (('video', 'v'), ('audio', 'a')):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:0',
+                 '#EXT-X-PLAYLIST-TYPE:VOD']
+        for i in range(segments):
+            segment = f'{prefix}{i:03d}.ts'
+            with open(os.path.join(folder, segment), 'wb') as f:
+                f.write(NULL_PACKET * SEGMENT_PACKETS)
+            lines += ['#EXTINF:1.000000,', segment]
+        lines.append('#EXT-X-ENDLIST')
+        with open(os.path.join(folder, f'{name}.m3u8'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+class SlowSegmentHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.endswith('.ts'):
+            time.sleep(self.delay)
+        return super().do_GET()
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # yt-dlp drops idle keep-alive connections when a download ends
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(delay=0.1, segments=30, port=0):
+    """Build the stub server on 127.0.0.1; returns (server, master playlist URL)"""
+    folder = tempfile.mkdtemp(prefix='hls-stub-')
+    write_stream(folder, segments)
+    handler = type('Handler', (SlowSegmentHandler,), {'delay': delay})
+    server = StubServer(('127.0.0.1', port), functools.partial(handler, directory=folder))
+    return server, f'http://127.0.0.1:{server.server_address[1]}/master.m3u8'
+
+
+def start_server(delay=0.1, segments=30):
+    """Serve the stub from a background thread; returns the master playlist URL"""
+    server, url = make_server(delay, segments)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return url
+
+
+if __name__ == '__main__':
+    server, url = make_server(float(sys.argv[1]) if len(sys.argv) > 1 else 0.1,
+                              port=int(sys.argv[2]) if len(sys.argv) > 2 else 8770)
+    print(f'Serving {url}')
+    server.serve_forever()
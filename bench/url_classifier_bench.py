@@ -0,0 +1,117 @@
+"""URL handling cost per link: the old regex loop and substring tests vs classify_url
+
+Usage: python bench/url_classifier_bench.py [count]
+
+Builds a mixed corpus (instagram_reels.csv plus generated YouTube, TikTok,
+Twitter, Facebook and unsupported links) and times what a batch does per
+URL: validate, check for a playlist, check for Instagram and normalize.
+The old functions are copied here as they were before url_classifier.py.
+"""
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from url_classifier import classify_url  # noqa: E402
+
+# --- Old code (app.is_valid_url and info_cache.normalize_url) ---
+
+OLD_TRACKING_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                       'igshid', 'igsh', 'si', 'feature', 'fbclid', 'gclid'}
+
+
+def old_normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host.startswith('m.'):
+        host = host[2:]
+    path = parts.path.rstrip('/') or '/'
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in OLD_TRACKING_PARAMS]
+    query.sort()
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def old_is_valid_url(url):
+    patterns = [
+        r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/',
+        r'(https?://)?(www\.)?instagram\.com/',
+        r'(https?://)?(www\.)?tiktok\.com/',
+        r'(https?://)?(www\.)?twitter\.com/',
+        r'(https?://)?(www\.)?facebook\.com/'
+    ]
+    for pattern in patterns:
+        if re.search(pattern, url, re.IGNORECASE):
+            return True
+    return False
+
+
+def old(url):
+    if not old_is_valid_url(url):
+        return None
+    return ('list=' in url or 'playlist' in url.lower(), 'instagram.com' in url.lower(), old_normalize_url(url))
+
+
+def new(url):
+    c = classify_url(url)
+    if not c.platform:
+        return None
+    return (c.kind == 'playlist' or c.playlist_id is not None, c.platform == 'instagram', c.normalized)
+
+
+def build_corpus(count, seed=1):
+    with open(os.path.join(ROOT, 'instagram_reels.csv')) as f:
+        reels = [line.strip() for line in f if line.strip().startswith('http')]
+    rnd = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+
+    def ids(n):
+        return ''.join(rnd.choice(alphabet) for _ in range(n))
+
+    generators = [
+        lambda: rnd.choice(reels),
+        lambda: f'https://www.youtube.com/watch?v={ids(11)}',
+        lambda: f'https://youtu.be/{ids(11)}?si={ids(16)}',
+        lambda: f'https://www.youtube.com/watch?v={ids(11)}&list=PL{ids(32)}&index=3',
+        lambda: f'https://www.youtube.com/playlist?list=PL{ids(32)}',
+        lambda: f'https://youtube.com/shorts/{ids(11)}?feature=share',
+        lambda: f'https://www.tiktok.com/@user{ids(5)}/video/{rnd.randrange(10**18)}',
+        lambda: f'https://twitter.com/u{ids(6)}/status/{rnd.randrange(10**18)}',
+        lambda: f'https://www.facebook.com/watch/?v={rnd.randrange(10**15)}',
+        lambda: f'https://example.com/video/{ids(8)}',
+    ]
+    return [rnd.choice(generators)() for _ in range(count)]
+
+
+def best_of(fn, corpus, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for url in corpus:
+            fn(url)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    corpus = build_corpus(count)
+    for name, fn in (('old', old), ('new', new)):
+        elapsed = best_of(fn, corpus)
+        print(f'{name}: {elapsed * 1000:6.0f} ms per {count} URLs ({elapsed / count * 1e6:.2f} us/URL)')
+    valid = sum((old(u) is None) == (new(u) is None) for u in corpus)
+    playlist = sum((old(u) or (False,))[0] == (new(u) or (False,))[0] for u in corpus)
+    print(f'validity agrees on {valid}/{count}, playlist detection on {playlist}/{count}')
+
+
+if __name__ == '__main__':
+    main()
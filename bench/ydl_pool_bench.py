@@ -0,0 +1,81 @@
+"""extract_info latency: a fresh YoutubeDL per call vs an instance from YoutubeDLPool
+
+Usage: python bench/ydl_pool_bench.py [calls]
+
+Serves a small page with an og:video tag from a local HTTP/1.1 keep-alive
+server and extracts it repeatedly (generic extractor, no network access
+needed). The fresh path is what VideoDownloader did before the pool:
+`with yt_dlp.YoutubeDL(opts) as ydl` around every call.
+"""
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yt_dlp  # noqa: E402
+
+from ydl_pool import YoutubeDLPool  # noqa: E402
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<title>Stub video</title>
+<meta property="og:title" content="Stub video">
+<meta property="og:video" content="http://127.0.0.1:{port}/video.mp4">
+<meta property="og:video:type" content="video/mp4">
+</head><body></body></html>
+"""
+
+
+class StubHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    """Serve page.html and video.mp4 from a temp dir; returns the page URL"""
+    folder = tempfile.mkdtemp(prefix='ydl-pool-bench-')
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(StubHandler, directory=folder))
+    port = server.server_address[1]
+    with open(os.path.join(folder, 'page.html'), 'w') as f:
+        f.write(PAGE.format(port=port))
+    with open(os.path.join(folder, 'video.mp4'), 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}/page.html'
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    url = start_server()
+    opts = {'quiet': True, 'no_warnings': True}
+    pool = YoutubeDLPool()
+
+    def fresh():
+        with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def pooled():
+        with pool.checkout(dict(opts)) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    for name, fn in (('fresh YoutubeDL per call', fresh), ('pooled instance', pooled)):
+        fn()  # Warm up imports and the server
+        started = time.perf_counter()
+        for _ in range(calls):
+            info = fn()
+        elapsed = time.perf_counter() - started
+        assert info.get('url', '').endswith('/video.mp4'), info
+        print(f'{name:26s} {elapsed / calls * 1000:7.1f} ms/extract')
+    print('pool:', pool.stats())
+
+
+if __name__ == '__main__':
+    main()
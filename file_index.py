@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Columns the listing may be sorted by
+SORT_COLUMNS = {'modified': 'mtime', 'name': 'name', 'size': 'size', 'folder': 'folder'}
+
+
+class FileIndex:
+    """SQLite index of the files in the downloads folder
+
+    Downloads add their files when they complete and the retention sweeper
+    keeps the index in sync with the disk, so listing pages never have to
+    walk the folder. Paths are stored relative to the folder.
+    """
+
+    def __init__(self, folder, index_path):
+        self.folder = folder
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self.last_sync_at = None
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'path TEXT PRIMARY KEY, folder TEXT NOT NULL, name TEXT NOT NULL, '
+                'size INTEGER NOT NULL, mtime REAL NOT NULL, job_id TEXT, added_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime)')
+            conn.execute('CREATE INDEX IF NOT EXISTS files_folder ON files (folder, mtime)')
+            conn.execute('CREATE INDEX IF NOT EXISTS files_job ON files (job_id)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def relpath(self, path):
+        """Path relative to the downloads folder with '/' separators, or None if outside it"""
+        rel = os.path.relpath(os.path.abspath(path), self.folder)
+        if rel.startswith('..') or os.path.isabs(rel):
+            return None
+        return rel.replace(os.sep, '/')
+
+    def add(self, path, job_id=None):
+        """Index a completed file, remembering which job produced it"""
+        rel = self.relpath(path)
+        if rel is None:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        folder, _, name = rel.rpartition('/')
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO files (path, folder, name, size, mtime, job_id, added_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET '
+                'size = excluded.size, mtime = excluded.mtime, job_id = COALESCE(excluded.job_id, job_id)',
+                (rel, folder, name, stat.st_size, stat.st_mtime, job_id, time.time())
+            )
+
+    def remove(self, path):
+        rel = self.relpath(path)
+        if rel is not None:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM files WHERE path = ?', (rel,))
+
+    def sync(self, scanned, scanned_at=None):
+        """Replace the index contents with (path, stat) pairs from a full scan of the folder
+
+        Entries added after `scanned_at` are kept even if the scan missed them.
+        """
+        rows = {}
+        for path, stat in scanned:
+            rel = self.relpath(path)
+            if rel is not None:
+                folder, _, name = rel.rpartition('/')
+                rows[rel] = (folder, name, stat.st_size, stat.st_mtime)
+        now = time.time()
+        scanned_at = now if scanned_at is None else scanned_at
+        with self._lock, self._connect() as conn:
+            known = {row[0] for row in conn.execute('SELECT path FROM files WHERE added_at < ?', (scanned_at,))}
+            conn.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in known - rows.keys()])
+            conn.executemany(
+                'INSERT INTO files (path, folder, name, size, mtime, job_id, added_at) '
+                'VALUES (?, ?, ?, ?, ?, NULL, ?) ON CONFLICT (path) DO UPDATE SET '
+                'size = excluded.size, mtime = excluded.mtime',
+                [(p, *row, now) for p, row in rows.items()]
+            )
+            self.last_sync_at = now
+
+    def rescan(self, skip=None):
+        """Rebuild the index from disk; `skip(path)` excludes files such as partial downloads"""
+        started = time.time()
+        self.sync([(path, stat) for path, stat in scan_files(self.folder) if not (skip and skip(path))], started)
+
+    def query(self, page=1, per_page=50, sort='modified', descending=True, folder=None, job_id=None, recursive=True):
+        """Return (files, total) for one page of the listing
+
+        `folder` limits the listing to one playlist folder ('' lists the top
+        level only); without `recursive` only its direct children are listed.
+        """
+        clauses = []
+        params = []
+        if folder is None and not recursive:
+            folder = ''
+        if folder is not None:
+            folder = folder.strip('/')
+            if recursive and folder:
+                clauses.append('(folder = ? OR folder LIKE ? ESCAPE \'\\\')')
+                params += [folder, folder.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%']
+            else:
+                clauses.append('folder = ?')
+                params.append(folder)
+        if job_id:
+            clauses.append('job_id = ?')
+            params.append(job_id)
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        order = f'{SORT_COLUMNS.get(sort, "mtime")} {"DESC" if descending else "ASC"}, path'
+        page = max(1, page)
+
+        with self._connect() as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM files {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT path, folder, name, size, mtime, job_id FROM files {where} ORDER BY {order} LIMIT ? OFFSET ?',
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+        files = [{'path': r[0], 'folder': r[1], 'name': r[2], 'size': r[3], 'mtime': r[4], 'job_id': r[5]}
+                 for r in rows]
+        return files, total
+
+    def folders(self):
+        """Playlist folders with their file counts and total size"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT folder, COUNT(*), SUM(size) FROM files WHERE folder != '' GROUP BY folder ORDER BY folder"
+            ).fetchall()
+        return [{'folder': r[0], 'files': r[1], 'size': r[2]} for r in rows]
+
+    def stats(self):
+        with self._connect() as conn:
+            files, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        return {'files': files, 'bytes': total, 'last_sync_at': self.last_sync_at}
+
+
+def scan_files(folder):
+    """Yield (path, stat) for every file below `folder` using os.scandir"""
+    stack = [folder]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield os.path.abspath(entry.path), entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
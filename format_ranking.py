@@ -0,0 +1,198 @@
+from functools import lru_cache
+from operator import itemgetter
+
+from passthrough import is_progressive_format
+
+# Declarative scoring policy: every format's score is the sum of these terms
+DEFAULT_POLICY = {
+    'kind': {'combined': 2000, 'virtual': 1000},  # Ready-made video+audio vs merged from two streams
+    'height': 1.0,  # Points per pixel of height; keeps resolution the dominant term
+    'min_virtual_height': 240,  # Don't offer merges of very low quality video
+    'fps': ((50, 40), (30, 20)),  # (minimum fps, bonus), first match wins
+    'vcodec': {'avc1': 30, 'av01': 20, 'vp9': 10},  # Prefer codecs that play everywhere
+    'ext': {'mp4': 60},
+    'tbr': 0.001,  # Points per kbit/s, a tie-breaker between same-height streams
+    'filesize': 0.0,  # Points per MiB (negative to prefer smaller files)
+    'dedupe': True,  # Keep only the best format per size, fps and kind
+}
+
+# Instagram rarely has more than a few formats; merged ones are as good as combined
+INSTAGRAM_POLICY = dict(DEFAULT_POLICY, kind={'combined': 10000, 'virtual': 10000}, min_virtual_height=0)
+
+# Audio containers that merge into each video container without re-encoding
+COMPATIBLE_AUDIO = {'mp4': 'm4a', 'm4a': 'm4a', 'webm': 'webm'}
+
+_CODEC_ALIASES = {'h264': 'avc1', 'avc': 'avc1', 'vp09': 'vp9', 'vp8': 'vp8', 'av1': 'av01', 'mp4a': 'aac'}
+
+
+@lru_cache(maxsize=256)
+def codec_family(codec):
+    """'avc1.64001F' -> 'avc1', 'vp09.00.40.08' -> 'vp9'; None for missing streams"""
+    if not codec or codec == 'none':
+        return None
+    name = codec.split('.', 1)[0].lower()
+    return _CODEC_ALIASES.get(name, name)
+
+
+def audio_family(f):
+    """Container group an audio stream merges into ('m4a' or 'webm')"""
+    ext = f.get('audio_ext') if f.get('audio_ext') not in (None, 'none') else f.get('ext')
+    if ext in ('m4a', 'mp4') or codec_family(f.get('acodec')) == 'aac':
+        return 'm4a'
+    if ext == 'webm' or codec_family(f.get('acodec')) in ('opus', 'vorbis'):
+        return 'webm'
+    return ext
+
+
+def _resolution(f, height):
+    if f.get('resolution'):
+        return f['resolution']
+    if height:
+        width = f.get('width')
+        return f'{width}x{height}' if width else f'{height}p'
+    return 'Unknown'
+
+
+class FormatRanker:
+    """Classify, score and pair the formats of an info dict in one pass
+
+    The policy is compiled once into lookups; ranking walks the format list
+    a single time, remembering the best audio stream per container family,
+    then pairs every video-only stream with its best compatible audio.
+    """
+
+    def __init__(self, policy=DEFAULT_POLICY):
+        self.policy = policy
+        self._combined_weight = policy['kind']['combined']
+        self._virtual_weight = policy['kind']['virtual']
+        self._height_weight = policy['height']
+        self._min_virtual_height = policy.get('min_virtual_height') or 0
+        self._fps_steps = tuple(sorted(policy.get('fps') or (), reverse=True))
+        self._vcodec_bonus = policy.get('vcodec') or {}
+        self._ext_bonus = policy.get('ext') or {}
+        self._tbr_weight = policy.get('tbr') or 0
+        self._size_weight = (policy.get('filesize') or 0) / (1024 * 1024)
+        self._dedupe = policy.get('dedupe', False)
+        self._bonus_cache = {}
+
+    def _bonus(self, vcodec, ext, fps):
+        """Codec, container and frame rate terms (memoised, manifests repeat these a lot)"""
+        key = (vcodec, ext, fps)
+        bonus = self._bonus_cache.get(key)
+        if bonus is None:
+            bonus = self._ext_bonus.get(ext, 0) + self._vcodec_bonus.get(codec_family(vcodec), 0)
+            for minimum, step in self._fps_steps:
+                if fps and fps >= minimum:
+                    bonus += step
+                    break
+            if len(self._bonus_cache) < 4096:
+                self._bonus_cache[key] = bonus
+        return bonus
+
+    def rank(self, formats):
+        """Return (entries, best_format_id) for the video+audio choices, best first"""
+        candidates = {}  # dedupe key -> (score, format, height, is_virtual)
+        best_audio = {}  # audio family -> (abr, format)
+        best_any_audio = None
+        dedupe = self._dedupe
+        combined_weight = self._combined_weight
+        virtual_weight = self._virtual_weight
+        min_virtual_height = self._min_virtual_height
+        height_weight = self._height_weight
+        tbr_weight = self._tbr_weight
+        size_weight = self._size_weight
+        bonus = self._bonus
+
+        for f in formats or ():
+            if not f.get('url'):
+                continue
+            vcodec = f.get('vcodec')
+            acodec = f.get('acodec')
+            has_video = vcodec and vcodec != 'none'
+            has_audio = acodec and acodec != 'none'
+
+            if has_video:
+                height = f.get('height') or 0
+                fps = f.get('fps')
+                if has_audio:
+                    is_virtual = False
+                    score = combined_weight + bonus(vcodec, f.get('ext', 'mp4'), fps)
+                elif not height or height >= min_virtual_height:
+                    is_virtual = True
+                    score = virtual_weight + bonus(vcodec, 'mp4', fps)
+                else:
+                    continue
+                score += height * height_weight
+                if tbr_weight:
+                    score += (f.get('tbr') or 0) * tbr_weight
+                if size_weight:
+                    score += (f.get('filesize') or f.get('filesize_approx') or 0) * size_weight
+                key = (height, f.get('width'), fps, is_virtual) if dedupe else f['format_id']
+                current = candidates.get(key)
+                if current is None or score > current[0]:
+                    candidates[key] = (score, f, height, is_virtual)
+            elif has_audio:
+                abr = f.get('abr') or f.get('tbr') or 0
+                family = audio_family(f)
+                if family not in best_audio or abr > best_audio[family][0]:
+                    best_audio[family] = (abr, f)
+                if best_any_audio is None or abr > best_any_audio[0]:
+                    best_any_audio = (abr, f)
+
+        entries = []
+        for score, f, height, is_virtual in candidates.values():
+            resolution = _resolution(f, height)
+            if not is_virtual:
+                filesize = f.get('filesize') or f.get('filesize_approx')
+                entries.append({
+                    'format_id': f['format_id'],
+                    'resolution': resolution,
+                    'ext': f.get('ext', 'mp4'),
+                    'filesize': filesize,
+                    'fps': f.get('fps'),
+                    'vcodec': f.get('vcodec'),
+                    'acodec': f.get('acodec'),
+                    'has_video': True,
+                    'has_audio': True,
+                    'quality_score': score,
+                    'is_best': False,
+                    'is_virtual': False,
+                    'streamable': is_progressive_format(f)
+                })
+            elif best_any_audio:
+                paired = best_audio.get(COMPATIBLE_AUDIO.get(f.get('video_ext') or f.get('ext')), best_any_audio)[1]
+                audio_size = paired.get('filesize') or paired.get('filesize_approx') or 0
+                if size_weight:
+                    score += audio_size * size_weight
+                filesize = (f.get('filesize') or f.get('filesize_approx') or 0) + audio_size
+                entries.append({
+                    'format_id': f"{f['format_id']}+{paired['format_id']}",
+                    'resolution': resolution,
+                    'ext': 'mp4',  # Downloads merge into MP4
+                    'filesize': filesize or None,
+                    'fps': f.get('fps'),
+                    'vcodec': f.get('vcodec'),
+                    'acodec': paired.get('acodec'),
+                    'has_video': True,
+                    'has_audio': True,
+                    'quality_score': score,
+                    'is_best': False,
+                    'is_virtual': True,
+                    'streamable': False,
+                    'video_format_id': f['format_id'],
+                    'audio_format_id': paired['format_id']
+                })
+
+        if not entries:
+            return entries, None
+        entries.sort(key=itemgetter('quality_score'), reverse=True)
+        entries[0]['is_best'] = True
+        return entries, entries[0]['format_id']
+
+
+_RANKERS = {'default': FormatRanker(DEFAULT_POLICY), 'instagram': FormatRanker(INSTAGRAM_POLICY)}
+
+
+def rank_formats(formats, platform=None):
+    """Rank formats with the policy for `platform` (see FormatRanker.rank)"""
+    return _RANKERS.get(platform, _RANKERS['default']).rank(formats)
@@ -0,0 +1,17 @@
+# Gunicorn settings, used with: gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# The download queue, running downloads and playlist expansions live in the worker
+# process, so run one worker and serve concurrent requests with threads. Progress
+# streams (/progress_stream) hold a thread each, not a whole worker.
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+# gthread workers heartbeat from their main loop, so long streams and transfers
+# don't trip the timeout the way they kill sync workers
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
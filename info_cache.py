@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qsl
+
+import yt_dlp
+
+from url_classifier import canonical_url
+
+
+def _url_expiry(url):
+    """Return the expiry timestamp embedded in a signed media URL, if any"""
+    params = dict(parse_qsl(urlsplit(url).query))
+    try:
+        if 'expire' in params:  # YouTube/googlevideo
+            return int(params['expire'])
+        if 'oe' in params:  # Instagram/Facebook CDN (hex timestamp)
+            return int(params['oe'], 16)
+    except ValueError:
+        pass
+    return None
+
+
+def is_info_fresh(info, max_age=1800, min_remaining=120):
+    """Check whether an extracted info dict can still be used to download
+
+    The media URLs in an info dict are usually signed and expire; treat the
+    dict as stale when it is older than `max_age` seconds or when any of its
+    media URLs expires within `min_remaining` seconds.
+    """
+    if not info or info.get('_type', 'video') != 'video':
+        return False
+    now = time.time()
+    if info.get('epoch') and now - info['epoch'] > max_age:
+        return False
+    formats = info.get('requested_formats') or info.get('formats') or [info]
+    for f in formats:
+        expires_at = _url_expiry(f.get('url') or '')
+        if expires_at is not None and expires_at - now < min_remaining:
+            return False
+    return True
+
+
+class BaseInfoCache:
+    """Common hit/miss accounting for info cache backends"""
+
+    def __init__(self, ttl=600, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, variant=None):
+        """Return the cached info dict for `url`, or None
+
+        `variant` separates differently shaped results for the same URL,
+        such as a flat playlist page versus the fully resolved playlist.
+        """
+        info = self._get(self._key(url, variant))
+        with self._lock:
+            if info is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return info
+
+    def set(self, url, info, variant=None):
+        """Store an info dict for `url`"""
+        if info is not None:
+            self._set(self._key(url, variant), info)
+
+    @staticmethod
+    def _key(url, variant):
+        key = canonical_url(url)
+        return f'{key}|{variant}' if variant else key
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'entries': self._size(),
+                'ttl': self.ttl,
+                'max_entries': self.max_entries
+            }
+
+
+class MemoryInfoCache(BaseInfoCache):
+    """In-process LRU cache with per-entry expiry"""
+
+    backend = 'memory'
+
+    def __init__(self, ttl=600, max_entries=500):
+        super().__init__(ttl, max_entries)
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, info = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return info
+
+    def _set(self, key, info):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _size(self):
+        return len(self._entries)
+
+
+class SQLiteInfoCache(BaseInfoCache):
+    """On-disk cache shared between processes, with LRU eviction by last access"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path, ttl=600, max_entries=5000):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS info_cache ('
+                'key TEXT PRIMARY KEY, info TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT info, expires_at FROM info_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute('DELETE FROM info_cache WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE info_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def _set(self, key, info):
+        now = time.time()
+        # Info dicts can hold objects that don't round-trip through JSON
+        payload = json.dumps(yt_dlp.YoutubeDL.sanitize_info(info))
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO info_cache (key, info, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)', (key, payload, now + self.ttl, now)
+            )
+            conn.execute('DELETE FROM info_cache WHERE expires_at < ?', (now,))
+            conn.execute(
+                'DELETE FROM info_cache WHERE key NOT IN ('
+                'SELECT key FROM info_cache ORDER BY accessed_at DESC LIMIT ?)',
+                (self.max_entries,)
+            )
+
+    def _size(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM info_cache').fetchone()[0]
+
+
+def create_info_cache(path=None, ttl=600, max_entries=500):
+    """Build the SQLite backend when a path is configured, otherwise the in-memory one"""
+    if path:
+        return SQLiteInfoCache(path, ttl=ttl, max_entries=max_entries)
+    return MemoryInfoCache(ttl=ttl, max_entries=max_entries)
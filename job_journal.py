@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class JobJournal:
+    """SQLite record of queued and running jobs so they survive a restart
+
+    Every queued job is written with the name of its function and its
+    arguments; finished jobs are dropped. Each process registers as an owner
+    and heartbeats while it runs; jobs whose owner stopped heartbeating are
+    claimed by a live process and handed to `on_orphan` to be queued again.
+    Jobs can store a checkpoint (e.g. playlist position) to resume from.
+    """
+
+    def __init__(self, path, stale_after=45, heartbeat_interval=15):
+        self.path = path
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.owner_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.recovered = 0
+        self._stop = threading.Event()
+        self._thread = None
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, func TEXT NOT NULL, args TEXT NOT NULL, priority INTEGER NOT NULL, '
+                'dedupe_key TEXT, progress TEXT NOT NULL, checkpoint TEXT, owner TEXT NOT NULL, '
+                'created_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS owners (id TEXT PRIMARY KEY, last_seen REAL NOT NULL)')
+        self.heartbeat()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def record(self, job_id, func, args, priority, dedupe_key=None, progress=None):
+        """Journal a newly queued job; `func` is the name the job is resumed by"""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, func, args, priority, dedupe_key, progress, checkpoint, owner, '
+                'created_at) VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)',
+                (job_id, func, json.dumps(list(args)), priority,
+                 json.dumps(dedupe_key) if dedupe_key is not None else None,
+                 json.dumps(progress or {}), self.owner_id, time.time())
+            )
+
+    def finish(self, job_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def checkpoint(self, job_id, data):
+        """Save where a job has got to; returned by get_checkpoint after a restart"""
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET checkpoint = ? WHERE id = ?', (json.dumps(data), job_id))
+
+    def get_checkpoint(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT checkpoint FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def heartbeat(self):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO owners (id, last_seen) VALUES (?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET last_seen = excluded.last_seen',
+                (self.owner_id, time.time())
+            )
+
+    def claim_orphans(self):
+        """Take over the jobs of owners that stopped heartbeating
+
+        Returns dicts with id, func, args, priority, dedupe_key (as a tuple)
+        and progress, oldest first.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                live = [row[0] for row in conn.execute(
+                    'SELECT id FROM owners WHERE last_seen >= ?', (now - self.stale_after,))]
+                live.append(self.owner_id)
+                placeholders = ','.join('?' * len(live))
+                rows = conn.execute(
+                    f'SELECT id, func, args, priority, dedupe_key, progress FROM jobs '
+                    f'WHERE owner NOT IN ({placeholders}) ORDER BY created_at', live
+                ).fetchall()
+                conn.executemany('UPDATE jobs SET owner = ? WHERE id = ?', [(self.owner_id, r[0]) for r in rows])
+                conn.execute(f'DELETE FROM owners WHERE id NOT IN ({placeholders})', live)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        self.recovered += len(rows)
+        return [{
+            'id': r[0],
+            'func': r[1],
+            'args': json.loads(r[2]),
+            'priority': r[3],
+            'dedupe_key': _as_tuple(json.loads(r[4])) if r[4] else None,
+            'progress': json.loads(r[5])
+        } for r in rows]
+
+    def start(self, on_orphan):
+        """Heartbeat in the background and pass each claimed orphan job to `on_orphan`"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_orphan,), name='job-journal', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, on_orphan):
+        while True:
+            try:
+                self.heartbeat()
+                jobs = self.claim_orphans()
+                if jobs:
+                    # Queueing may wait for room; keep heartbeating meanwhile
+                    threading.Thread(target=lambda jobs=jobs: [on_orphan(job) for job in jobs],
+                                     name='job-journal-resume', daemon=True).start()
+            except Exception:
+                pass
+            if self._stop.wait(self.heartbeat_interval):
+                return
+
+    def stats(self):
+        with self._connect() as conn:
+            jobs, mine = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(owner = ?), 0) FROM jobs', (self.owner_id,)
+            ).fetchone()
+        return {'owner': self.owner_id, 'jobs': jobs, 'owned': mine, 'recovered': self.recovered}
+
+
+def _as_tuple(value):
+    """JSON turns dedupe key tuples into lists; turn them back so they stay hashable"""
+    return tuple(_as_tuple(v) for v in value) if isinstance(value, list) else value
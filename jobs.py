@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+# Lower numbers run first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# Job states reported alongside the download progress
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept another job"""
+
+
+class RetryLater(Exception):
+    """Raised by a job to run again once `delay` seconds have passed
+
+    The worker is freed in the meantime. `kwargs` are merged into the job's
+    keyword arguments for the next run, e.g. to carry attempt counts.
+    """
+
+    def __init__(self, delay, **kwargs):
+        super().__init__(f'Retrying in {delay:.1f}s')
+        self.delay = max(0.0, delay)
+        self.kwargs = kwargs
+
+
+class DownloadQueue:
+    """Bounded pool of worker threads running download jobs from a priority queue"""
+
+    def __init__(self, max_workers=3, max_queued=100, on_state_change=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queued = max(1, int(max_queued))
+        self.on_state_change = on_state_change
+        self._queue = queue.PriorityQueue(maxsize=self.max_queued)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._delayed = []  # Heap of (not before, counter, item) for jobs waiting to retry
+        self._scheduler = None
+        self._workers = []
+        self._running = 0
+        self._inflight = {}  # dedupe key -> job_id of the queued/running job
+        self._job_keys = {}  # job_id -> dedupe key
+
+    def submit(self, job_id, func, *args, priority=PRIORITY_NORMAL, dedupe_key=None, **kwargs):
+        """Queue a job and return the ID of the job that will do the work
+
+        Jobs submitted with the `dedupe_key` of a job that is still queued or
+        running are not queued again; the ID of the existing job is returned
+        instead. Raises QueueFullError when the queue is at capacity.
+        """
+        self._ensure_workers()
+
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self._inflight.get(dedupe_key)
+                if existing is not None:
+                    return existing
+                self._inflight[dedupe_key] = job_id
+                self._job_keys[job_id] = dedupe_key
+
+        # Report the queued state before the job becomes visible to workers,
+        # otherwise a fast worker could mark it running first
+        self._notify(job_id, STATE_QUEUED)
+        item = (priority, next(self._counter), job_id, func, args, kwargs)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._release(job_id)
+            raise QueueFullError(f'Download queue is full ({self.max_queued} jobs waiting)')
+        return job_id
+
+    def has_capacity(self, count=1):
+        """Check whether `count` more jobs would currently fit in the queue"""
+        with self._lock:
+            delayed = len(self._delayed)
+        # Jobs waiting to retry come back into the queue, so they count against it
+        return self._queue.qsize() + delayed + count <= self.max_queued
+
+    def stats(self):
+        """Return a snapshot of the queue for health/monitoring endpoints"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'retry_waiting': len(self._delayed),
+                'max_queued': self.max_queued
+            }
+
+    def _ensure_workers(self):
+        """Start worker threads lazily on first submit"""
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f'download-worker-{len(self._workers)}'
+                )
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            priority, _, job_id, func, args, kwargs = self._queue.get()
+            with self._lock:
+                self._running += 1
+            self._notify(job_id, STATE_RUNNING)
+            retrying = False
+            try:
+                result = func(*args, **kwargs)
+                if isinstance(result, dict) and not result.get('success', True):
+                    self._notify(job_id, STATE_FAILED, result.get('error'))
+                else:
+                    self._notify(job_id, STATE_DONE)
+            except RetryLater as retry:
+                # Keeps its dedupe key: the job is still in flight, just not on a worker
+                retrying = True
+                self._notify(job_id, STATE_QUEUED)
+                item = (priority, next(self._counter), job_id, func, args, {**kwargs, **retry.kwargs})
+                self._schedule(time.monotonic() + retry.delay, item)
+            except Exception as e:
+                self._notify(job_id, STATE_FAILED, str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+                if not retrying:
+                    self._release(job_id)
+                self._queue.task_done()
+
+    def _schedule(self, not_before, item):
+        """Put `item` back on the queue at `not_before` (a time.monotonic() value)"""
+        with self._wakeup:
+            heapq.heappush(self._delayed, (not_before, item[1], item))
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._scheduler_loop, name='download-scheduler')
+                self._scheduler.daemon = True
+                self._scheduler.start()
+            self._wakeup.notify()
+
+    def _scheduler_loop(self):
+        while True:
+            with self._wakeup:
+                while not self._delayed or self._delayed[0][0] > time.monotonic():
+                    self._wakeup.wait(self._delayed[0][0] - time.monotonic() if self._delayed else None)
+                _, _, item = heapq.heappop(self._delayed)
+            # The job was already admitted, so wait for room instead of dropping it
+            self._queue.put(item)
+
+    def _release(self, job_id):
+        """Allow new submissions with the job's dedupe key"""
+        with self._lock:
+            key = self._job_keys.pop(job_id, None)
+            if key is not None and self._inflight.get(key) == job_id:
+                del self._inflight[key]
+
+    def _notify(self, job_id, state, error=None):
+        if self.on_state_change:
+            try:
+                self.on_state_change(job_id, state, error)
+            except Exception:
+                pass
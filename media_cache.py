@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def media_key(extractor, video_id, format_id):
+    """Content key for one format of one video on one site"""
+    raw = f'{(extractor or "").lower()}\0{video_id}\0{format_id or "default"}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class MediaCache:
+    """Index of downloaded media files keyed on (extractor, video id, format)
+
+    Files stay where yt-dlp wrote them; the index remembers which key each
+    file satisfies so repeat requests can be served from disk. When the
+    indexed files exceed `max_bytes`, the least recently used ones are deleted.
+    """
+
+    def __init__(self, index_path, max_bytes=5 * 1024 ** 3):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS media ('
+                'key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, '
+                'mtime REAL NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS media_accessed ON media (accessed_at)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the path of the cached file for `key`, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT path, size, mtime FROM media WHERE key = ?', (key,)).fetchone()
+            path = self._validate(conn, key, row)
+            if path:
+                conn.execute('UPDATE media SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        with self._lock:
+            if path:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return path
+
+    def put(self, key, path):
+        """Index a freshly downloaded file and enforce the size quota"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO media (key, path, size, mtime, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', (key, path, stat.st_size, stat.st_mtime, now, now)
+            )
+            self._evict(conn, keep=key)
+
+    def touch_path(self, path):
+        """Mark a file as recently used (e.g. when it is served)"""
+        with self._connect() as conn:
+            conn.execute('UPDATE media SET accessed_at = ? WHERE path = ?', (time.time(), path))
+
+    def forget_path(self, path):
+        """Drop index entries for a file that was removed by someone else"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM media WHERE path = ?', (path,))
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media').fetchone()
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evicted_files': self.evicted_files,
+                'evicted_bytes': self.evicted_bytes
+            }
+
+    def _validate(self, conn, key, row):
+        """Check that an indexed file still exists and wasn't replaced since it was indexed"""
+        if row is None:
+            return None
+        path, size, mtime = row
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or stat.st_size != size or abs(stat.st_mtime - mtime) > 1:
+            conn.execute('DELETE FROM media WHERE key = ?', (key,))
+            return None
+        return path
+
+    def _evict(self, conn, keep=None):
+        """Delete least recently used files until the index fits in max_bytes"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM media').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute('SELECT key, path, size FROM media ORDER BY accessed_at').fetchall()
+        for key, path, size in rows:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Several keys may point at the same file; only delete it once nothing else uses it
+            conn.execute('DELETE FROM media WHERE key = ?', (key,))
+            if conn.execute('SELECT 1 FROM media WHERE path = ?', (path,)).fetchone() is None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                with self._lock:
+                    self.evicted_files += 1
+                    self.evicted_bytes += size
+            total -= size
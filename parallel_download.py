@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.postprocessor import FFmpegMergerPP
+from yt_dlp.utils import DownloadError, prepend_extension
+
+
+def fragment_workers(streams, per_stream, job_cap):
+    """Concurrent fragment downloads per stream so one job stays within `job_cap` connections"""
+    return max(1, min(per_stream, job_cap // max(1, streams)))
+
+
+def _correct_ext(filename, ext, merged_ext):
+    """Same extension fix-up yt-dlp applies to the legs of a merged download"""
+    base, real_ext = os.path.splitext(filename)
+    return f'{base if real_ext[1:] == merged_ext else filename}.{ext}'
+
+
+def merge_legs(ydl, selected):
+    """(filename, info) of each stream yt-dlp will download for a merged format, or [] if it won't split them
+
+    Mirrors YoutubeDL.process_info: every leg is saved next to the output
+    as '<name>.f<format_id>.<ext>' and merged afterwards. Formats that one
+    downloader fetches together (ffmpeg, DASH generators) are left alone.
+    """
+    requested = selected.get('requested_formats')
+    if not requested or len(requested) < 2:
+        return []
+    if get_suitable_downloader(dict(selected), ydl.params) is not None:
+        return []
+    if not FFmpegMergerPP(ydl).available:
+        return []  # yt-dlp refuses to download what it can't merge
+
+    temp_filename = ydl.prepare_filename(selected, 'temp')
+    merged_ext = selected['ext']
+    legs = []
+    for f in requested:
+        info = dict(selected)
+        del info['requested_formats']
+        info.update(f)
+        filename = prepend_extension(_correct_ext(temp_filename, info['ext'], merged_ext),
+                                     f"f{f['format_id']}", info['ext'])
+        legs.append((filename, info))
+    return legs
+
+
+def prefetch_legs(ydl, selected):
+    """Download the video and audio legs of a merged format side by side
+
+    yt-dlp fetches them one after the other. The caller merges the legs
+    itself (PostProcessPool.merge) instead of running yt-dlp's download,
+    so the merge happens on the post-processing pool. Returns the
+    (filename, info) of each leg fetched ([] when the format isn't split). A
+    failing leg raises DownloadError, whether yt-dlp raised it or only
+    reported the failure by returning False.
+    """
+    legs = merge_legs(ydl, selected)
+    if not legs:
+        return legs
+    for filename, _ in legs:
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with ThreadPoolExecutor(max_workers=len(legs), thread_name_prefix='merge-leg') as executor:
+        futures = [executor.submit(ydl.dl, filename, info) for filename, info in legs]
+        for (filename, info), future in zip(legs, futures):
+            success, _ = future.result()  # (success, whether anything was downloaded)
+            if not success:
+                raise DownloadError(f"Downloading format {info['format_id']} failed: {os.path.basename(filename)}")
+    return legs
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from urllib.parse import quote
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+
+# Upstream headers passed on to the client unchanged
+FORWARDED_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges', 'Last-Modified', 'ETag')
+
+
+def is_progressive_format(f):
+    """Whether a format is a single file fetched over plain HTTP (no merging or fragments)"""
+    return bool(f.get('url')) and f.get('protocol') in ('http', 'https') and not f.get('requested_formats')
+
+
+def content_disposition(filename):
+    """Attachment header value that survives non-ASCII titles"""
+    try:
+        filename.encode('latin-1')
+        return 'attachment; filename="{}"'.format(filename.replace('"', ''))
+    except UnicodeEncodeError:
+        fallback = filename.encode('ascii', 'ignore').decode('ascii').replace('"', '') or 'video'
+        return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename)}'
+
+
+class PassthroughStream:
+    """Relay a progressive media URL to the client as bytes arrive from the origin
+
+    When `tee_path` is set, a complete (non-ranged) transfer is also written
+    to that path and `on_complete(tee_path)` is called once it is in place.
+    Each transfer writes its own temp file, and the copy is only published if
+    no complete file exists there yet. Transfers the client abandons leave
+    nothing on disk.
+    """
+
+    def __init__(self, media_url, http_headers=None, range_header=None, tee_path=None, on_complete=None, timeout=30):
+        self.media_url = media_url
+        self.http_headers = dict(http_headers or {})
+        self.range_header = range_header
+        self.tee_path = tee_path
+        self.on_complete = on_complete
+        self.timeout = timeout
+        self.upstream = None
+
+    def open(self):
+        """Connect to the origin; raises requests.RequestException on failure"""
+        headers = dict(self.http_headers)
+        # Relay (and cache) the file exactly as stored, never a compressed transfer
+        headers['Accept-Encoding'] = 'identity'
+        if self.range_header:
+            headers['Range'] = self.range_header
+        self.upstream = requests.get(self.media_url, headers=headers, stream=True, timeout=self.timeout)
+        try:
+            self.upstream.raise_for_status()
+        except requests.RequestException:
+            self.upstream.close()
+            raise
+        if self.upstream.status_code != 200:
+            # Partial content can't be cached as the whole file
+            self.tee_path = None
+        return self
+
+    @property
+    def status_code(self):
+        return self.upstream.status_code
+
+    def headers(self):
+        return {name: self.upstream.headers[name] for name in FORWARDED_HEADERS if name in self.upstream.headers}
+
+    def __iter__(self):
+        tee = None
+        part_path = None
+        completed = False
+        try:
+            if self.tee_path:
+                # Unique per transfer: concurrent streams (or a /download) of the same video share tee_path
+                folder = os.path.dirname(self.tee_path)
+                os.makedirs(folder, exist_ok=True)
+                fd, part_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(self.tee_path) + '.',
+                                                 suffix='.part')
+                os.chmod(part_path, 0o644)  # mkstemp creates it owner-only; published files must stay readable
+                tee = os.fdopen(fd, 'wb')
+            received = 0
+            for chunk in self.upstream.raw.stream(CHUNK_SIZE, decode_content=False):
+                if not chunk:
+                    continue
+                received += len(chunk)
+                if tee:
+                    tee.write(chunk)
+                yield chunk
+            expected = self.upstream.headers.get('Content-Length')
+            completed = expected is None or int(expected) == received
+        finally:
+            self.upstream.close()
+            if tee:
+                tee.close()
+                if completed and self._publish(part_path):
+                    if self.on_complete:
+                        self.on_complete(self.tee_path)
+                else:
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
+
+    def _publish(self, part_path):
+        """Move the copy to tee_path unless a complete file is already there; returns whether it did"""
+        try:
+            # A hard link fails instead of replacing a file another transfer already published
+            os.link(part_path, self.tee_path)
+        except FileExistsError:
+            return False
+        except OSError:
+            # Filesystems without hard links
+            if os.path.exists(self.tee_path):
+                return False
+            os.replace(part_path, self.tee_path)
+            return True
+        os.remove(part_path)
+        return True
@@ -0,0 +1,79 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class UnknownTokenError(Exception):
+    """Raised for continuation tokens this process doesn't hold (expired, or issued by another worker)"""
+
+
+class PlaylistExpander:
+    """Expand playlist URLs concurrently, returning whatever finishes before a deadline
+
+    Expansions that are still running when the deadline passes keep going in
+    the background and can be collected later with the continuation token.
+    """
+
+    def __init__(self, fetch_playlist, max_workers=4, token_ttl=600):
+        self.fetch_playlist = fetch_playlist
+        self.token_ttl = token_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='playlist-expander')
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def start(self, urls):
+        """Submit playlist URLs for expansion and return a token identifying the batch"""
+        token = uuid.uuid4().hex
+        futures = [(index, url, self._executor.submit(self.fetch_playlist, url))
+                   for index, url in enumerate(urls)]
+        with self._lock:
+            self._prune()
+            self._pending[token] = {'futures': futures, 'created': time.time()}
+        return token
+
+    def collect(self, token, timeout):
+        """Wait up to `timeout` seconds and return (finished, pending_count, continuation)
+
+        `finished` is a list of (url, result) in submission order, where result
+        is the playlist info dict or the exception raised while fetching it.
+        `continuation` is None once every URL of the batch has been returned.
+        Tokens live in this process only; unknown ones raise UnknownTokenError.
+        """
+        with self._lock:
+            batch = self._pending.get(token)
+        if batch is None:
+            raise UnknownTokenError(f'Unknown or expired continuation token: {token}')
+
+        deadline = time.monotonic() + max(0, timeout)
+        not_done = {future for _, _, future in batch['futures']}
+        while not_done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _, not_done = wait(not_done, timeout=remaining, return_when=FIRST_COMPLETED)
+
+        finished = []
+        still_pending = []
+        for index, url, future in batch['futures']:
+            if future.done():
+                try:
+                    finished.append((url, future.result()))
+                except Exception as e:
+                    finished.append((url, e))
+            else:
+                still_pending.append((index, url, future))
+
+        with self._lock:
+            if still_pending:
+                batch['futures'] = still_pending
+                return finished, len(still_pending), token
+            self._pending.pop(token, None)
+        return finished, 0, None
+
+    def _prune(self):
+        """Forget batches nobody came back for"""
+        cutoff = time.time() - self.token_ttl
+        for token in [t for t, batch in self._pending.items() if batch['created'] < cutoff]:
+            for _, _, future in self._pending.pop(token)['futures']:
+                future.cancel()
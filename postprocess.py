@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.utils import PostProcessingError
+
+# Codecs an MP4 carries as they are; anything else is transcoded to H.264/AAC
+MP4_VIDEO_CODECS = ('h264', 'hevc', 'av1')
+MP4_AUDIO_CODECS = ('aac', 'mp3', 'alac')
+
+ACTION_NONE = 'none'  # Already an MP4 with compatible streams
+ACTION_REMUX = 'remux'  # Streams copied into an MP4 container
+ACTION_TRANSCODE = 'transcode'  # At least one stream re-encoded
+ACTION_MERGE = 'merge'  # Separate video and audio files copied into one MP4
+
+# Containers that carry AAC as ADTS frames (HLS segments, raw .aac); MP4 needs the
+# aac_adtstoasc bitstream filter to copy it, as yt-dlp's own merger applies
+ADTS_CONTAINERS = ('mpegts', 'aac')
+
+TRANSCODE_VIDEO_ARGS = ('libx264', '-preset', 'veryfast', '-crf', '23')
+TRANSCODE_AUDIO_ARGS = ('aac', '-b:a', '160k')
+
+# `ffmpeg -i` output, used when ffprobe isn't installed
+_INPUT_RE = re.compile(r'^Input #0, (.+?), from ', re.MULTILINE)
+_STREAM_RE = re.compile(r'^\s*Stream #0:\d+.*?: (Video|Audio): (\w+)', re.MULTILINE)
+
+
+def mp4_plan(probe, path):
+    """(action, ffmpeg codec args) that turn a probed file into a playable MP4
+
+    Streams MP4 can carry are copied; only the others are re-encoded.
+    """
+    video, audio = probe['video'], probe['audio']
+    copy_video = not video or video in MP4_VIDEO_CODECS
+    copy_audio = not audio or audio in MP4_AUDIO_CODECS
+    if copy_video and copy_audio:
+        is_mp4 = 'mp4' in probe['container'].split(',') and path.lower().endswith('.mp4')
+        return (ACTION_NONE, []) if is_mp4 else (ACTION_REMUX, ['-c', 'copy'])
+    args = ['-c:v', *(('copy',) if copy_video else TRANSCODE_VIDEO_ARGS),
+            '-c:a', *(('copy',) if copy_audio else TRANSCODE_AUDIO_ARGS)]
+    return ACTION_TRANSCODE, args
+
+
+class PostProcessPool:
+    """ffmpeg work (probing, merging, remuxing, transcoding) on its own bounded pool
+
+    Downloads mostly wait on the network, so many run at once; ffmpeg is
+    CPU-bound and gets a separate pool sized to the machine. Every ffmpeg
+    process is timed with its own resource usage, so each job reports the
+    CPU seconds it cost, and totals are kept per action.
+    """
+
+    def __init__(self, workers=2, ffmpeg=None, ffprobe=None):
+        self.workers = max(1, workers)
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+        self.ffprobe = ffprobe or shutil.which('ffprobe')
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='postprocess')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._failed = 0
+        self._totals = {}  # action -> {'runs', 'cpu_seconds', 'wall_seconds'}
+
+    def _run(self, args):
+        """Run a command; returns (returncode, stdout, stderr, cpu_seconds)"""
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=out, stderr=err)
+            if hasattr(os, 'wait4'):
+                # Reap the process ourselves to get the CPU time of this process alone
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                cpu = usage.ru_utime + usage.ru_stime
+            else:
+                proc.wait()
+                cpu = 0.0
+            out.seek(0)
+            err.seek(0)
+            return (proc.returncode, out.read().decode('utf-8', 'replace'),
+                    err.read().decode('utf-8', 'replace'), cpu)
+
+    def _probe(self, path):
+        """({'container', 'video', 'audio'}, cpu_seconds) for a media file"""
+        if self.ffprobe:
+            code, stdout, stderr, cpu = self._run([
+                self.ffprobe, '-v', 'error', '-show_entries', 'format=format_name:stream=codec_type,codec_name',
+                '-of', 'json', path
+            ])
+            if code != 0:
+                raise PostProcessingError(f'ffprobe failed: {_last_line(stderr, code)}')
+            data = json.loads(stdout or '{}')
+            streams = [(s.get('codec_type'), s.get('codec_name')) for s in data.get('streams', [])]
+            container = data.get('format', {}).get('format_name', '')
+        else:
+            # ffmpeg without an output file prints the input's streams and exits with an error
+            code, _, stderr, cpu = self._run([self.ffmpeg, '-hide_banner', '-i', path])
+            match = _INPUT_RE.search(stderr)
+            if not match:
+                raise PostProcessingError(f'ffmpeg could not read {os.path.basename(path)}: {_last_line(stderr, code)}')
+            streams = [(kind.lower(), codec) for kind, codec in _STREAM_RE.findall(stderr)]
+            container = match.group(1)
+        return {
+            'container': container,
+            'video': next((codec for kind, codec in streams if kind == 'video'), None),
+            'audio': next((codec for kind, codec in streams if kind == 'audio'), None)
+        }, cpu
+
+    def _ffmpeg(self, action, inputs, args, output):
+        """Write `output` via a temp file; returns the CPU seconds used"""
+        temp = f'{os.path.splitext(output)[0]}.temp.mp4'
+        cmd = [self.ffmpeg, '-y', '-loglevel', 'error']
+        for path in inputs:
+            cmd += ['-i', path]
+        code, _, stderr, cpu = self._run(cmd + list(args) + ['-movflags', '+faststart', temp])
+        if code != 0:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise PostProcessingError(f'ffmpeg {action} failed: {_last_line(stderr, code)}')
+        os.replace(temp, output)
+        return cpu
+
+    def _convert_to_mp4(self, path):
+        if not self.ffmpeg:
+            if path.lower().endswith('.mp4'):
+                return {'filepath': path, 'action': ACTION_NONE, 'cpu_seconds': 0.0}
+            raise PostProcessingError('ffmpeg not found; it is needed to convert to MP4')
+        probe, cpu = self._probe(path)
+        action, args = mp4_plan(probe, path)
+        if action == ACTION_NONE:
+            return {'filepath': path, 'action': action, 'cpu_seconds': cpu, 'codecs': probe}
+        output = f'{os.path.splitext(path)[0]}.mp4'
+        cpu += self._ffmpeg(action, [path], ['-map', '0:v:0?', '-map', '0:a:0?', *args], output)
+        if output != path:
+            os.remove(path)
+        return {'filepath': output, 'action': action, 'cpu_seconds': cpu, 'codecs': probe}
+
+    def _merge(self, video_path, audio_path, output):
+        if not self.ffmpeg:
+            raise PostProcessingError('ffmpeg not found; it is needed to merge video and audio')
+        args = ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0']
+        probe, cpu = self._probe(audio_path)
+        if probe['audio'] == 'aac' and set(probe['container'].split(',')) & set(ADTS_CONTAINERS):
+            args += ['-bsf:a', 'aac_adtstoasc']
+        cpu += self._ffmpeg(ACTION_MERGE, [video_path, audio_path], args, output)
+        for path in (video_path, audio_path):
+            if path != output and os.path.exists(path):
+                os.remove(path)
+        return {'filepath': output, 'action': ACTION_MERGE, 'cpu_seconds': cpu}
+
+    def _measured(self, func, *args):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        started = time.monotonic()
+        try:
+            result = func(*args)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+        result['wall_seconds'] = round(time.monotonic() - started, 3)
+        result['cpu_seconds'] = round(result['cpu_seconds'], 3)
+        with self._lock:
+            totals = self._totals.setdefault(result['action'], {'runs': 0, 'cpu_seconds': 0.0, 'wall_seconds': 0.0})
+            totals['runs'] += 1
+            totals['cpu_seconds'] += result['cpu_seconds']
+            totals['wall_seconds'] += result['wall_seconds']
+        return result
+
+    def _submit(self, func, *args):
+        """Run `func` on the pool and wait for it (the calling download thread blocks)"""
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._measured, func, *args).result()
+
+    def convert_to_mp4(self, path):
+        """Make `path` a playable MP4, copying streams where possible
+
+        Returns {'filepath', 'action', 'cpu_seconds', 'wall_seconds', 'codecs'};
+        the original file is replaced when it had to be rewritten.
+        """
+        return self._submit(self._convert_to_mp4, path)
+
+    def merge(self, video_path, audio_path, output):
+        """Copy separately downloaded video and audio into `output` and remove them"""
+        return self._submit(self._merge, video_path, audio_path, output)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'ffmpeg': bool(self.ffmpeg),
+                'ffprobe': bool(self.ffprobe),
+                'queued': self._queued,
+                'active': self._active,
+                'failed': self._failed,
+                'actions': {
+                    action: {
+                        'runs': t['runs'],
+                        'cpu_seconds': round(t['cpu_seconds'], 3),
+                        'wall_seconds': round(t['wall_seconds'], 3),
+                        'cpu_seconds_avg': round(t['cpu_seconds'] / t['runs'], 3)
+                    }
+                    for action, t in self._totals.items()
+                }
+            }
+
+
+def _last_line(text, returncode):
+    lines = text.strip().splitlines()
+    return lines[-1] if lines else f'exit status {returncode}'
@@ -0,0 +1,210 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Progress statuses after which a job no longer changes
+FINISHED_STATUSES = {'finished', 'completed', 'error'}
+
+
+def is_finished(progress):
+    """Whether a job has reached a final status and will not change anymore"""
+    return progress.get('status') in FINISHED_STATUSES and progress.get('state') not in ('queued', 'running')
+
+
+class ChangeNotifier:
+    """Lets streaming readers sleep until a job in this process changes"""
+
+    def __init__(self):
+        self._version = 0
+        self._changed = threading.Condition()
+
+    def wait_for_change(self, version, timeout):
+        """Block until the store changes after `version` or `timeout` passes; returns the new version
+
+        Changes made by other processes (shared SQLite store) don't wake
+        waiters, so callers should re-check the store after a timeout too.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            return self._version
+
+    def _notify_change(self):
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+
+class MemoryProgressStore(ChangeNotifier):
+    """Thread-safe in-process job/progress store with expiry of finished jobs"""
+
+    backend = 'memory'
+
+    def __init__(self, finished_ttl=3600):
+        super().__init__()
+        self.finished_ttl = finished_ttl
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished_at = {}
+        self._last_prune = 0
+
+    def create(self, job_id, progress):
+        """Register a new job with its initial progress fields"""
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = dict(progress)
+            self._finished_at.pop(job_id, None)
+        self._notify_change()
+
+    def get(self, job_id):
+        """Return a copy of the job's progress, or None if unknown"""
+        with self._lock:
+            progress = self._jobs.get(job_id)
+            return dict(progress) if progress is not None else None
+
+    def update(self, job_id, fields):
+        """Merge fields into an existing job; returns False if the job is unknown"""
+        return self.modify(job_id, lambda progress: progress.update(fields))
+
+    def modify(self, job_id, func):
+        """Apply `func` to the job's progress dict atomically"""
+        with self._lock:
+            progress = self._jobs.get(job_id)
+            if progress is None:
+                return False
+            func(progress)
+            self._track_finished(job_id, progress)
+        self._notify_change()
+        return True
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+
+    def __contains__(self, job_id):
+        with self._lock:
+            return job_id in self._jobs
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'jobs': len(self._jobs),
+                'finished': len(self._finished_at)
+            }
+
+    def _track_finished(self, job_id, progress):
+        if is_finished(progress):
+            self._finished_at.setdefault(job_id, time.time())
+        else:
+            self._finished_at.pop(job_id, None)
+
+    def _prune(self):
+        """Drop finished jobs older than finished_ttl (at most once a minute)"""
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        cutoff = now - self.finished_ttl
+        for job_id in [j for j, finished_at in self._finished_at.items() if finished_at < cutoff]:
+            self._jobs.pop(job_id, None)
+            del self._finished_at[job_id]
+
+
+class SQLiteProgressStore(ChangeNotifier):
+    """Job/progress store in a SQLite file so every worker process sees the same jobs"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path, finished_ttl=3600):
+        super().__init__()
+        self.path = path
+        self.finished_ttl = finished_ttl
+        self._last_prune = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, progress TEXT NOT NULL, '
+                'updated_at REAL NOT NULL, finished_at REAL)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, progress):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, progress, updated_at, finished_at) VALUES (?, ?, ?, NULL)',
+                (job_id, json.dumps(progress), now)
+            )
+            self._prune(conn, now)
+        self._notify_change()
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT progress FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, fields):
+        return self.modify(job_id, lambda progress: progress.update(fields))
+
+    def modify(self, job_id, func):
+        now = time.time()
+        with self._connect() as conn:
+            # Take the write lock up front so concurrent read-modify-writes don't interleave
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT progress, finished_at FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if row is None:
+                    conn.execute('ROLLBACK')
+                    return False
+                progress = json.loads(row[0])
+                func(progress)
+                finished_at = (row[1] or now) if is_finished(progress) else None
+                conn.execute(
+                    'UPDATE jobs SET progress = ?, updated_at = ?, finished_at = ? WHERE id = ?',
+                    (json.dumps(progress), now, finished_at, job_id)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        self._notify_change()
+        return True
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def __contains__(self, job_id):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM jobs WHERE id = ?', (job_id,)).fetchone() is not None
+
+    def stats(self):
+        with self._connect() as conn:
+            jobs, finished = conn.execute(
+                'SELECT COUNT(*), COUNT(finished_at) FROM jobs'
+            ).fetchone()
+        return {'backend': self.backend, 'jobs': jobs, 'finished': finished}
+
+    def _prune(self, conn, now):
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        conn.execute('DELETE FROM jobs WHERE finished_at < ?', (now - self.finished_ttl,))
+
+
+def create_progress_store(path=None, finished_ttl=3600):
+    """Build the SQLite store when a path is configured, otherwise the in-memory one"""
+    if path:
+        return SQLiteProgressStore(path, finished_ttl=finished_ttl)
+    return MemoryProgressStore(finished_ttl=finished_ttl)
@@ -0,0 +1,234 @@
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from url_classifier import classify_url
+
+# Statuses the platforms answer with when they throttle or bot-block us
+THROTTLE_STATUSES = (429, 403)
+_THROTTLE_RE = re.compile(r'HTTP Error (429|403)\b|Too Many Requests|rate.?limit|Sign in to confirm you.re not a bot', re.IGNORECASE)
+
+
+class RateLimitedError(Exception):
+    """Raised when a platform is backing off for longer than the caller is willing to wait"""
+
+
+def error_chain(exc):
+    """Yield an error followed by the errors it wraps (yt-dlp keeps them in exc_info/cause)"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc_info = getattr(exc, 'exc_info', None)
+        exc = (getattr(exc, 'cause', None) or (exc_info[1] if exc_info else None)
+               or exc.__cause__ or exc.__context__)
+
+
+def http_status(exc):
+    """HTTP status behind a (possibly wrapped) yt-dlp/requests error, or None"""
+    for error in error_chain(exc):
+        status = getattr(error, 'status', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def retry_after(exc):
+    """Seconds from a Retry-After header on the error's response, if any"""
+    for error in error_chain(exc):
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        value = headers.get('Retry-After') if headers else None
+        if value and str(value).strip().isdigit():
+            return int(value)
+    return None
+
+
+def is_throttled(exc):
+    """Whether an error means the platform is rate limiting or bot-blocking us"""
+    return http_status(exc) in THROTTLE_STATUSES or bool(_THROTTLE_RE.search(str(exc)))
+
+
+def limit_key(url):
+    """Platform name for supported sites, otherwise the host"""
+    platform = classify_url(url).platform
+    if platform:
+        return platform
+    return (urlsplit(url if '//' in url else f'//{url}').hostname or 'default').lower()
+
+
+class _Bucket:
+    """Token bucket, concurrency caps and backoff state for one platform/host"""
+
+    def __init__(self, rate, burst, concurrency, transfers):
+        self.rate = rate  # Tokens per second
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.slots = threading.BoundedSemaphore(max(1, concurrency))
+        self.concurrency = max(1, concurrency)
+        self.transfer_slots = threading.BoundedSemaphore(max(1, transfers))
+        self.transfers = max(1, transfers)
+        self.transferring = 0
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, now):
+        """Take a token and return how long to wait before using it"""
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        else:
+            delay = 0.0
+        return max(delay, self.blocked_until - now)
+
+
+class PlatformRateLimiter:
+    """Shared request pacing per platform (or host for other sites)
+
+    Each key gets a token bucket (`rate` requests/second with `burst`), a cap
+    on concurrent metadata fetches and a separate cap on concurrent media
+    transfers. When a fetch or transfer fails with 429/403 or a bot check,
+    the whole key backs off exponentially with jitter; a success resets it.
+    `limits` maps platform/host names to {'rate', 'burst', 'concurrency',
+    'transfers'}; the 'default' entry applies to everything else.
+    """
+
+    def __init__(self, limits, backoff_base=5.0, backoff_max=300.0):
+        self.limits = limits
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _bucket(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                limit = self.limits.get(key) or self.limits['default']
+                bucket = self._buckets[key] = _Bucket(limit['rate'], limit.get('burst', 1), limit['concurrency'],
+                                                      limit.get('transfers', limit['concurrency']))
+            return bucket
+
+    @contextmanager
+    def limit(self, key, max_wait=None):
+        """Wait for a concurrency slot and a token for `key`, then run the block
+
+        Raises RateLimitedError instead of waiting longer than `max_wait`
+        seconds for the slot and token together. Throttling errors raised by
+        the block start or extend the backoff for `key` and are re-raised.
+        Hold this only for extraction; file downloads go through `transfer`.
+        """
+        bucket = self._bucket(key)
+        started = time.monotonic()
+        if max_wait is not None:
+            with self._lock:
+                remaining = bucket.blocked_until - started
+            if remaining > max_wait:
+                raise RateLimitedError(f'{key} is rate limiting requests, try again in {int(remaining) + 1}s')
+
+        timeout = None if max_wait is None else max(0.0, max_wait - (time.monotonic() - started))
+        if not bucket.slots.acquire(timeout=timeout):
+            raise RateLimitedError(f'{key} is busy, no request slot came free within {max_wait:g}s')
+        try:
+            with self._lock:
+                now = time.monotonic()
+                delay = bucket.reserve(now)
+                if max_wait is not None and delay > max_wait - (now - started):
+                    bucket.tokens += 1  # Give the token back
+                    raise RateLimitedError(f'{key} is rate limiting requests, try again in {int(delay) + 1}s')
+            if delay > 0:
+                time.sleep(delay)
+            waited = time.monotonic() - started
+            with self._lock:
+                bucket.requests += 1
+                bucket.in_flight += 1
+                bucket.waited += waited
+                bucket.max_wait = max(bucket.max_wait, waited)
+
+            try:
+                with self._watch(key, bucket):
+                    yield
+            finally:
+                with self._lock:
+                    bucket.in_flight -= 1
+        finally:
+            bucket.slots.release()
+
+    @contextmanager
+    def transfer(self, key):
+        """Hold one of `key`'s media transfer slots while the block downloads
+
+        Transfers are capped apart from `limit`, so long downloads don't keep
+        metadata requests waiting, and take no token. Throttling errors back
+        the key off as they do for `limit`.
+        """
+        bucket = self._bucket(key)
+        with bucket.transfer_slots:
+            with self._lock:
+                bucket.transferring += 1
+            try:
+                with self._watch(key, bucket):
+                    yield
+            finally:
+                with self._lock:
+                    bucket.transferring -= 1
+
+    @contextmanager
+    def _watch(self, key, bucket):
+        """Back `key` off when the block fails with a throttling error, reset it on success"""
+        try:
+            yield
+        except Exception as e:
+            if is_throttled(e):
+                self.penalize(key, retry_after(e))
+            raise
+        else:
+            with self._lock:
+                bucket.strikes = 0
+
+    def penalize(self, key, delay=None):
+        """Back off `key` exponentially (with jitter), or for `delay` seconds if the server said so"""
+        bucket = self._bucket(key)
+        with self._lock:
+            bucket.strikes += 1
+            bucket.throttled += 1
+            if delay is None:
+                ceiling = min(self.backoff_max, self.backoff_base * 2 ** (bucket.strikes - 1))
+                delay = random.uniform(ceiling / 2, ceiling)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + min(delay, self.backoff_max))
+            return delay
+
+    def backoff_remaining(self, key):
+        """Seconds until `key`'s throttling backoff ends (0 when it isn't backing off)"""
+        bucket = self._bucket(key)
+        with self._lock:
+            return max(0.0, bucket.blocked_until - time.monotonic())
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    'requests': b.requests,
+                    'in_flight': b.in_flight,
+                    'concurrency': b.concurrency,
+                    'transferring': b.transferring,
+                    'transfers': b.transfers,
+                    'throttled': b.throttled,
+                    'backoff_remaining': round(max(0.0, b.blocked_until - now), 1),
+                    'wait_seconds_total': round(b.waited, 3),
+                    'wait_seconds_max': round(b.max_wait, 3),
+                    'wait_seconds_avg': round(b.waited / b.requests, 3) if b.requests else 0.0
+                }
+                for key, b in self._buckets.items()
+            }
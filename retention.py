@@ -0,0 +1,198 @@
+import logging
+import os
+import re
+import threading
+import time
+
+from file_index import scan_files
+
+logger = logging.getLogger(__name__)
+
+# Temporary files yt-dlp leaves next to a download until it completes
+PARTIAL_FILE_RE = re.compile(r'(\.part(-Frag\d+)?|\.ytdl|\.temp(\.\w+)?)$')
+
+
+class RetentionSweeper:
+    """Background cleanup of the downloads folder
+
+    Each sweep removes orphaned partial files, files not accessed for
+    `max_age` seconds and then the least recently accessed files until the
+    folder fits in `max_bytes`. Files of jobs that are still running are
+    never touched.
+    """
+
+    def __init__(self, folder, max_age=None, max_bytes=None, interval=300,
+                 partial_grace=3600, active_grace=300, on_remove=None, on_scan=None):
+        self.folder = folder
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.partial_grace = partial_grace
+        self.active_grace = active_grace
+        self.on_remove = on_remove
+        self.on_scan = on_scan
+        self._lock = threading.Lock()
+        self._protected = {}  # path -> (owner job ID or None, last seen)
+        self._stop = threading.Event()
+        self._thread = None
+        self.sweeps = 0
+        self.files_removed = 0
+        self.partial_files_removed = 0
+        self.bytes_reclaimed = 0
+        self.folder_bytes = 0
+        self.last_sweep_at = None
+        self.last_sweep_duration = None
+
+    def start(self):
+        """Run sweeps every `interval` seconds in a daemon thread"""
+        if self._thread is not None or not self.interval:
+            return
+        self._thread = threading.Thread(target=self._run, name='retention-sweeper')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def protect(self, path, owner=None):
+        """Keep `path` (and its partial files) until `owner` is released
+
+        Paths protected without an owner are kept for `active_grace` seconds
+        after the last call.
+        """
+        if path:
+            with self._lock:
+                self._protected[os.path.abspath(path)] = (owner, time.time())
+
+    def release(self, owner):
+        """Drop the protection of every path belonging to a finished job"""
+        with self._lock:
+            for path in [p for p, (o, _) in self._protected.items() if o == owner]:
+                del self._protected[path]
+
+    def touch(self, path):
+        """Record an access so the file counts as recently used"""
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    def sweep(self):
+        """Run one cleanup pass and return what it removed"""
+        started = time.monotonic()
+        now = time.time()
+        removed = 0
+        partial_removed = 0
+        reclaimed = 0
+
+        with self._lock:
+            # Ownerless protections only last while the job keeps reporting progress
+            for path in [p for p, (o, seen) in self._protected.items()
+                         if o is None and now - seen > self.active_grace]:
+                del self._protected[path]
+            protected = set(self._protected)
+
+        candidates = []
+        kept = []
+        total = 0
+        for path, stat in scan_files(self.folder):
+            total += stat.st_size
+            partial = PARTIAL_FILE_RE.search(path)
+            if self._is_active(path, stat, protected, now):
+                if not partial:
+                    kept.append((path, stat))
+                continue
+            if partial:
+                if now - stat.st_mtime > self.partial_grace and self._remove(path):
+                    partial_removed += 1
+                    reclaimed += stat.st_size
+                    total -= stat.st_size
+                continue
+            last_access = max(stat.st_atime, stat.st_mtime)
+            if self.max_age and now - last_access > self.max_age:
+                if self._remove(path):
+                    removed += 1
+                    reclaimed += stat.st_size
+                    total -= stat.st_size
+                continue
+            candidates.append((last_access, path, stat))
+
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        for index, (_, path, stat) in enumerate(candidates):
+            if not self.max_bytes or total <= self.max_bytes:
+                kept.extend((p, st) for _, p, st in candidates[index:])
+                break
+            if self._remove(path):
+                removed += 1
+                reclaimed += stat.st_size
+                total -= stat.st_size
+            else:
+                kept.append((path, stat))
+
+        self._remove_empty_dirs()
+        if self.on_scan:
+            # Lets listings resync with files that were added or removed behind our back
+            self.on_scan(kept, now)
+
+        with self._lock:
+            self.sweeps += 1
+            self.files_removed += removed
+            self.partial_files_removed += partial_removed
+            self.bytes_reclaimed += reclaimed
+            self.folder_bytes = total
+            self.last_sweep_at = now
+            self.last_sweep_duration = round(time.monotonic() - started, 3)
+        return {'files_removed': removed, 'partial_files_removed': partial_removed, 'bytes_reclaimed': reclaimed}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_age': self.max_age,
+                'max_bytes': self.max_bytes,
+                'folder_bytes': self.folder_bytes,
+                'protected_files': len(self._protected),
+                'sweeps': self.sweeps,
+                'files_removed': self.files_removed,
+                'partial_files_removed': self.partial_files_removed,
+                'bytes_reclaimed': self.bytes_reclaimed,
+                'last_sweep_at': self.last_sweep_at,
+                'last_sweep_duration': self.last_sweep_duration
+            }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception('Retention sweep failed')
+
+    def _is_active(self, path, stat, protected, now):
+        """Whether a file may belong to a download that is still in progress"""
+        if now - stat.st_mtime < self.active_grace:
+            return True
+        base = PARTIAL_FILE_RE.sub('', path)
+        return path in protected or base in protected
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        if self.on_remove:
+            try:
+                self.on_remove(path)
+            except Exception:
+                pass
+        return True
+
+    def _remove_empty_dirs(self):
+        """Remove playlist folders left empty by the sweep"""
+        for root, _, _ in os.walk(self.folder, topdown=False):
+            if root != self.folder:
+                try:
+                    # Leave folders a job has only just created alone
+                    if time.time() - os.stat(root).st_mtime < self.active_grace:
+                        continue
+                    os.rmdir(root)  # fails unless the folder is empty
+                except OSError:
+                    pass
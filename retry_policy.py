@@ -0,0 +1,78 @@
+import random
+import re
+from collections import namedtuple
+
+import yt_dlp
+
+from rate_limiter import error_chain, http_status, is_throttled
+
+# Error classes, in the order they are checked
+ERROR_THROTTLED = 'throttled'
+ERROR_GEO_AUTH = 'geo_auth'
+ERROR_NOT_FOUND = 'not_found'
+ERROR_FFMPEG = 'ffmpeg'
+ERROR_TRANSIENT = 'transient'
+ERROR_UNKNOWN = 'unknown'
+
+RetryRule = namedtuple('RetryRule', ['retries', 'base_delay', 'max_delay'])
+
+# How often and how patiently each class of error is retried
+RETRY_RULES = {
+    ERROR_TRANSIENT: RetryRule(3, 2, 30),
+    ERROR_THROTTLED: RetryRule(2, 30, 300),
+    ERROR_FFMPEG: RetryRule(1, 1, 1),  # The streams are kept, so a retry only merges again
+    ERROR_UNKNOWN: RetryRule(1, 5, 5),
+    ERROR_GEO_AUTH: RetryRule(0, 0, 0),
+    ERROR_NOT_FOUND: RetryRule(0, 0, 0),
+}
+
+_GEO_AUTH_RE = re.compile(
+    r'available in your country|geo.?restrict|login required|log in|sign in to view|private video'
+    r'|members.only|confirm your age|age.restricted|requires authentication',
+    re.IGNORECASE
+)
+_NOT_FOUND_RE = re.compile(
+    r'HTTP Error (404|410)\b|video unavailable|has been removed|no longer available|does not exist'
+    r'|unsupported url|not a valid url|requested format is not available|content isn.t available'
+    r'|page not found|no video formats found|account .*(terminated|suspended)',
+    re.IGNORECASE
+)
+_FFMPEG_RE = re.compile(r'ffmpeg|ffprobe|postprocessing|merging|conversion failed', re.IGNORECASE)
+_TRANSIENT_RE = re.compile(
+    r'timed? ?out|connection (reset|refused|aborted)|temporary failure|name resolution|network is unreachable'
+    r'|incompleteread|bytes read|content too short|HTTP Error 5\d\d|remote end closed|broken pipe'
+    r'|unable to download (webpage|video data)|ssl',
+    re.IGNORECASE
+)
+
+_TRANSIENT_TYPES = (yt_dlp.networking.exceptions.TransportError, yt_dlp.networking.exceptions.IncompleteRead,
+                    yt_dlp.utils.ContentTooShortError, ConnectionError, TimeoutError)
+
+
+def classify_error(exc):
+    """Sort a download/extraction error into one of the ERROR_* classes"""
+    if is_throttled(exc):
+        return ERROR_THROTTLED
+    causes = list(error_chain(exc))
+    message = str(exc)
+    if any(isinstance(e, yt_dlp.utils.GeoRestrictedError) for e in causes) or _GEO_AUTH_RE.search(message):
+        return ERROR_GEO_AUTH
+    status = http_status(exc)
+    if any(isinstance(e, yt_dlp.utils.UnsupportedError) for e in causes) or status in (404, 410) \
+            or _NOT_FOUND_RE.search(message):
+        return ERROR_NOT_FOUND
+    if any(isinstance(e, yt_dlp.utils.PostProcessingError) for e in causes) or _FFMPEG_RE.search(message):
+        return ERROR_FFMPEG
+    if any(isinstance(e, _TRANSIENT_TYPES) for e in causes) or (status and status >= 500) \
+            or _TRANSIENT_RE.search(message):
+        return ERROR_TRANSIENT
+    return ERROR_UNKNOWN
+
+
+def retry_delay(error_class, retry):
+    """Seconds to wait before the `retry`-th retry (1-based) of an `error_class` error, or None if it shouldn't happen"""
+    rule = RETRY_RULES.get(error_class, RETRY_RULES[ERROR_UNKNOWN])
+    if retry > rule.retries:
+        return None
+    ceiling = min(rule.max_delay, rule.base_delay * 2 ** (retry - 1))
+    return random.uniform(ceiling / 2, ceiling) if ceiling else 0.0
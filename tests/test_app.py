@@ -0,0 +1,185 @@
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+
+import pytest
+
+# Without DOWNLOADS_FOLDER/CACHE_FOLDER the app uses temp folders and runs with the job journal disabled
+import app as app_module
+from retry_policy import ERROR_NOT_FOUND, ERROR_THROTTLED
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_process_batch_urls_rejects_urls_with_a_continuation_token(client):
+    response = client.post('/process_batch_urls', json={
+        'urls': ['https://www.youtube.com/playlist?list=PL1234567890'],
+        'continuation': 'abc'
+    })
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_process_batch_urls_reports_an_unknown_continuation_token(client):
+    response = client.post('/process_batch_urls', json={'continuation': 'abc'})
+    assert response.status_code == 410
+    assert response.get_json()['continuation_expired'] is True
+
+
+def test_batch_completes_when_its_last_download_settles():
+    store = app_module.progress_store
+    store.create('batch-a', {'status': 'batch', 'download_ids': ['dl-1', 'dl-2']})
+    for download_id in ('dl-1', 'dl-2'):
+        store.create(download_id, {'status': 'queued', 'state': 'queued', 'batch_ids': ['batch-a']})
+
+    store.update('dl-1', {'status': 'finished'})
+    app_module.update_job_state('dl-1', app_module.STATE_DONE)
+    assert store.get('batch-a')['status'] == 'batch'
+
+    app_module.update_job_state('dl-2', app_module.STATE_FAILED, 'boom')
+    assert store.get('dl-2')['status'] == 'error'
+    assert store.get('batch-a')['status'] == 'completed'
+
+
+@pytest.fixture
+def served_file():
+    path = os.path.join(app_module.DOWNLOADS_FOLDER, 'range-test.mp4')
+    with open(path, 'wb') as f:
+        f.write(bytes(range(256)) * 4)
+    yield 'range-test.mp4'
+    os.remove(path)
+
+
+def test_download_file_advertises_ranges(client, served_file):
+    response = client.get(f'/download_file/{served_file}')
+    assert response.status_code == 200
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert len(response.data) == 1024
+
+
+def test_download_file_serves_the_requested_range(client, served_file):
+    response = client.get(f'/download_file/{served_file}', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 10-19/1024'
+    assert response.data == bytes(range(10, 20))
+
+
+def test_download_file_rejects_an_unsatisfiable_range(client, served_file):
+    response = client.get(f'/download_file/{served_file}', headers={'Range': 'bytes=5000-'})
+    assert response.status_code == 416
+
+
+def test_download_file_answers_if_none_match(client, served_file):
+    etag = client.get(f'/download_file/{served_file}').headers['ETag']
+    response = client.get(f'/download_file/{served_file}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_download_file_falls_back_to_the_full_file_on_a_stale_if_range(client, served_file):
+    response = client.get(f'/download_file/{served_file}',
+                          headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert len(response.data) == 1024
+
+
+def test_download_zip_streams_a_playlist_folder(client):
+    folder = os.path.join(app_module.DOWNLOADS_FOLDER, 'zip-test')
+    os.makedirs(folder, exist_ok=True)
+    for name in ('one.mp4', 'two.mp4', 'two.mp4.part'):
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(name.encode())
+    response = client.get('/download_zip?folder=zip-test')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert 'zip-test.zip' in response.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['zip-test/one.mp4', 'zip-test/two.mp4']
+
+
+def test_throttled_retry_waits_out_the_platform_backoff(monkeypatch):
+    url = 'https://www.instagram.com/reel/RETRY1/'
+    downloader = app_module.downloader
+    monkeypatch.setattr(downloader, 'download_video', lambda *args, **kwargs: {
+        'success': False, 'error': 'HTTP Error 429: Too Many Requests', 'error_class': ERROR_THROTTLED})
+    monkeypatch.setattr(downloader, 'rate_limiter', app_module.PlatformRateLimiter(app_module.PLATFORM_LIMITS))
+    # Far longer than the throttled rule's own delay for a first retry
+    downloader.rate_limiter.penalize('instagram', 200)
+    app_module.progress_store.create('retry-1', {'status': 'queued'})
+
+    with pytest.raises(app_module.RetryLater) as retry:
+        downloader.download_video_with_retry(url, download_id='retry-1')
+    assert retry.value.delay > 199
+    assert retry.value.kwargs == {'retries': {ERROR_THROTTLED: 1}}
+    progress = app_module.progress_store.get('retry-1')
+    assert progress['status'] == 'retrying'
+    assert progress['attempts'][0]['error_class'] == ERROR_THROTTLED
+
+
+def test_permanent_errors_fail_without_retrying(monkeypatch):
+    monkeypatch.setattr(app_module.downloader, 'download_video', lambda *args, **kwargs: {
+        'success': False, 'error': 'Video unavailable', 'error_class': ERROR_NOT_FOUND})
+    app_module.progress_store.create('retry-2', {'status': 'queued'})
+    result = app_module.downloader.download_video_with_retry('https://youtu.be/dQw4w9WgXcQ', download_id='retry-2')
+    assert result['success'] is False
+    assert app_module.progress_store.get('retry-2')['error_class'] == ERROR_NOT_FOUND
+
+
+class FakeYoutubeDL:
+    """Writes an empty file per item instead of downloading it"""
+
+    def __init__(self, params):
+        self.params = params
+
+    def extract_info(self, url, download=False):
+        if not download:
+            return {'id': url.rsplit('=', 1)[-1], 'title': 'item', 'webpage_url': url}
+        return {'entries': []}
+
+    def process_ie_result(self, info, download=True):
+        filepath = self.params['outtmpl'].replace('%(title)s', info['title']).replace('%(ext)s', 'mp4')
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        open(filepath, 'wb').close()
+        return {'requested_downloads': [{'filepath': filepath}]}
+
+
+class FakePool:
+    @contextmanager
+    def checkout(self, params):
+        yield FakeYoutubeDL(params)
+
+
+def test_playlist_download_runs_with_the_journal_disabled(monkeypatch):
+    assert app_module.job_journal is None
+    downloader = app_module.downloader
+    monkeypatch.setattr(downloader, 'ydl_pool', FakePool())
+    app_module.progress_store.create('playlist-1', {'status': 'queued'})
+    result = downloader.download_playlist('https://www.youtube.com/playlist?list=PLnojournal', 'playlist-1',
+                                          concurrency=1)
+    assert result == {'success': True}
+    assert app_module.progress_store.get('playlist-1')['status'] == 'completed'
+
+
+def test_concurrent_playlist_download_runs_with_the_journal_disabled(monkeypatch):
+    downloader = app_module.downloader
+    listed = []
+
+    def get_playlist_info(url, page=None, page_size=None, max_wait=app_module.RATE_LIMIT_MAX_WAIT):
+        listed.append(max_wait)
+        videos = [{'url': f'https://www.youtube.com/watch?v=item{n}'} for n in range(3)]
+        return {'success': True, 'data': {'title': 'No journal', 'videos': videos}}
+
+    monkeypatch.setattr(downloader, 'ydl_pool', FakePool())
+    monkeypatch.setattr(downloader, 'get_playlist_info', get_playlist_info)
+    app_module.progress_store.create('playlist-2', {'status': 'queued'})
+    result = downloader.download_playlist('https://www.youtube.com/playlist?list=PLnojournal2', 'playlist-2',
+                                          concurrency=2)
+    assert result == {'success': True, 'failed_items': []}
+    # A queued job waits for the rate limiter instead of failing
+    assert listed == [None]
+    progress = app_module.progress_store.get('playlist-2')
+    assert progress['status'] == 'completed'
+    assert sorted(os.listdir(progress['folder'])) == ['1 - item.mp4', '2 - item.mp4', '3 - item.mp4']
@@ -0,0 +1,48 @@
+from batch_ingest import UploadParser, chunked, find_url_column
+
+
+def test_txt_upload_skips_invalid_and_duplicate_urls(tmp_path):
+    path = tmp_path / 'urls.txt'
+    path.write_text('https://www.youtube.com/watch?v=dQw4w9WgXcQ\n'
+                    '\n'
+                    'https://example.com/not-supported\n'
+                    'https://youtu.be/dQw4w9WgXcQ?si=dupe\n'
+                    'https://www.instagram.com/reel/C1a2b3/\n')
+    parser = UploadParser(str(path))
+    urls = [url for url, _ in parser]
+    assert urls == ['https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'https://www.instagram.com/reel/C1a2b3/']
+    assert (parser.lines, parser.invalid, parser.duplicates) == (5, 1, 1)
+
+
+def test_csv_upload_uses_the_named_url_column(tmp_path):
+    path = tmp_path / 'reels.csv'
+    path.write_text('title,Video URL\n'
+                    'first,https://www.instagram.com/reel/AAA/\n'
+                    'short row\n'
+                    '"with, comma",https://www.instagram.com/p/BBB/\n')
+    parser = UploadParser(str(path))
+    assert [classified.id for _, classified in parser] == ['AAA', 'BBB']
+    assert parser.lines == 4
+
+
+def test_csv_upload_without_header_reads_the_first_column(tmp_path):
+    path = tmp_path / 'plain.csv'
+    path.write_text('https://www.instagram.com/reel/AAA/,note\nhttps://www.instagram.com/reel/BBB/,note\n')
+    assert [url for url, _ in UploadParser(str(path))] == ['https://www.instagram.com/reel/AAA/',
+                                                            'https://www.instagram.com/reel/BBB/']
+
+
+def test_find_url_column():
+    assert find_url_column(['title', 'Link']) == 1
+    assert find_url_column(['reel_url']) == 0
+    assert find_url_column(['https://www.instagram.com/reel/AAA/']) is None
+
+
+def test_chunked_is_lazy():
+    def numbers():
+        yield from range(5)
+        raise AssertionError('read past the requested chunk')
+
+    chunks = chunked(numbers(), 2)
+    assert next(chunks) == [0, 1]
+    assert next(chunks) == [2, 3]
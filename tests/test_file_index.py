@@ -0,0 +1,81 @@
+import os
+import time
+
+import pytest
+
+from file_index import FileIndex, scan_files
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    folder = tmp_path / 'downloads'
+    folder.mkdir()
+    return folder
+
+
+@pytest.fixture
+def index(downloads, tmp_path):
+    return FileIndex(str(downloads), str(tmp_path / 'files.db'))
+
+
+def write(folder, name, size=10, mtime=None):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_add_ignores_paths_outside_the_folder(index, downloads, tmp_path):
+    index.add(write(downloads, 'a.mp4'), job_id='job-1')
+    index.add(write(tmp_path, 'outside.mp4'))
+    files, total = index.query()
+    assert total == 1
+    assert files[0]['path'] == 'a.mp4' and files[0]['job_id'] == 'job-1'
+
+
+def test_query_pages_sorts_and_filters(index, downloads):
+    now = time.time()
+    for n, name in enumerate(['a.mp4', 'list/b.mp4', 'list/c.mp4', 'list_x/d.mp4']):
+        index.add(write(downloads, name, size=n + 1, mtime=now - 100 + n))
+    files, total = index.query(page=1, per_page=2)
+    assert total == 4
+    assert [f['name'] for f in files] == ['d.mp4', 'c.mp4']
+    files, _ = index.query(page=2, per_page=2, sort='size', descending=False)
+    assert [f['name'] for f in files] == ['c.mp4', 'd.mp4']
+    # The underscore in the folder name must not act as a LIKE wildcard
+    files, total = index.query(folder='list')
+    assert total == 2 and {f['name'] for f in files} == {'b.mp4', 'c.mp4'}
+    files, total = index.query(recursive=False)
+    assert [f['name'] for f in files] == ['a.mp4']
+    assert index.folders() == [{'folder': 'list', 'files': 2, 'size': 5}, {'folder': 'list_x', 'files': 1, 'size': 4}]
+
+
+def test_sync_drops_missing_files_but_keeps_newer_additions(index, downloads):
+    gone = write(downloads, 'gone.mp4')
+    index.add(gone)
+    os.remove(gone)
+    time.sleep(0.01)
+    started = time.time()
+    time.sleep(0.01)
+    index.add(write(downloads, 'new.mp4'), job_id='job-2')
+    # A scan that started before new.mp4 was added
+    index.sync([], scanned_at=started)
+    files, _ = index.query()
+    assert [f['name'] for f in files] == ['new.mp4']
+
+
+def test_rescan_skips_partial_files(index, downloads):
+    write(downloads, 'done.mp4')
+    write(downloads, 'list/item.mp4')
+    write(downloads, 'item.mp4.part')
+    index.rescan(skip=lambda path: path.endswith('.part'))
+    assert index.stats()['files'] == 2
+
+
+def test_scan_files_walks_subfolders(downloads):
+    write(downloads, 'a.mp4')
+    write(downloads, 'deep/er/b.mp4', size=3)
+    found = {os.path.relpath(path, downloads): stat.st_size for path, stat in scan_files(str(downloads))}
+    assert found == {'a.mp4': 10, os.path.join('deep', 'er', 'b.mp4'): 3}
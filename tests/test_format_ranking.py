@@ -0,0 +1,56 @@
+from format_ranking import FormatRanker, DEFAULT_POLICY, audio_family, codec_family, rank_formats
+
+
+def fmt(format_id, vcodec='none', acodec='none', **fields):
+    return {'format_id': format_id, 'url': f'https://cdn.example/{format_id}', 'protocol': 'https',
+            'vcodec': vcodec, 'acodec': acodec, **fields}
+
+
+FORMATS = [
+    fmt('18', 'avc1.42001E', 'mp4a.40.2', ext='mp4', height=360, width=640),
+    fmt('137', 'avc1.640028', ext='mp4', video_ext='mp4', height=1080, width=1920, fps=30, filesize=1000),
+    fmt('248', 'vp09.00.40.08', ext='webm', video_ext='webm', height=1080, width=1920, fps=30),
+    fmt('160', 'avc1.4d400c', ext='mp4', video_ext='mp4', height=144, width=256),
+    fmt('140', acodec='mp4a.40.2', ext='m4a', abr=128, filesize=100),
+    fmt('251', acodec='opus', ext='webm', abr=160),
+    {'format_id': 'sb0', 'vcodec': 'none', 'acodec': 'none'},  # Storyboard without a URL
+]
+
+
+def test_codec_and_audio_families():
+    assert codec_family('avc1.64001F') == 'avc1'
+    assert codec_family('vp09.00.40.08') == 'vp9'
+    assert codec_family('none') is None
+    assert audio_family({'ext': 'm4a'}) == 'm4a'
+    assert audio_family({'ext': 'webm', 'acodec': 'opus'}) == 'webm'
+
+
+def test_merged_formats_pair_compatible_audio():
+    entries, best = rank_formats(FORMATS)
+    by_id = {e['format_id']: e for e in entries}
+    # Ready-made video+audio formats outrank merges under the default policy
+    assert best == '18' and by_id['18']['is_best']
+    assert by_id['137+140']['filesize'] == 1100
+    assert by_id['18']['streamable'] and not by_id['137+140']['streamable']
+    # Too small to offer as a merge
+    assert not any(e['format_id'].startswith('160') for e in entries)
+    assert [e['quality_score'] for e in entries] == sorted((e['quality_score'] for e in entries), reverse=True)
+
+
+def test_instagram_policy_keeps_low_resolution_merges():
+    entries, best = rank_formats(FORMATS, platform='instagram')
+    assert best == '137+140'
+    assert any(e['format_id'] == '160+140' for e in entries)
+
+
+def test_dedupe_keeps_the_best_format_per_resolution():
+    entries, _ = rank_formats(FORMATS)
+    assert sum(e['resolution'] == '1920x1080' for e in entries) == 1
+    entries, _ = FormatRanker(dict(DEFAULT_POLICY, dedupe=False)).rank(FORMATS)
+    assert sum(e['resolution'] == '1920x1080' for e in entries) == 2
+    assert {e['format_id'] for e in entries} >= {'137+140', '248+251'}
+
+
+def test_no_formats():
+    assert rank_formats([]) == ([], None)
+    assert rank_formats(None) == ([], None)
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from info_cache import MemoryInfoCache, SQLiteInfoCache, create_info_cache, is_info_fresh
+
+VIDEO = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteInfoCache(str(tmp_path / 'info.db'), ttl=60, max_entries=2)
+    return MemoryInfoCache(ttl=60, max_entries=2)
+
+
+def test_hit_after_set_under_equivalent_url(cache):
+    assert cache.get(VIDEO) is None
+    cache.set(VIDEO, {'id': 'dQw4w9WgXcQ'})
+    # The SQLite backend stores yt-dlp's sanitized dict, which adds a few fields
+    assert cache.get('https://youtu.be/dQw4w9WgXcQ?si=share')['id'] == 'dQw4w9WgXcQ'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_variants_are_separate(cache):
+    cache.set(VIDEO, {'flat': True}, variant='flat')
+    assert cache.get(VIDEO) is None
+    assert cache.get(VIDEO, variant='flat')['flat'] is True
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.ttl = -1
+    cache.set(VIDEO, {'id': 'x'})
+    assert cache.get(VIDEO) is None
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for n in range(3):
+        cache.set(f'https://example.com/video/{n}', {'n': n})
+        time.sleep(0.01)
+    assert cache.get('https://example.com/video/0') is None
+    assert cache.get('https://example.com/video/2')['n'] == 2
+    assert cache.stats()['entries'] == 2
+
+
+def test_create_info_cache_picks_backend(tmp_path):
+    assert create_info_cache().backend == 'memory'
+    assert create_info_cache(str(tmp_path / 'info.db')).backend == 'sqlite'
+
+
+def test_is_info_fresh_checks_age_and_signed_urls():
+    now = int(time.time())
+    assert is_info_fresh({'epoch': now, 'url': f'https://cdn.example/v?expire={now + 3600}'})
+    assert not is_info_fresh({'epoch': now - 7200})
+    assert not is_info_fresh({'epoch': now, 'formats': [{'url': f'https://cdn.example/v?expire={now + 30}'}]})
+    assert not is_info_fresh({'epoch': now, 'url': f'https://cdn.example/v?oe={now + 30:x}'})
+    assert not is_info_fresh({'_type': 'playlist', 'epoch': now})
@@ -0,0 +1,81 @@
+import sqlite3
+import time
+
+import pytest
+
+from job_journal import JobJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'jobs.db')
+
+
+def stop_heartbeating(journal, seconds=3600):
+    """Make the journal's owner look like a process that died `seconds` ago"""
+    with sqlite3.connect(journal.path) as conn:
+        conn.execute('UPDATE owners SET last_seen = ? WHERE id = ?', (time.time() - seconds, journal.owner_id))
+
+
+def test_live_owners_keep_their_jobs(path):
+    first = JobJournal(path)
+    first.record('job-1', 'download_video_with_retry', ('https://youtu.be/x', None, 'job-1'), 10)
+    second = JobJournal(path)
+    assert second.claim_orphans() == []
+    assert first.claim_orphans() == []
+
+
+def test_jobs_of_a_dead_owner_are_claimed_once(path):
+    dead = JobJournal(path)
+    dead.record('job-1', 'download_video_with_retry', ('https://youtu.be/x', None, 'job-1'), 10,
+                dedupe_key=('video', 'https://youtu.be/x', None), progress={'status': 'queued'})
+    time.sleep(0.01)
+    dead.record('job-2', 'download_playlist', ('https://www.youtube.com/playlist?list=PL1', 'job-2', None, 2), 20)
+    stop_heartbeating(dead)
+
+    alive = JobJournal(path)
+    jobs = alive.claim_orphans()
+    assert [job['id'] for job in jobs] == ['job-1', 'job-2']
+    assert jobs[0]['args'] == ['https://youtu.be/x', None, 'job-1']
+    assert jobs[0]['dedupe_key'] == ('video', 'https://youtu.be/x', None)
+    assert jobs[0]['progress'] == {'status': 'queued'}
+    assert jobs[1]['dedupe_key'] is None
+    assert alive.claim_orphans() == []
+    assert JobJournal(path).claim_orphans() == []
+    assert alive.stats()['owned'] == 2 and alive.recovered == 2
+
+
+def test_stale_owner_rows_are_removed(path):
+    dead = JobJournal(path)
+    stop_heartbeating(dead)
+    JobJournal(path).claim_orphans()
+    with sqlite3.connect(path) as conn:
+        owners = [row[0] for row in conn.execute('SELECT id FROM owners')]
+    assert dead.owner_id not in owners
+
+
+def test_checkpoints_and_finish(path):
+    journal = JobJournal(path)
+    journal.record('job-1', 'download_playlist', ('url',), 10)
+    assert journal.get_checkpoint('job-1') is None
+    journal.checkpoint('job-1', {'items_done': 3})
+    assert journal.get_checkpoint('job-1') == {'items_done': 3}
+    journal.finish('job-1')
+    assert journal.get_checkpoint('job-1') is None
+    assert journal.stats()['jobs'] == 0
+
+
+def test_background_thread_hands_orphans_over(path):
+    dead = JobJournal(path)
+    dead.record('job-1', 'download_video_with_retry', ('url',), 10)
+    stop_heartbeating(dead)
+    resumed = []
+    alive = JobJournal(path, heartbeat_interval=0.05)
+    alive.start(resumed.append)
+    try:
+        deadline = time.monotonic() + 5
+        while not resumed and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        alive.stop()
+    assert [job['id'] for job in resumed] == ['job-1']
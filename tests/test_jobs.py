@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from jobs import (DownloadQueue, QueueFullError, RetryLater, PRIORITY_HIGH, PRIORITY_LOW,
+                  STATE_QUEUED, STATE_RUNNING, STATE_DONE, STATE_FAILED)
+
+
+class StateLog:
+    """Collect on_state_change calls and let tests wait for a job to settle"""
+
+    def __init__(self):
+        self.events = []
+        self._changed = threading.Condition()
+
+    def __call__(self, job_id, state, error):
+        with self._changed:
+            self.events.append((job_id, state, error))
+            self._changed.notify_all()
+
+    def wait_for(self, job_id, state, timeout=5):
+        with self._changed:
+            assert self._changed.wait_for(lambda: (job_id, state) in self.states(), timeout)
+
+    def states(self, job_id=None):
+        return [(j, s) for j, s, _ in self.events if job_id is None or j == job_id]
+
+
+def test_runs_jobs_and_reports_states():
+    log = StateLog()
+    q = DownloadQueue(max_workers=1, on_state_change=log)
+    q.submit('ok', lambda: {'success': True})
+    q.submit('bad', lambda: {'success': False, 'error': 'nope'})
+    q.submit('raises', lambda: 1 / 0)
+    for job_id, state in (('ok', STATE_DONE), ('bad', STATE_FAILED), ('raises', STATE_FAILED)):
+        log.wait_for(job_id, state)
+    assert log.states('ok') == [('ok', STATE_QUEUED), ('ok', STATE_RUNNING), ('ok', STATE_DONE)]
+    assert ('bad', STATE_FAILED, 'nope') in log.events
+
+
+def test_dedupe_returns_the_inflight_job():
+    log = StateLog()
+    release = threading.Event()
+    q = DownloadQueue(max_workers=1, on_state_change=log)
+    assert q.submit('a', release.wait, dedupe_key='url') == 'a'
+    assert q.submit('b', release.wait, dedupe_key='url') == 'a'
+    release.set()
+    log.wait_for('a', STATE_DONE)
+    # Once the job has finished the key is free again
+    assert q.submit('c', lambda: None, dedupe_key='url') == 'c'
+    log.wait_for('c', STATE_DONE)
+    assert log.states('b') == []
+
+
+def test_queue_full_raises_and_frees_the_dedupe_key():
+    release = threading.Event()
+    started = threading.Event()
+    q = DownloadQueue(max_workers=1, max_queued=1)
+
+    def block():
+        started.set()
+        release.wait()
+
+    q.submit('running', block)
+    assert started.wait(5)
+    q.submit('queued', lambda: None)
+    assert not q.has_capacity()
+    with pytest.raises(QueueFullError):
+        q.submit('rejected', lambda: None, dedupe_key='url')
+    assert 'url' not in q._inflight
+    release.set()
+
+
+def test_has_capacity_counts_requested_jobs():
+    q = DownloadQueue(max_workers=1, max_queued=3)
+    assert q.has_capacity(3)
+    assert not q.has_capacity(4)
+
+
+def test_higher_priority_runs_first():
+    order = []
+    release = threading.Event()
+    log = StateLog()
+    q = DownloadQueue(max_workers=1, on_state_change=log)
+    q.submit('blocker', release.wait)
+    log.wait_for('blocker', STATE_RUNNING)
+    q.submit('low', order.append, 'low', priority=PRIORITY_LOW)
+    q.submit('high', order.append, 'high', priority=PRIORITY_HIGH)
+    release.set()
+    log.wait_for('low', STATE_DONE)
+    assert order == ['high', 'low']
+
+
+def test_retry_later_requeues_with_merged_kwargs():
+    log = StateLog()
+    calls = []
+    q = DownloadQueue(max_workers=1, max_queued=2, on_state_change=log)
+
+    def job(attempt=1):
+        calls.append(attempt)
+        if attempt == 1:
+            raise RetryLater(1, attempt=2)
+        return {'success': True}
+
+    q.submit('retry', job, dedupe_key='url')
+    deadline = time.monotonic() + 1
+    while q.stats()['retry_waiting'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The waiting job still counts against the queue and still owns its dedupe key
+    assert q.stats()['retry_waiting'] == 1
+    assert not q.has_capacity(2)
+    assert q.submit('dupe', lambda: None, dedupe_key='url') == 'retry'
+    log.wait_for('retry', STATE_DONE)
+    assert calls == [1, 2]
+    assert log.states('retry') == [('retry', STATE_QUEUED), ('retry', STATE_RUNNING), ('retry', STATE_QUEUED),
+                                   ('retry', STATE_RUNNING), ('retry', STATE_DONE)]
+    assert q.stats()['retry_waiting'] == 0
+    assert 'url' not in q._inflight
+
+
+def test_retry_later_frees_the_worker():
+    log = StateLog()
+    q = DownloadQueue(max_workers=1, on_state_change=log)
+
+    def later(attempt=1):
+        if attempt == 1:
+            raise RetryLater(60, attempt=2)
+
+    q.submit('later', later)
+    q.submit('next', lambda: None)
+    log.wait_for('next', STATE_DONE)
+    assert q.stats()['retry_waiting'] == 1
@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+from media_cache import MediaCache, media_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MediaCache(str(tmp_path / 'media.db'), max_bytes=250)
+
+
+def write(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_media_key_separates_formats_and_sites():
+    assert media_key('Youtube', 'abc', '22') == media_key('youtube', 'abc', '22')
+    assert media_key('youtube', 'abc', '22') != media_key('youtube', 'abc', '18')
+    assert media_key('youtube', 'abc', None) != media_key('instagram', 'abc', None)
+
+
+def test_hit_after_put(cache, tmp_path):
+    path = write(tmp_path, 'a.mp4', 100)
+    assert cache.get('a') is None
+    cache.put('a', path)
+    assert cache.get('a') == path
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_changed_or_removed_files_are_dropped(cache, tmp_path):
+    path = write(tmp_path, 'a.mp4', 100)
+    cache.put('a', path)
+    with open(path, 'ab') as f:
+        f.write(b'more')
+    assert cache.get('a') is None
+
+    cache.put('a', path)
+    os.remove(path)
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_files_are_evicted(cache, tmp_path):
+    old = write(tmp_path, 'old.mp4', 100)
+    recent = write(tmp_path, 'recent.mp4', 100)
+    cache.put('old', old)
+    time.sleep(0.01)
+    cache.put('recent', recent)
+    time.sleep(0.01)
+    cache.touch_path(old)
+    cache.put('new', write(tmp_path, 'new.mp4', 100))
+    assert not os.path.exists(recent)
+    assert cache.get('old') == old
+    assert cache.stats()['evicted_files'] == 1
+
+
+def test_shared_files_are_kept_while_another_key_uses_them(cache, tmp_path):
+    shared = write(tmp_path, 'shared.mp4', 100)
+    cache.put('first', shared)
+    time.sleep(0.01)
+    cache.put('second', shared)
+    time.sleep(0.01)
+    cache.put('new', write(tmp_path, 'new.mp4', 100))
+    assert os.path.exists(shared)
+    assert cache.get('second') == shared
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+import yt_dlp
+
+import parallel_download
+from parallel_download import fragment_workers, merge_legs, prefetch_legs
+
+
+class MergerAvailable:
+    """Stands in for FFmpegMergerPP so the tests don't need ffmpeg"""
+
+    def __init__(self, ydl):
+        self.available = True
+
+
+@pytest.fixture
+def ydl(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel_download, 'FFmpegMergerPP', MergerAvailable)
+    return yt_dlp.YoutubeDL({'outtmpl': str(tmp_path / 'out' / '%(id)s.%(ext)s'), 'quiet': True})
+
+
+def selected():
+    video = {'format_id': '137', 'url': 'https://cdn.example/v', 'protocol': 'https', 'ext': 'mp4',
+             'vcodec': 'avc1', 'acodec': 'none'}
+    audio = {'format_id': '140', 'url': 'https://cdn.example/a', 'protocol': 'https', 'ext': 'm4a',
+             'vcodec': 'none', 'acodec': 'mp4a'}
+    return {'id': 'vid', 'title': 'Video', 'ext': 'mp4', 'format_id': '137+140', 'requested_formats': [video, audio],
+            'protocol': 'https+https'}
+
+
+def test_fragment_workers_share_the_job_cap():
+    assert fragment_workers(1, 4, 8) == 4
+    assert fragment_workers(2, 4, 8) == 4
+    assert fragment_workers(3, 4, 8) == 2
+    assert fragment_workers(16, 4, 8) == 1
+
+
+def test_merge_legs_names_each_stream_like_yt_dlp(ydl, tmp_path):
+    legs = merge_legs(ydl, selected())
+    assert [filename for filename, _ in legs] == [str(tmp_path / 'out' / 'vid.f137.mp4'),
+                                                  str(tmp_path / 'out' / 'vid.f140.m4a')]
+    assert [info['format_id'] for _, info in legs] == ['137', '140']
+    assert merge_legs(ydl, {'id': 'vid', 'ext': 'mp4', 'format_id': '18'}) == []
+
+
+def test_prefetch_legs_downloads_the_legs_together(ydl):
+    both_started = threading.Barrier(2, timeout=5)
+    fetched = []
+
+    def dl(filename, info):
+        both_started.wait()
+        fetched.append(info['format_id'])
+        return True, True
+
+    ydl.dl = dl
+    legs = prefetch_legs(ydl, selected())
+    assert len(legs) == 2
+    assert sorted(fetched) == ['137', '140']
+
+
+def test_prefetch_legs_raises_when_a_leg_fails(ydl):
+    ydl.dl = lambda filename, info: (info['format_id'] != '140', True)
+    with pytest.raises(yt_dlp.utils.DownloadError, match='format 140 failed'):
+        prefetch_legs(ydl, selected())
+
+
+def test_prefetch_legs_skips_single_formats(ydl):
+    ydl.dl = lambda filename, info: pytest.fail('nothing to prefetch')
+    assert prefetch_legs(ydl, {'id': 'vid', 'ext': 'mp4', 'format_id': '18', 'url': 'https://cdn.example/v'}) == []
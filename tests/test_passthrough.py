@@ -0,0 +1,72 @@
+import functools
+import http.server
+import os
+import threading
+
+import pytest
+
+from passthrough import PassthroughStream, content_disposition, is_progressive_format
+
+PAYLOAD = os.urandom(200 * 1024)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """Serve PAYLOAD as video.mp4 from a local HTTP server"""
+    folder = tmp_path / 'origin'
+    folder.mkdir()
+    (folder / 'video.mp4').write_bytes(PAYLOAD)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(folder)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/video.mp4'
+    server.shutdown()
+    server.server_close()
+
+
+def test_is_progressive_format():
+    assert is_progressive_format({'url': 'https://cdn/v.mp4', 'protocol': 'https'})
+    assert not is_progressive_format({'url': 'https://cdn/v.m3u8', 'protocol': 'm3u8_native'})
+    assert not is_progressive_format({'url': 'https://cdn/v.mp4', 'protocol': 'https', 'requested_formats': [{}]})
+
+
+def test_content_disposition_keeps_non_ascii_names():
+    assert content_disposition('clip "1".mp4') == 'attachment; filename="clip 1.mp4"'
+    header = content_disposition('клип.mp4')
+    assert header.startswith('attachment; filename=".mp4"; ')
+    assert "filename*=UTF-8''%D0%BA%D0%BB%D0%B8%D0%BF.mp4" in header
+
+
+def test_relays_and_publishes_a_complete_copy(origin, tmp_path):
+    tee_path = str(tmp_path / 'cache' / 'video.mp4')
+    completed = []
+    stream = PassthroughStream(origin, tee_path=tee_path, on_complete=completed.append).open()
+    assert stream.status_code == 200
+    assert stream.headers()['Content-Length'] == str(len(PAYLOAD))
+    assert b''.join(stream) == PAYLOAD
+    assert completed == [tee_path]
+    with open(tee_path, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert os.listdir(os.path.dirname(tee_path)) == ['video.mp4']
+
+
+def test_abandoned_transfer_leaves_nothing_on_disk(origin, tmp_path):
+    tee_path = str(tmp_path / 'cache' / 'video.mp4')
+    chunks = iter(PassthroughStream(origin, tee_path=tee_path).open())
+    next(chunks)
+    chunks.close()
+    assert os.listdir(os.path.dirname(tee_path)) == []
+
+
+def test_existing_copy_is_not_replaced(origin, tmp_path):
+    tee_path = tmp_path / 'video.mp4'
+    tee_path.write_bytes(b'published earlier')
+    completed = []
+    stream = PassthroughStream(origin, tee_path=str(tee_path), on_complete=completed.append).open()
+    assert b''.join(stream) == PAYLOAD
+    assert tee_path.read_bytes() == b'published earlier'
+    assert completed == []
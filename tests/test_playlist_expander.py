@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+from playlist_expander import PlaylistExpander, UnknownTokenError
+
+
+def test_returns_finished_playlists_and_keeps_the_rest_pending():
+    release = threading.Event()
+
+    def fetch(url):
+        if url == 'slow':
+            release.wait(5)
+        if url == 'broken':
+            raise ValueError('no playlist')
+        return {'url': url}
+
+    expander = PlaylistExpander(fetch, max_workers=3)
+    token = expander.start(['fast', 'slow', 'broken'])
+    finished, pending, continuation = expander.collect(token, timeout=0.5)
+    assert [url for url, _ in finished] == ['fast', 'broken']
+    assert finished[0][1] == {'url': 'fast'}
+    assert isinstance(finished[1][1], ValueError)
+    assert (pending, continuation) == (1, token)
+
+    release.set()
+    finished, pending, continuation = expander.collect(token, timeout=5)
+    assert finished == [('slow', {'url': 'slow'})]
+    assert (pending, continuation) == (0, None)
+    # A finished batch is forgotten
+    with pytest.raises(UnknownTokenError):
+        expander.collect(token, timeout=0)
+
+
+def test_unknown_token_raises():
+    expander = PlaylistExpander(lambda url: {})
+    with pytest.raises(UnknownTokenError):
+        expander.collect('not-a-token', timeout=0)
+
+
+def test_stale_batches_are_pruned_on_the_next_start():
+    release = threading.Event()
+    expander = PlaylistExpander(lambda url: release.wait(5), token_ttl=-1)
+    token = expander.start(['a'])
+    expander.start(['b'])
+    release.set()
+    with pytest.raises(UnknownTokenError):
+        expander.collect(token, timeout=0)
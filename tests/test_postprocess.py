@@ -0,0 +1,113 @@
+import os
+import stat
+
+import pytest
+from yt_dlp.utils import PostProcessingError
+
+from postprocess import (ACTION_MERGE, ACTION_NONE, ACTION_REMUX, ACTION_TRANSCODE, PostProcessPool, mp4_plan)
+
+# Stub ffprobe: MPEG-TS with AAC for .ts files, MP4 with H.264/AAC for everything else
+FFPROBE = r'''#!/bin/sh
+for last; do :; done
+case "$last" in
+  *.ts) echo '{"streams": [{"codec_type": "audio", "codec_name": "aac"}], "format": {"format_name": "mpegts"}}' ;;
+  *) echo '{"streams": [{"codec_type": "video", "codec_name": "h264"}, {"codec_type": "audio", "codec_name": "aac"}], "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2"}}' ;;
+esac
+'''
+
+# Stub ffmpeg: logs its arguments and writes the output file (the last argument)
+FFMPEG = r'''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/ffmpeg.log"
+for last; do :; done
+[ -n "$FFMPEG_FAIL" ] && { echo "Conversion failed!" >&2; exit 1; }
+echo merged > "$last"
+'''
+
+# Stub ffmpeg used without ffprobe: describes a WebM input the way `ffmpeg -i` does
+FFMPEG_INFO = r'''#!/bin/sh
+cat >&2 <<'INFO'
+Input #0, matroska,webm, from 'clip.webm':
+  Stream #0:0(eng): Video: vp9 (Profile 0), yuv420p(tv, bt709), 1920x1080, 30 fps
+  Stream #0:1(eng): Audio: opus, 48000 Hz, stereo, fltp (default)
+At least one output file must be specified
+INFO
+exit 1
+'''
+
+
+def script(folder, name, body):
+    path = folder / name
+    path.write_text(body)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    bin_folder = tmp_path / 'bin'
+    bin_folder.mkdir()
+    pool = PostProcessPool(workers=1, ffmpeg=script(bin_folder, 'ffmpeg', FFMPEG),
+                           ffprobe=script(bin_folder, 'ffprobe', FFPROBE))
+    pool.log = bin_folder / 'ffmpeg.log'
+    return pool
+
+
+def touch(folder, name):
+    path = folder / name
+    path.write_bytes(b'media')
+    return str(path)
+
+
+def test_mp4_plan():
+    mp4 = {'container': 'mov,mp4,m4a,3gp,3g2,mj2', 'video': 'h264', 'audio': 'aac'}
+    assert mp4_plan(mp4, 'clip.mp4') == (ACTION_NONE, [])
+    assert mp4_plan(dict(mp4, container='matroska,webm'), 'clip.mkv') == (ACTION_REMUX, ['-c', 'copy'])
+    action, args = mp4_plan({'container': 'matroska,webm', 'video': 'vp9', 'audio': 'aac'}, 'clip.webm')
+    assert action == ACTION_TRANSCODE
+    assert args[:2] == ['-c:v', 'libx264'] and args[-2:] == ['-c:a', 'copy']
+    action, args = mp4_plan({'container': 'matroska,webm', 'video': None, 'audio': 'opus'}, 'clip.webm')
+    assert args[:3] == ['-c:v', 'copy', '-c:a']
+
+
+def test_merge_adds_the_adts_filter_for_hls_audio(pool, tmp_path):
+    output = str(tmp_path / 'clip.mp4')
+    result = pool.merge(touch(tmp_path, 'clip.f1.mp4'), touch(tmp_path, 'clip.f2.ts'), output)
+    assert result['action'] == ACTION_MERGE and result['filepath'] == output
+    args = pool.log.read_text()
+    assert '-c copy -map 0:v:0 -map 1:a:0 -bsf:a aac_adtstoasc' in args
+    assert sorted(os.listdir(tmp_path)) == ['bin', 'clip.mp4']
+    assert pool.stats()['actions'][ACTION_MERGE]['runs'] == 1
+
+
+def test_merge_copies_mp4_audio_as_is(pool, tmp_path):
+    pool.merge(touch(tmp_path, 'clip.f1.mp4'), touch(tmp_path, 'clip.f2.m4a'), str(tmp_path / 'clip.mp4'))
+    assert 'aac_adtstoasc' not in pool.log.read_text()
+
+
+def test_convert_leaves_compatible_mp4_alone(pool, tmp_path):
+    path = touch(tmp_path, 'clip.mp4')
+    assert pool.convert_to_mp4(path)['action'] == ACTION_NONE
+    assert not pool.log.exists()
+
+
+def test_convert_remuxes_into_mp4(pool, tmp_path):
+    result = pool.convert_to_mp4(touch(tmp_path, 'clip.mkv'))
+    assert result['action'] == ACTION_REMUX
+    assert result['filepath'] == str(tmp_path / 'clip.mp4')
+    assert sorted(os.listdir(tmp_path)) == ['bin', 'clip.mp4']
+
+
+def test_failed_ffmpeg_raises_and_cleans_up(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv('FFMPEG_FAIL', '1')
+    video, audio = touch(tmp_path, 'clip.f1.mp4'), touch(tmp_path, 'clip.f2.m4a')
+    with pytest.raises(PostProcessingError, match='Conversion failed!'):
+        pool.merge(video, audio, str(tmp_path / 'clip.mp4'))
+    assert sorted(os.listdir(tmp_path)) == ['bin', 'clip.f1.mp4', 'clip.f2.m4a']
+    assert pool.stats()['failed'] == 1
+
+
+def test_probe_falls_back_to_ffmpeg_without_ffprobe(tmp_path):
+    pool = PostProcessPool(ffmpeg=script(tmp_path, 'ffmpeg', FFMPEG_INFO))
+    pool.ffprobe = None
+    probe, _ = pool._probe(str(tmp_path / 'clip.webm'))
+    assert probe == {'container': 'matroska,webm', 'video': 'vp9', 'audio': 'opus'}
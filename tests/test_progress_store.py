@@ -0,0 +1,62 @@
+import pytest
+
+from progress_store import MemoryProgressStore, SQLiteProgressStore, create_progress_store, is_finished
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteProgressStore(str(tmp_path / 'progress.db'))
+    return MemoryProgressStore()
+
+
+def test_create_get_update_delete(store):
+    assert store.get('job') is None
+    assert store.update('job', {'status': 'downloading'}) is False
+    store.create('job', {'status': 'queued', 'state': 'queued'})
+    assert store.update('job', {'status': 'downloading', 'percent': 50})
+    assert store.get('job') == {'status': 'downloading', 'state': 'queued', 'percent': 50}
+    assert 'job' in store
+    store.delete('job')
+    assert 'job' not in store
+
+
+def test_get_returns_a_copy(store):
+    store.create('job', {'status': 'queued'})
+    store.get('job')['status'] = 'mutated'
+    assert store.get('job')['status'] == 'queued'
+
+
+def test_modify_applies_a_function(store):
+    store.create('job', {'ids': []})
+    store.modify('job', lambda progress: progress['ids'].append('a'))
+    assert store.get('job')['ids'] == ['a']
+
+
+def test_finished_jobs_expire(store):
+    store.finished_ttl = -1
+    store.create('done', {'status': 'finished', 'state': 'done'})
+    store.update('done', {'percent': 100})
+    store.create('running', {'status': 'finished', 'state': 'running'})
+    store._last_prune = 0
+    store.create('trigger', {'status': 'queued'})
+    assert store.get('done') is None
+    assert store.get('running') is not None
+
+
+def test_wait_for_change_wakes_on_update(store):
+    version = store.wait_for_change(-1, 0)
+    store.create('job', {'status': 'queued'})
+    assert store.wait_for_change(version, 1) != version
+
+
+def test_is_finished_requires_a_settled_state():
+    assert is_finished({'status': 'completed'})
+    assert is_finished({'status': 'error', 'state': 'failed'})
+    assert not is_finished({'status': 'finished', 'state': 'running'})
+    assert not is_finished({'status': 'downloading'})
+
+
+def test_create_progress_store_picks_backend(tmp_path):
+    assert create_progress_store().backend == 'memory'
+    assert create_progress_store(str(tmp_path / 'progress.db')).backend == 'sqlite'
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import (PlatformRateLimiter, RateLimitedError, http_status, is_throttled, limit_key,
+                          retry_after)
+
+LIMITS = {'default': {'rate': 1000, 'burst': 5, 'concurrency': 1, 'transfers': 1}}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f'HTTP Error {status}')
+        self.status = status
+        self.response = type('Response', (), {'headers': headers or {}, 'status_code': status})()
+
+
+def test_limit_key():
+    assert limit_key('https://youtu.be/dQw4w9WgXcQ') == 'youtube'
+    assert limit_key('https://Cdn.Example.com/video.mp4') == 'cdn.example.com'
+
+
+def test_error_inspection_follows_wrapped_errors():
+    try:
+        try:
+            raise HTTPError(429, {'Retry-After': '12'})
+        except HTTPError as e:
+            raise RuntimeError('download failed') from e
+    except RuntimeError as wrapped:
+        error = wrapped
+    assert http_status(error) == 429
+    assert retry_after(error) == 12
+    assert is_throttled(error)
+    assert is_throttled(Exception('Sign in to confirm you’re not a bot'))
+    assert not is_throttled(Exception('Video unavailable'))
+
+
+def test_throttling_errors_back_the_key_off():
+    limiter = PlatformRateLimiter(LIMITS, backoff_base=10, backoff_max=60)
+    with pytest.raises(HTTPError):
+        with limiter.limit('site'):
+            raise HTTPError(429)
+    assert 5 <= limiter.backoff_remaining('site') <= 10
+    with pytest.raises(RateLimitedError):
+        with limiter.limit('site', max_wait=1):
+            pass
+    assert limiter.stats()['site']['throttled'] == 1
+
+
+def test_retry_after_sets_the_backoff():
+    limiter = PlatformRateLimiter(LIMITS, backoff_max=60)
+    with pytest.raises(HTTPError):
+        with limiter.transfer('site'):
+            raise HTTPError(429, {'Retry-After': '30'})
+    assert 29 < limiter.backoff_remaining('site') <= 30
+
+
+def test_success_resets_the_strikes():
+    limiter = PlatformRateLimiter(LIMITS)
+    limiter.penalize('site', 0)
+    with limiter.limit('site'):
+        pass
+    assert limiter._bucket('site').strikes == 0
+
+
+def test_busy_slot_times_out():
+    limiter = PlatformRateLimiter(LIMITS)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with limiter.limit('site'):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    assert holding.wait(5)
+    try:
+        started = time.monotonic()
+        with pytest.raises(RateLimitedError):
+            with limiter.limit('site', max_wait=0.2):
+                pass
+        assert time.monotonic() - started < 1
+        # Transfers don't compete for the request slot
+        with limiter.transfer('site'):
+            assert limiter.stats()['site']['transferring'] == 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_tokens_pace_requests():
+    limiter = PlatformRateLimiter({'default': {'rate': 10, 'burst': 1, 'concurrency': 2}})
+    started = time.monotonic()
+    for _ in range(3):
+        with limiter.limit('site'):
+            pass
+    assert time.monotonic() - started >= 0.15
+    with pytest.raises(RateLimitedError):
+        with limiter.limit('site', max_wait=0.01):
+            pass
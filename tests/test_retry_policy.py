@@ -0,0 +1,49 @@
+import pytest
+import yt_dlp
+
+from retry_policy import (ERROR_FFMPEG, ERROR_GEO_AUTH, ERROR_NOT_FOUND, ERROR_THROTTLED, ERROR_TRANSIENT,
+                          ERROR_UNKNOWN, RETRY_RULES, classify_error, retry_delay)
+
+
+@pytest.mark.parametrize('error, error_class', [
+    (yt_dlp.utils.DownloadError('ERROR: HTTP Error 429: Too Many Requests'), ERROR_THROTTLED),
+    (yt_dlp.utils.DownloadError("Sign in to confirm you're not a bot"), ERROR_THROTTLED),
+    (yt_dlp.utils.GeoRestrictedError('blocked'), ERROR_GEO_AUTH),
+    (yt_dlp.utils.DownloadError('ERROR: Private video'), ERROR_GEO_AUTH),
+    (yt_dlp.utils.DownloadError('ERROR: Video unavailable'), ERROR_NOT_FOUND),
+    (yt_dlp.utils.DownloadError('ERROR: HTTP Error 404: Not Found'), ERROR_NOT_FOUND),
+    (yt_dlp.utils.PostProcessingError('Conversion failed!'), ERROR_FFMPEG),
+    (yt_dlp.utils.DownloadError('ERROR: Postprocessing: Stream #1:0 -> #0:1'), ERROR_FFMPEG),
+    (yt_dlp.utils.DownloadError('ERROR: Read timed out.'), ERROR_TRANSIENT),
+    (yt_dlp.utils.DownloadError('ERROR: HTTP Error 503: Service Unavailable'), ERROR_TRANSIENT),
+    (ConnectionResetError('reset by peer'), ERROR_TRANSIENT),
+    (ValueError('something odd'), ERROR_UNKNOWN),
+])
+def test_classify_error(error, error_class):
+    assert classify_error(error) == error_class
+
+
+def test_classify_error_looks_at_wrapped_errors():
+    try:
+        try:
+            raise TimeoutError()
+        except TimeoutError as e:
+            raise yt_dlp.utils.DownloadError('ERROR: download failed', exc_info=(type(e), e, None))
+    except yt_dlp.utils.DownloadError as wrapped:
+        assert classify_error(wrapped) == ERROR_TRANSIENT
+
+
+def test_retry_delay_grows_and_runs_out():
+    rule = RETRY_RULES[ERROR_TRANSIENT]
+    for retry in range(1, rule.retries + 1):
+        ceiling = min(rule.max_delay, rule.base_delay * 2 ** (retry - 1))
+        assert ceiling / 2 <= retry_delay(ERROR_TRANSIENT, retry) <= ceiling
+    assert retry_delay(ERROR_TRANSIENT, rule.retries + 1) is None
+
+
+def test_permanent_errors_are_not_retried():
+    assert retry_delay(ERROR_NOT_FOUND, 1) is None
+    assert retry_delay(ERROR_GEO_AUTH, 1) is None
+    # Unknown classes fall back to the unknown rule
+    unknown = RETRY_RULES[ERROR_UNKNOWN]
+    assert unknown.base_delay / 2 <= retry_delay('made-up', 1) <= unknown.base_delay
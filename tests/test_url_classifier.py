@@ -0,0 +1,65 @@
+import pytest
+
+from url_classifier import canonical_url, classify_url, is_playlist_url, is_serverless_supported, normalize_url
+
+
+@pytest.mark.parametrize('url, platform, kind, content_id', [
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'youtube', 'video', 'dQw4w9WgXcQ'),
+    ('youtu.be/dQw4w9WgXcQ?si=abc', 'youtube', 'video', 'dQw4w9WgXcQ'),
+    ('https://m.youtube.com/shorts/abcDEF12345', 'youtube', 'short', 'abcDEF12345'),
+    ('https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ', 'youtube', 'video', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/playlist?list=PLabc', 'youtube', 'playlist', 'PLabc'),
+    ('https://www.youtube.com/@someone', 'youtube', 'channel', '@someone'),
+    ('https://www.youtube.com/@someone/Videos', 'youtube', 'channel', '@someone/videos'),
+    ('https://www.youtube.com/feed/trending', 'youtube', 'unknown', None),
+    ('https://www.instagram.com/p/C1a2b3/', 'instagram', 'post', 'C1a2b3'),
+    ('https://www.instagram.com/someone/reel/C1a2b3/?igsh=x', 'instagram', 'reel', 'C1a2b3'),
+    ('https://www.instagram.com/stories/someone/3141592653/', 'instagram', 'story', '3141592653'),
+    ('https://www.tiktok.com/@user/video/7234567890123456789?lang=en', 'tiktok', 'video', '7234567890123456789'),
+    ('https://x.com/user/status/1234567890', 'twitter', 'video', '1234567890'),
+    ('https://www.facebook.com/watch/?v=1234567890', 'facebook', 'video', '1234567890'),
+    ('https://www.facebook.com/reel/1234567890', 'facebook', 'reel', '1234567890'),
+    ('https://www.facebook.com/page/videos/title/1234567890/', 'facebook', 'video', '1234567890'),
+])
+def test_classify_url(url, platform, kind, content_id):
+    classified = classify_url(url)
+    assert (classified.platform, classified.kind, classified.id) == (platform, kind, content_id)
+
+
+def test_unsupported_sites():
+    for url in ('https://example.com/video/1', 'https://notyoutube.com.evil.example/watch?v=x', 'not a url'):
+        assert classify_url(url).platform is None
+
+
+def test_equivalent_links_share_a_canonical_url():
+    canonical = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    for url in ('https://youtu.be/dQw4w9WgXcQ?si=share', 'https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ',
+                'https://www.youtube.com/embed/dQw4w9WgXcQ'):
+        assert canonical_url(url) == canonical
+    assert canonical_url('https://www.instagram.com/reels/C1a2b3?igsh=x') == 'https://www.instagram.com/reel/C1a2b3/'
+    assert canonical_url('https://twitter.com/user/status/42') == canonical_url('https://x.com/other/status/42')
+
+
+def test_channel_tabs_stay_distinct():
+    assert canonical_url('https://youtube.com/@someone/shorts') == 'https://www.youtube.com/@someone/shorts'
+    assert canonical_url('https://youtube.com/@someone/videos') != canonical_url('https://youtube.com/@someone/shorts')
+
+
+def test_videos_inside_a_playlist():
+    classified = classify_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLabc&index=3')
+    assert classified.playlist_id == 'PLabc'
+    assert classified.normalized == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLabc'
+    assert is_playlist_url(classified)
+    assert not is_playlist_url(classify_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ'))
+
+
+def test_normalize_url_drops_tracking_and_sorts_the_query():
+    assert normalize_url('HTTPS://www.Example.com/a/?utm_source=x&b=2&a=1#frag') == 'https://example.com/a?a=1&b=2'
+
+
+def test_is_serverless_supported():
+    assert is_serverless_supported(classify_url('https://www.youtube.com/shorts/abcDEF12345'))
+    assert is_serverless_supported(classify_url('https://www.instagram.com/reel/C1a2b3/'))
+    assert not is_serverless_supported(classify_url('https://www.youtube.com/@someone'))
+    assert not is_serverless_supported(classify_url('https://www.tiktok.com/@user/video/1'))
+    assert not is_serverless_supported(classify_url('https://example.com/video/1'))
@@ -0,0 +1,68 @@
+import pytest
+import yt_dlp
+
+from ydl_pool import YoutubeDLPool, profile_key
+
+OPTS = {'quiet': True, 'no_warnings': True}
+
+
+def test_profile_key_ignores_runtime_params_and_hooks():
+    assert profile_key({**OPTS, 'outtmpl': 'a/%(id)s', 'progress_hooks': [print]}) == profile_key(OPTS)
+    assert profile_key({**OPTS, 'format': 'best'}) != profile_key(OPTS)
+
+
+def test_instances_are_reused_per_profile():
+    pool = YoutubeDLPool()
+    with pool.checkout(OPTS) as first:
+        pass
+    with pool.checkout(dict(OPTS)) as second:
+        assert second is first
+    with pool.checkout({**OPTS, 'format': 'best'}) as other:
+        assert other is not first
+    assert pool.stats() == {'profiles': 2, 'idle': 2, 'created': 2, 'reused': 1, 'discarded': 0}
+
+
+def test_checkout_resets_hooks_and_runtime_params():
+    pool = YoutubeDLPool()
+    hook = lambda d: None  # noqa: E731
+    with pool.checkout({**OPTS, 'outtmpl': 'first/%(id)s.%(ext)s', 'playlist_items': '1-2',
+                        'progress_hooks': [hook]}) as ydl:
+        assert ydl._progress_hooks == [hook]
+        assert ydl.params['outtmpl']['default'] == 'first/%(id)s.%(ext)s'
+    assert ydl._progress_hooks == []
+    with pool.checkout(OPTS) as again:
+        assert again is ydl
+        assert again._progress_hooks == []
+        assert 'playlist_items' not in again.params
+        assert again.params['outtmpl']['default'] != 'first/%(id)s.%(ext)s'
+
+
+def test_yt_dlp_errors_keep_the_instance_but_others_discard_it():
+    pool = YoutubeDLPool()
+    with pytest.raises(yt_dlp.utils.DownloadError):
+        with pool.checkout(OPTS) as kept:
+            raise yt_dlp.utils.DownloadError('video unavailable')
+    with pytest.raises(RuntimeError):
+        with pool.checkout(OPTS) as broken:
+            assert broken is kept
+            raise RuntimeError('unexpected')
+    with pool.checkout(OPTS) as fresh:
+        assert fresh is not kept
+    assert pool.stats()['discarded'] == 1
+
+
+def test_idle_instances_are_capped():
+    created = []
+
+    def factory(params):
+        created.append(yt_dlp.YoutubeDL(params))
+        return created[-1]
+
+    pool = YoutubeDLPool(max_idle_per_profile=1, max_profiles=1, factory=factory)
+    with pool.checkout(OPTS), pool.checkout(OPTS):
+        pass
+    assert pool.stats()['idle'] == 1
+    with pool.checkout({**OPTS, 'format': 'best'}):
+        pass
+    assert pool.stats()['profiles'] == 1
+    assert len(created) == 3
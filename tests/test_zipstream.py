@@ -0,0 +1,30 @@
+import io
+import os
+import zipfile
+
+import zipstream
+from zipstream import iter_zip, unique_arcnames
+
+
+def test_unique_arcnames_are_relative_and_deduplicated(tmp_path):
+    base = str(tmp_path)
+    paths = [os.path.join(base, 'a', 'clip.mp4'), os.path.join(base, 'b', 'clip.mp4'), os.path.join(base, 'clip.mp4')]
+    names = [name for _, name in unique_arcnames(paths + [paths[2]], base)]
+    assert names == ['a/clip.mp4', 'b/clip.mp4', 'clip.mp4', 'clip (2).mp4']
+
+
+def test_iter_zip_streams_a_readable_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipstream, 'CHUNK_SIZE', 1024)
+    big = tmp_path / 'big.mp4'
+    big.write_bytes(os.urandom(10 * 1024))
+    small = tmp_path / 'small.mp4'
+    small.write_bytes(b'small')
+    chunks = list(iter_zip([(str(big), 'big.mp4'), (str(tmp_path / 'gone.mp4'), 'gone.mp4'),
+                            (str(small), 'small.mp4')]))
+    # Written out as the files are read, not in one piece at the end
+    assert len(chunks) > 10
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.namelist() == ['big.mp4', 'small.mp4']
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+        assert archive.read('big.mp4') == big.read_bytes()
+        assert archive.read('small.mp4') == b'small'
@@ -0,0 +1,201 @@
+import re
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                   'igshid', 'igsh', 'si', 'feature', 'fbclid', 'gclid'}
+
+ClassifiedURL = namedtuple('ClassifiedURL', ['platform', 'kind', 'id', 'normalized', 'playlist_id'])
+ClassifiedURL.__doc__ = """Result of classify_url
+
+platform is None for unsupported sites. kind is one of video, short, reel,
+post, story, playlist, channel or unknown (supported site, unrecognised
+path). For channels, id includes the tab when the link names one
+(@name/videos, @name/shorts). playlist_id is set for playlists and for
+videos opened inside one.
+"""
+
+# Content the serverless handlers in api/ can describe, by platform
+SERVERLESS_KINDS = {
+    'youtube': {'video', 'short', 'playlist'},
+    'instagram': {'post', 'reel'},
+}
+
+# Scheme, optional subdomains, supported host, then path and query in one match
+_URL_RE = re.compile(
+    r'\s*(?:https?://)?(?:[\w-]+\.)*?'
+    r'(?P<host>youtube\.com|youtube-nocookie\.com|youtu\.be|instagram\.com|tiktok\.com'
+    r'|twitter\.com|x\.com|facebook\.com)(?::\d+)?'
+    r'(?P<path>/[^?#\s]*)(?:\?(?P<query>[^#\s]*))?',
+    re.IGNORECASE
+)
+
+_PLATFORMS = {
+    'youtube.com': 'youtube', 'youtube-nocookie.com': 'youtube', 'youtu.be': 'youtube',
+    'instagram.com': 'instagram', 'tiktok.com': 'tiktok',
+    'twitter.com': 'twitter', 'x.com': 'twitter', 'facebook.com': 'facebook',
+}
+
+_ID = r'(?P<id>[\w-]+)'
+_YOUTUBE_PATH_RE = re.compile(
+    rf'/(?:(?P<short>shorts)/{_ID}|(?:embed|live|v)/(?P<embed_id>[\w-]+)|(?P<watch>watch)/?$'
+    rf'|(?P<playlist>playlist)/?$|(?P<channel>@[\w.-]+|channel/[\w-]+|c/[\w-]+|user/[\w-]+)(?:/(?P<tab>[\w-]+))?)',
+    re.IGNORECASE
+)
+_YOUTU_BE_PATH_RE = re.compile(rf'/{_ID}')
+# Posts and reels can also be linked under the author's profile (/<user>/reel/<id>)
+_INSTAGRAM_PATH_RE = re.compile(
+    rf'/(?:(?:[\w.]+/)?(?P<kind>p|reel|reels|tv)/{_ID}|stories/[\w.]+/(?P<story_id>\d+))', re.IGNORECASE
+)
+_TIKTOK_PATH_RE = re.compile(r'/@[\w.-]+/video/(?P<id>\d+)', re.IGNORECASE)
+_TWITTER_PATH_RE = re.compile(r'/(?:[\w]+|i/web)/status/(?P<id>\d+)', re.IGNORECASE)
+_FACEBOOK_PATH_RE = re.compile(
+    rf'/(?:(?P<watch>watch)/?$|(?P<reel>reel)/(?P<reel_id>\d+)|[\w.-]+/videos/(?:[\w.-]+/)?(?P<video_id>\d+))',
+    re.IGNORECASE
+)
+_V_PARAM_RE = re.compile(r'(?:^|&)v=([\w-]+)', re.IGNORECASE)
+_LIST_PARAM_RE = re.compile(r'(?:^|&)list=([\w-]+)', re.IGNORECASE)
+
+_INSTAGRAM_KINDS = {'p': 'post', 'reel': 'reel', 'reels': 'reel', 'tv': 'video'}
+
+
+def normalize_url(url):
+    """Normalize a URL so equivalent links share a cache key"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host.startswith('m.'):
+        host = host[2:]
+    path = parts.path.rstrip('/') or '/'
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS]
+    query.sort()
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def _param(regex, query):
+    match = regex.search(query) if query else None
+    return match.group(1) if match else None
+
+
+def _classify_youtube(host, path, query):
+    if host == 'youtu.be':
+        match = _YOUTU_BE_PATH_RE.match(path)
+        return ('video', match.group('id')) if match else ('unknown', None)
+    match = _YOUTUBE_PATH_RE.match(path)
+    if not match:
+        return 'unknown', None
+    if match.group('short'):
+        return 'short', match.group('id')
+    if match.group('embed_id'):
+        return 'video', match.group('embed_id')
+    if match.group('watch'):
+        video_id = _param(_V_PARAM_RE, query)
+        return ('video', video_id) if video_id else ('unknown', None)
+    if match.group('playlist'):
+        playlist_id = _param(_LIST_PARAM_RE, query)
+        return ('playlist', playlist_id) if playlist_id else ('unknown', None)
+    # Each tab (videos, shorts, streams...) lists different entries, so it is part of the ID
+    tab = match.group('tab')
+    return 'channel', f"{match.group('channel')}/{tab.lower()}" if tab else match.group('channel')
+
+
+def _classify_instagram(path):
+    match = _INSTAGRAM_PATH_RE.match(path)
+    if not match:
+        return 'unknown', None
+    if match.group('story_id'):
+        return 'story', match.group('story_id')
+    return _INSTAGRAM_KINDS[match.group('kind').lower()], match.group('id')
+
+
+def _classify_facebook(path, query):
+    match = _FACEBOOK_PATH_RE.match(path)
+    if not match:
+        return 'unknown', None
+    if match.group('watch'):
+        video_id = _param(_V_PARAM_RE, query)
+        return ('video', video_id) if video_id else ('unknown', None)
+    if match.group('reel'):
+        return 'reel', match.group('reel_id')
+    return 'video', match.group('video_id')
+
+
+def _canonical(platform, kind, content_id, playlist_id, url):
+    """Canonical link for recognised content, otherwise the generically normalized URL"""
+    if content_id is None:
+        return normalize_url(url)
+    if platform == 'youtube':
+        if kind == 'playlist':
+            return f'https://www.youtube.com/playlist?list={content_id}'
+        if kind == 'channel':
+            return f'https://www.youtube.com/{content_id}'
+        if kind == 'short':
+            return f'https://www.youtube.com/shorts/{content_id}'
+        # A video opened inside a playlist still resolves to the playlist
+        suffix = f'&list={playlist_id}' if playlist_id else ''
+        return f'https://www.youtube.com/watch?v={content_id}{suffix}'
+    if platform == 'instagram':
+        if kind == 'story':
+            return normalize_url(url)
+        return f'https://www.instagram.com/{"p" if kind == "post" else kind}/{content_id}/'
+    if platform == 'facebook':
+        if kind == 'reel':
+            return f'https://www.facebook.com/reel/{content_id}'
+        return f'https://www.facebook.com/watch/?v={content_id}'
+    if platform == 'twitter':
+        return f'https://twitter.com/i/web/status/{content_id}'
+    if platform == 'tiktok':
+        # Everything in a TikTok video link's query (lang, is_from_webapp, sender_device...) is tracking
+        parts = urlsplit(normalize_url(url))
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+    return normalize_url(url)
+
+
+def classify_url(url):
+    """Identify the platform, content kind, canonical ID and normalized URL of a link"""
+    match = _URL_RE.match(url)
+    if not match:
+        return ClassifiedURL(None, 'unknown', None, None, None)
+
+    host = match.group('host').lower()
+    path = match.group('path')
+    query = match.group('query')
+    platform = _PLATFORMS[host]
+    playlist_id = None
+
+    if platform == 'youtube':
+        kind, content_id = _classify_youtube(host, path, query)
+        playlist_id = content_id if kind == 'playlist' else _param(_LIST_PARAM_RE, query)
+    elif platform == 'instagram':
+        kind, content_id = _classify_instagram(path)
+    elif platform == 'tiktok':
+        tiktok = _TIKTOK_PATH_RE.match(path)
+        kind, content_id = ('video', tiktok.group('id')) if tiktok else ('unknown', None)
+    elif platform == 'twitter':
+        tweet = _TWITTER_PATH_RE.match(path)
+        kind, content_id = ('video', tweet.group('id')) if tweet else ('unknown', None)
+    else:
+        kind, content_id = _classify_facebook(path, query)
+
+    normalized = _canonical(platform, kind, content_id, playlist_id, url)
+    return ClassifiedURL(platform, kind, content_id, normalized, playlist_id)
+
+
+def canonical_url(url):
+    """Normalized form of any URL, canonical for recognised content (used for cache and dedupe keys)"""
+    classified = classify_url(url)
+    return classified.normalized or normalize_url(url)
+
+
+def is_serverless_supported(classified):
+    """Whether the serverless handlers in api/ can describe a classified link"""
+    return classified.id is not None and classified.kind in SERVERLESS_KINDS.get(classified.platform, ())
+
+
+def is_playlist_url(classified):
+    """Whether a link should be expanded as a playlist (including videos opened inside one)"""
+    return classified.kind == 'playlist' or classified.playlist_id is not None
@@ -0,0 +1,129 @@
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import yt_dlp
+
+# Options yt-dlp reads on every call rather than when the instance is built;
+# they can differ between checkouts of the same pooled instance. Keeping the
+# output template here lets every playlist item share one profile.
+RUNTIME_PARAMS = ('outtmpl', 'playlist_items', 'playliststart', 'playlistend')
+
+# Callbacks registered per checkout instead of baked into the instance
+HOOK_PARAMS = ('progress_hooks', 'post_hooks')
+
+
+def profile_key(params):
+    """Stable key for the options that are baked into a YoutubeDL instance"""
+    static = {k: v for k, v in params.items() if k not in RUNTIME_PARAMS and k not in HOOK_PARAMS}
+    return json.dumps(static, sort_keys=True, default=repr)
+
+
+class YoutubeDLPool:
+    """Reusable YoutubeDL instances grouped by option profile
+
+    Building a YoutubeDL sets up extractors, the cookie jar and the HTTP
+    session; reusing one keeps its keep-alive connections and extractor
+    caches warm. An instance is used by one caller at a time and its
+    per-run state (progress hooks, download counters) is reset between uses.
+    """
+
+    def __init__(self, max_idle_per_profile=4, max_profiles=32, factory=yt_dlp.YoutubeDL):
+        self.max_idle_per_profile = max_idle_per_profile
+        self.max_profiles = max_profiles
+        self.factory = factory
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # profile key -> idle instances, least recently used first
+
+    @contextmanager
+    def checkout(self, params):
+        """Borrow an instance configured with `params` (use instead of `with YoutubeDL(params)`)"""
+        key = profile_key(params)
+        ydl = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                ydl = idle.pop()
+                self.reused += 1
+        if ydl is None:
+            ydl = self.factory({k: v for k, v in params.items() if k not in HOOK_PARAMS})
+            with self._lock:
+                self.created += 1
+
+        self._prepare(ydl, params)
+        healthy = False
+        try:
+            yield ydl
+            healthy = True
+        except yt_dlp.utils.YoutubeDLError:
+            # Download/extraction errors are expected and leave the instance usable
+            healthy = True
+            raise
+        finally:
+            self._release(key, ydl, healthy)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'profiles': len(self._idle),
+                'idle': sum(len(idle) for idle in self._idle.values()),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded
+            }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for instances in idle.values():
+            for ydl in instances:
+                ydl.close()
+
+    @staticmethod
+    def _prepare(ydl, params):
+        """Reset the per-run state a previous user may have left behind"""
+        ydl._progress_hooks = []
+        ydl._post_hooks = []
+        for hook in params.get('progress_hooks') or []:
+            ydl.add_progress_hook(hook)
+        for hook in params.get('post_hooks') or []:
+            ydl.add_post_hook(hook)
+        for name in RUNTIME_PARAMS:
+            if name in params:
+                ydl.params[name] = params[name]
+            else:
+                ydl.params.pop(name, None)
+        ydl._parse_outtmpl()  # Normalizes the template and fills in the defaults
+        ydl._num_downloads = 0
+        ydl._download_retcode = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+        ydl._printed_messages.clear()
+
+    def _release(self, key, ydl, healthy):
+        ydl._progress_hooks = []  # Don't keep the last job's closures alive
+        ydl._post_hooks = []
+        evicted = []
+        with self._lock:
+            if not healthy:
+                self.discarded += 1
+                evicted.append(ydl)
+            else:
+                idle = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(idle) < self.max_idle_per_profile:
+                    idle.append(ydl)
+                else:
+                    evicted.append(ydl)
+                while len(self._idle) > self.max_profiles:
+                    _, instances = self._idle.popitem(last=False)
+                    evicted.extend(instances)
+        for instance in evicted:
+            try:
+                instance.close()
+            except Exception:
+                pass
@@ -0,0 +1,68 @@
+import io
+import os
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def unique_arcnames(paths, base_folder):
+    """Pair each path with an archive name relative to `base_folder`, renaming clashes"""
+    seen = set()
+    entries = []
+    for path in paths:
+        arcname = os.path.relpath(path, base_folder).replace(os.sep, '/')
+        stem, ext = os.path.splitext(arcname)
+        counter = 2
+        while arcname in seen:
+            arcname = f'{stem} ({counter}){ext}'
+            counter += 1
+        seen.add(arcname)
+        entries.append((path, arcname))
+    return entries
+
+
+def iter_zip(entries):
+    """Yield a ZIP archive of (path, arcname) entries as it is being written
+
+    Entries are stored without compression: the media is already compressed,
+    so building the archive costs little more than reading the files. Nothing
+    is buffered beyond one chunk of one file. Files that vanish before they
+    are reached are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for path, arcname in entries:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(path, arcname)
+                src = open(path, 'rb')
+            except OSError:
+                continue
+            zinfo.compress_type = zipfile.ZIP_STORED
+            with src, archive.open(zinfo, 'w') as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()